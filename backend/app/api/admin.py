@@ -1,104 +1,135 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import heapq
+import json
+import logging
 
-from app.core.database import get_db
+from app.api.reviews import encode_review_cursor, parse_review_cursor, review_to_response
+from app.core.database import SessionLocal, get_db
 from app.core.security import get_admin_user
 from app.models.user import User
 from app.models.farrier import Farrier
-from app.models.booking import Booking, BookingStatus
+from app.models.archive import ArchivedBooking
+from app.models.booking import Booking
+from app.models.report import ReportJob, ReportStatus
 from app.models.review import Review
-from app.models.horse import Horse
-from app.schemas.user import UserResponse
+from app.schemas.report import ReportJobResponse
+from app.schemas.review import ModerationQueueResponse, ReviewVisibilityResult, ReviewVisibilityUpdate
+from app.schemas.user import (
+    BulkUserActiveUpdate, BulkUserDeleteResult, BulkUserResult, BulkUserSelection, UserPageResponse
+)
+from app.services.admin_stats import admin_statistics
+from app.services.booking_archive import ARCHIVABLE_STATUSES
+from app.services.daily_metrics import INTERVALS, TIMESERIES_METRICS, timeseries
+from app.services.ratings import apply_visibility_change
+from app.services.reports import RATING_RECOMPUTE, report_job_to_response, report_runner
+from app.services.user_admin import (
+    delete_users_operation, run_bulk_operation, set_active_operation, user_filter_conditions, verify_operation
+)
+from app.services.user_purge import mark_users_deleted, user_purge
+from app.services.user_search import estimate_count, matching_user_ids, search_condition
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Längsta period med en punkt per dag i tidsserierna
+MAX_TIMESERIES_DAYS = 1000
 
 
 @router.get("/stats")
 async def get_statistics(
+    refresh: bool = Query(False, description="Räkna om direkt i stället för att använda cachen"),
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Hämta statistik för admin-dashboard. Siffrorna kommer från en cachad
+    ögonblicksbild, se `generated_at` för när den togs fram.
+    """
+    if refresh:
+        return admin_statistics.refresh(SessionLocal)
+    return admin_statistics.get(SessionLocal)
+
+
+@router.get("/timeseries")
+async def get_timeseries(
+    metric: str = Query(..., description=", ".join(TIMESERIES_METRICS)),
+    date_from: Optional[date] = Query(None, alias="from", description="Från datum, default 30 dagar bakåt"),
+    date_to: Optional[date] = Query(None, alias="to", description="Till och med datum, default idag"),
+    interval: str = Query("day", description="day, week eller month"),
     current_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Hämta statistik för admin-dashboard"""
-    # Totala antal
-    total_users = db.query(func.count(User.id)).scalar()
-    total_horse_owners = db.query(func.count(User.id)).filter(User.role == "horse_owner").scalar()
-    total_farriers = db.query(func.count(User.id)).filter(User.role == "farrier").scalar()
-    total_horses = db.query(func.count(Horse.id)).scalar()
-    total_bookings = db.query(func.count(Booking.id)).scalar()
-    total_reviews = db.query(func.count(Review.id)).scalar()
-    
-    # Bokningar per status
-    booking_stats = db.query(
-        Booking.status,
-        func.count(Booking.id)
-    ).group_by(Booking.status).all()
-    
-    bookings_by_status = {status: count for status, count in booking_stats}
-    
-    # Bokningar senaste 30 dagarna
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_bookings = db.query(func.count(Booking.id)).filter(
-        Booking.created_at >= thirty_days_ago
-    ).scalar()
-    
-    # Nya användare senaste 30 dagarna
-    new_users = db.query(func.count(User.id)).filter(
-        User.created_at >= thirty_days_ago
-    ).scalar()
-    
-    # Genomsnittligt betyg
-    avg_rating = db.query(func.avg(Review.rating)).scalar()
-    
-    # Intäkter (summa av slutförda bokningar)
-    total_revenue = db.query(func.sum(Booking.total_price)).filter(
-        Booking.status == BookingStatus.COMPLETED.value
-    ).scalar() or 0
+    """Tidsserie för diagram, läses från de dagliga sammanställningarna"""
+    if metric not in TIMESERIES_METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Okänt mått, välj en av: {', '.join(TIMESERIES_METRICS)}"
+        )
+    if interval not in INTERVALS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ogiltigt intervall, välj en av: {', '.join(INTERVALS)}"
+        )
+    
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Från-datum måste vara före till-datum"
+        )
+    if interval == "day" and (date_to - date_from).days >= MAX_TIMESERIES_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Högst {MAX_TIMESERIES_DAYS} dagar per anrop, använd week eller month för längre perioder"
+        )
     
     return {
-        "total_users": total_users,
-        "total_horse_owners": total_horse_owners,
-        "total_farriers": total_farriers,
-        "total_horses": total_horses,
-        "total_bookings": total_bookings,
-        "total_reviews": total_reviews,
-        "bookings_by_status": bookings_by_status,
-        "recent_bookings": recent_bookings,
-        "new_users_last_30_days": new_users,
-        "average_rating": round(avg_rating, 2) if avg_rating else 0,
-        "total_revenue": total_revenue
+        "metric": metric,
+        "interval": interval,
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "points": timeseries(db, metric, date_from, date_to, interval),
     }
 
 
-@router.get("/users", response_model=List[UserResponse])
+@router.get("/users", response_model=UserPageResponse)
 async def list_users(
     role: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
-    search: Optional[str] = Query(None),
-    skip: int = Query(0, ge=0),
+    search: Optional[str] = Query(None, description="Namn eller e-post"),
+    cursor: Optional[int] = Query(None, description="next_cursor från föregående sida"),
     limit: int = Query(50, ge=1, le=100),
     current_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Lista alla användare (admin)"""
-    query = db.query(User)
+    """Lista användare (admin), nyast först, en sida i taget"""
+    query = db.query(User).filter(User.deleted_at.is_(None))
     
     if role:
         query = query.filter(User.role == role)
     if is_active is not None:
         query = query.filter(User.is_active == is_active)
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (User.email.ilike(search_term)) |
-            (User.first_name.ilike(search_term)) |
-            (User.last_name.ilike(search_term))
-        )
+        condition = search_condition(db, search)
+        if condition is not None:
+            query = query.filter(condition)
+    
+    total, total_is_estimate = estimate_count(db, query) if cursor is None else (None, False)
+    
+    if cursor is not None:
+        query = query.filter(User.id < cursor)
+    users = query.order_by(User.id.desc()).limit(limit + 1).all()
     
-    users = query.offset(skip).limit(limit).all()
-    return users
+    return {
+        "users": users[:limit],
+        "next_cursor": users[limit - 1].id if len(users) > limit else None,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+    }
 
 
 @router.put("/users/{user_id}/toggle-active")
@@ -108,7 +139,7 @@ async def toggle_user_active(
     db: Session = Depends(get_db)
 ):
     """Aktivera/inaktivera användare"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.deleted_at.is_(None)).first()
     
     if not user:
         raise HTTPException(status_code=404, detail="Användare hittades inte")
@@ -129,7 +160,7 @@ async def verify_user(
     db: Session = Depends(get_db)
 ):
     """Verifiera användare"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.deleted_at.is_(None)).first()
     
     if not user:
         raise HTTPException(status_code=404, detail="Användare hittades inte")
@@ -153,8 +184,8 @@ async def delete_user(
     current_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Ta bort användare"""
-    user = db.query(User).filter(User.id == user_id).first()
+    """Ta bort användare (markeras direkt, data rensas i bakgrunden)"""
+    user = db.query(User).filter(User.id == user_id, User.deleted_at.is_(None)).first()
     
     if not user:
         raise HTTPException(status_code=404, detail="Användare hittades inte")
@@ -162,43 +193,127 @@ async def delete_user(
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Du kan inte ta bort dig själv")
     
-    db.delete(user)
+    mark_users_deleted(db, [user.id])
     db.commit()
+    user_purge.schedule(SessionLocal)
     
     return {"message": "Användare borttagen"}
 
 
+def _bulk_selection(db: Session, selection: BulkUserSelection) -> dict:
+    """Argument till run_bulk_operation: id-lista eller filtervillkor"""
+    if (selection.user_ids is None) == (selection.filter is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ange antingen user_ids eller filter"
+        )
+    if selection.user_ids is not None:
+        return {"user_ids": selection.user_ids}
+    filters = {key: value for key, value in selection.filter.model_dump().items() if value not in (None, "")}
+    if not filters:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Filtret måste begränsa urvalet"
+        )
+    return {"conditions": user_filter_conditions(db, **filters)}
+
+
+@router.post("/users/bulk/active", response_model=BulkUserResult)
+async def bulk_set_active(
+    data: BulkUserActiveUpdate,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Aktivera eller inaktivera många användare, i omgångar"""
+    selection = _bulk_selection(db, data)
+    return run_bulk_operation(db, set_active_operation(data.is_active, current_user.id), **selection)
+
+
+@router.post("/users/bulk/verify", response_model=BulkUserResult)
+async def bulk_verify(
+    data: BulkUserSelection,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Verifiera många användare (och hovslagarprofiler), t.ex. alla
+    overifierade hovslagare från en import: filter {"role": "farrier",
+    "is_verified": false, "created_after": ...}
+    """
+    selection = _bulk_selection(db, data)
+    return run_bulk_operation(db, verify_operation, **selection)
+
+
+@router.post("/users/bulk/delete", response_model=BulkUserDeleteResult)
+async def bulk_delete(
+    data: BulkUserSelection,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ta bort många användare. Kontona markeras i omgångar, allt som hör till
+    dem rensas sedan i bakgrunden.
+    """
+    selection = _bulk_selection(db, data)
+    result = run_bulk_operation(db, delete_users_operation(current_user.id), **selection)
+    if result.get("deleted_ids"):
+        user_purge.schedule(SessionLocal)
+    logger.info(
+        "Massborttagning: %s användare borttagna av admin %s", len(result.get("deleted_ids", [])), current_user.id
+    )
+    return result
+
+
 @router.get("/bookings")
 async def list_all_bookings(
     status_filter: Optional[str] = Query(None),
-    skip: int = Query(0, ge=0),
+    search: Optional[str] = Query(None, description="Hästägarens eller hovslagarens namn eller e-post"),
+    cursor: Optional[int] = Query(None, description="next_cursor från föregående sida"),
     limit: int = Query(50, ge=1, le=100),
     current_user: User = Depends(get_admin_user),
     db: Session = Depends(get_db)
 ):
-    """Lista alla bokningar (admin)"""
-    query = db.query(Booking).options(
-        joinedload(Booking.horse),
-        joinedload(Booking.farrier).joinedload(Farrier.user),
-        joinedload(Booking.horse_owner)
-    )
+    """Lista alla bokningar (admin), inklusive arkiverade, nyast först, en sida i taget"""
+    user_ids = matching_user_ids(db, search) if search else None
     
-    if status_filter:
-        query = query.filter(Booking.status == status_filter)
+    def page(model):
+        query = db.query(model).options(
+            joinedload(model.horse),
+            joinedload(model.farrier).joinedload(Farrier.user),
+            joinedload(model.horse_owner)
+        )
+        if status_filter:
+            query = query.filter(model.status == status_filter)
+        if user_ids is not None:
+            query = query.filter(
+                model.horse_owner_id.in_(user_ids) |
+                model.farrier_id.in_(select(Farrier.id).where(Farrier.user_id.in_(user_ids)))
+            )
+        if cursor is not None:
+            query = query.filter(model.id < cursor)
+        # Arkivraderna behåller sitt id, så samma markör gäller i båda tabellerna
+        return query.order_by(model.id.desc()).limit(limit + 1).all()
     
-    bookings = query.order_by(Booking.created_at.desc()).offset(skip).limit(limit).all()
+    bookings = page(Booking)
+    if not status_filter or status_filter in ARCHIVABLE_STATUSES:
+        bookings = list(heapq.merge(bookings, page(ArchivedBooking), key=lambda b: b.id, reverse=True))
+    next_cursor = bookings[limit - 1].id if len(bookings) > limit else None
+    bookings = bookings[:limit]
     
-    return [{
-        "id": b.id,
-        "horse_owner": f"{b.horse_owner.first_name} {b.horse_owner.last_name}" if b.horse_owner else None,
-        "farrier": f"{b.farrier.user.first_name} {b.farrier.user.last_name}" if b.farrier and b.farrier.user else None,
-        "horse": b.horse.name if b.horse else None,
-        "service_type": b.service_type,
-        "scheduled_date": b.scheduled_date,
-        "status": b.status,
-        "total_price": b.total_price,
-        "created_at": b.created_at
-    } for b in bookings]
+    return {
+        "bookings": [{
+            "id": b.id,
+            "horse_owner": f"{b.horse_owner.first_name} {b.horse_owner.last_name}" if b.horse_owner else None,
+            "farrier": f"{b.farrier.user.first_name} {b.farrier.user.last_name}" if b.farrier and b.farrier.user else None,
+            "horse": b.horse.name if b.horse else None,
+            "service_type": b.service_type,
+            "scheduled_date": b.scheduled_date,
+            "status": b.status,
+            "total_price": b.total_price,
+            "created_at": b.created_at
+        } for b in bookings],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get("/farriers/pending-verification")
@@ -207,9 +322,9 @@ async def list_pending_farriers(
     db: Session = Depends(get_db)
 ):
     """Lista hovslagare som väntar på verifiering"""
-    farriers = db.query(Farrier).options(
-        joinedload(Farrier.user)
-    ).filter(Farrier.is_verified == False).all()
+    farriers = db.query(Farrier).join(Farrier.user).options(
+        contains_eager(Farrier.user)
+    ).filter(Farrier.is_verified == False, User.deleted_at.is_(None)).all()
     
     return [{
         "id": f.id,
@@ -221,3 +336,122 @@ async def list_pending_farriers(
         "created_at": f.created_at
     } for f in farriers]
 
+
+@router.get("/reviews/moderation", response_model=ModerationQueueResponse)
+async def list_reviews_for_moderation(
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    farrier_id: Optional[int] = Query(None),
+    q: Optional[str] = Query(None, description="Sökord i rubrik eller text"),
+    is_visible: Optional[bool] = Query(None, description="Bara synliga eller dolda, default alla"),
+    cursor: Optional[str] = Query(None, description="next_cursor från föregående sida"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Modereringskö (admin): alla omdömen, nyast först"""
+    query = db.query(Review).options(
+        joinedload(Review.author),
+        joinedload(Review.farrier).joinedload(Farrier.user)
+    )
+    if rating:
+        query = query.filter(Review.rating == rating)
+    if farrier_id:
+        query = query.filter(Review.farrier_id == farrier_id)
+    if is_visible is not None:
+        query = query.filter(Review.is_visible == is_visible)
+    if q:
+        search_term = f"%{q}%"
+        query = query.filter(Review.title.ilike(search_term) | Review.comment.ilike(search_term))
+    if cursor:
+        _, created_at, review_id = parse_review_cursor(cursor, "newest")
+        query = query.filter(tuple_(Review.created_at, Review.id) < tuple_(created_at, review_id))
+    
+    reviews = query.order_by(Review.created_at.desc(), Review.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_review_cursor(reviews[limit - 1], "newest") if len(reviews) > limit else None
+    
+    return {
+        "reviews": [{
+            **review_to_response(r),
+            "farrier_name": (
+                f"{r.farrier.user.first_name} {r.farrier.user.last_name}"
+                if r.farrier and r.farrier.user else None
+            ),
+        } for r in reviews[:limit]],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.post("/reviews/moderation/visibility", response_model=ReviewVisibilityResult)
+async def set_reviews_visibility(
+    visibility_data: ReviewVisibilityUpdate,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Dölj eller visa många omdömen på en gång (admin). Omdömena uppdateras med
+    en sats och varje berörd hovslagares betyg justeras en gång.
+    """
+    review_ids = list(dict.fromkeys(visibility_data.review_ids))
+    target = visibility_data.is_visible
+    
+    reviews = db.query(Review).filter(Review.id.in_(review_ids)).with_for_update().all()
+    found = {review.id: review for review in reviews}
+    changing = [review for review in reviews if bool(review.is_visible) != target]
+    
+    farriers_updated = 0
+    if changing:
+        db.execute(
+            update(Review).where(
+                Review.id.in_([review.id for review in changing])
+            ).values(
+                is_visible=target, updated_at=datetime.utcnow()
+            ).execution_options(synchronize_session=False)
+        )
+        # Bidragen räknas på raderna som lästes innan synligheten ändrades
+        farriers_updated = apply_visibility_change(db, changing, target)
+    db.commit()
+    
+    changed_ids = {review.id for review in changing}
+    return {
+        "updated_ids": [i for i in review_ids if i in changed_ids],
+        "unchanged_ids": [i for i in review_ids if i in found and i not in changed_ids],
+        "not_found_ids": [i for i in review_ids if i not in found],
+        "farriers_updated": farriers_updated,
+    }
+
+
+@router.post("/ratings/recompute", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def recompute_ratings(
+    farrier_id: Optional[List[int]] = Query(None, description="Bara dessa hovslagare, default alla"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000),
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Räkna om hovslagarnas betyg (snitt, antal, delbetyg och fördelning) från
+    synliga omdömen, t.ex. efter moderering eller import. Omräkningen körs i
+    bakgrunden och svaret kommer direkt; följ förloppet med
+    GET /api/admin/reports/{id} (row_count är antal klara hovslagare).
+    """
+    running = db.query(ReportJob).filter(
+        ReportJob.report_type == RATING_RECOMPUTE,
+        ReportJob.status.in_((ReportStatus.QUEUED.value, ReportStatus.RUNNING.value))
+    ).first()
+    if running:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"En omräkning pågår redan (jobb {running.id})"
+        )
+    
+    job = ReportJob(
+        report_type=RATING_RECOMPUTE,
+        output_format="none",
+        parameters=json.dumps({"farrier_ids": farrier_id, "chunk_size": chunk_size}),
+        requested_by_id=current_user.id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    report_runner.submit(job.id, SessionLocal)
+    return report_job_to_response(job)
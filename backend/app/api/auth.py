@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
@@ -12,23 +11,19 @@ from app.core.security import (
     create_access_token,
     get_current_active_user
 )
-from app.models.user import User
+from app.models.user import User, normalize_email
 from app.models.farrier import Farrier
 from app.schemas.user import UserCreate, UserResponse
 from app.schemas.auth import Token, PasswordReset
 
 router = APIRouter()
 
-def _normalize_email(email: str) -> str:
-    return (email or "").strip().lower()
-
-
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Registrera ny användare (hästägare eller hovslagare)"""
-    email = _normalize_email(user_data.email)
+    email = normalize_email(user_data.email)
     # Kolla om email redan finns
-    existing_user = db.query(User).filter(func.lower(User.email) == email).first()
+    existing_user = db.query(User).filter(User.email_normalized == email, User.deleted_at.is_(None)).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -68,8 +63,8 @@ async def login(
     db: Session = Depends(get_db)
 ):
     """Logga in och få JWT token"""
-    email = _normalize_email(form_data.username)
-    user = db.query(User).filter(func.lower(User.email) == email).first()
+    email = normalize_email(form_data.username)
+    user = db.query(User).filter(User.email_normalized == email, User.deleted_at.is_(None)).first()
     
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -107,8 +102,8 @@ async def reset_password(payload: PasswordReset, db: Session = Depends(get_db)):
     if payload.reset_code != settings.PASSWORD_RESET_CODE:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Ogiltig reset-kod")
 
-    email = _normalize_email(payload.email)
-    user = db.query(User).filter(func.lower(User.email) == email).first()
+    email = normalize_email(payload.email)
+    user = db.query(User).filter(User.email_normalized == email, User.deleted_at.is_(None)).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Användaren finns inte")
 
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_
 from typing import List, Optional
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta, timezone
 
 from app.core.database import get_db
-from app.models.booking import Booking
+from app.core.localtime import local_to_utc, utc_to_local
+from app.models.booking import Booking, ACTIVE_BOOKING_STATUSES
 from app.models.farrier import Farrier, FarrierSchedule
+from app.models.slot_hold import SlotHold
 from app.models.user import User
+from app.services.routing import parse_coordinate
+from app.services.slot_recommender import FarrierDay, recommend_slots
 
 router = APIRouter()
 
@@ -51,6 +55,10 @@ AREA_COORDINATES = {
     "Uppsala": {"lat": 59.8586, "lng": 17.6389},
 }
 
+# Längsta period som rekommendationer räknas fram för
+MAX_RECOMMENDATION_DAYS = 14
+DEFAULT_WORKING_HOURS = (time(8, 0), time(17, 0))
+
 
 def get_nearby_areas(area: str) -> List[str]:
     """Hämta närliggande områden för ett givet område"""
@@ -125,23 +133,29 @@ async def get_farrier_daily_locations(
         Booking.status.in_(["pending", "confirmed", "in_progress"])
     ).all()
     
+    # Aktiva reservationer (tider som någon håller på att boka) räknas som upptagna
+    holds = db.query(SlotHold).options(
+        joinedload(SlotHold.farrier).joinedload(Farrier.user)
+    ).filter(
+        SlotHold.scheduled_date >= start_of_day,
+        SlotHold.scheduled_date <= end_of_day,
+        SlotHold.expires_at > datetime.utcnow()
+    ).all()
+    
     # Gruppera per hovslagare
     farrier_locations = {}
     
-    for booking in bookings:
-        farrier_id = booking.farrier_id
-        if farrier_id not in farrier_locations:
-            farrier = booking.farrier
-            
+    def location_entry(farrier: Farrier) -> dict:
+        if farrier.id not in farrier_locations:
             # Hämta hovslagarens schema för denna veckodag
             schedule = db.query(FarrierSchedule).filter(
-                FarrierSchedule.farrier_id == farrier_id,
+                FarrierSchedule.farrier_id == farrier.id,
                 FarrierSchedule.day_of_week == day_of_week,
                 FarrierSchedule.is_available == True
             ).first()
             
-            farrier_locations[farrier_id] = {
-                "farrier_id": farrier_id,
+            farrier_locations[farrier.id] = {
+                "farrier_id": farrier.id,
                 "farrier_name": f"{farrier.user.first_name} {farrier.user.last_name}",
                 "business_name": farrier.business_name,
                 "phone": farrier.user.phone,
@@ -149,12 +163,26 @@ async def get_farrier_daily_locations(
                 "booked_areas": set(),
                 "available_areas": set(),
                 "bookings": [],
+                "holds": [],
                 "primary_location": None,
                 "primary_coordinates": None,
                 "schedule_start": schedule.start_time if schedule else "08:00",
                 "schedule_end": schedule.end_time if schedule else "17:00",
                 "available_times": [],
             }
+        return farrier_locations[farrier.id]
+    
+    for hold in holds:
+        location_entry(hold.farrier)["holds"].append({
+            "id": hold.id,
+            "time": hold.scheduled_date.strftime("%H:%M"),
+            "duration": hold.duration_minutes,
+            "expires_at": hold.expires_at,
+        })
+    
+    for booking in bookings:
+        farrier_id = booking.farrier_id
+        location_entry(booking.farrier)
         
         area = booking.location_city
         if area:
@@ -188,7 +216,7 @@ async def get_farrier_daily_locations(
         data["available_times"] = get_available_times(
             data["schedule_start"],
             data["schedule_end"],
-            data["bookings"]
+            data["bookings"] + data["holds"]
         )
         
         # Ta bort interna fält som inte ska skickas
@@ -206,6 +234,165 @@ async def get_farrier_daily_locations(
     }
 
 
+@router.get("/recommendations")
+async def get_slot_recommendations(
+    latitude: float = Query(..., ge=-90, le=90, description="Hästägarens latitud"),
+    longitude: float = Query(..., ge=-180, le=180, description="Hästägarens longitud"),
+    date_from: Optional[str] = Query(None, description="Från datum (YYYY-MM-DD), default idag"),
+    date_to: Optional[str] = Query(None, description="Till och med datum (YYYY-MM-DD)"),
+    duration_minutes: int = Query(60, ge=15, le=480),
+    radius_km: float = Query(50, gt=0, le=300, description="Max avstånd till närmaste stopp"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Föreslå tider hos hovslagare där besöket ger minst extra körning.
+    Varje ledig tid bedöms utifrån omvägen mellan dagens föregående och
+    nästa bokning (eller hovslagarens bas). Datum och arbetstider är i lokal
+    tid, bokningarna räknas om från UTC innan de läggs in på rätt dag.
+    """
+    now_utc = datetime.utcnow()
+    now = utc_to_local(now_utc)
+    try:
+        first_day = datetime.strptime(date_from, "%Y-%m-%d").date() if date_from else now.date()
+        last_day = datetime.strptime(date_to, "%Y-%m-%d").date() if date_to else first_day + timedelta(days=6)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ogiltigt datum, använd YYYY-MM-DD"
+        )
+    
+    if last_day < first_day:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Till-datum måste vara efter från-datum"
+        )
+    
+    if (last_day - first_day).days >= MAX_RECOMMENDATION_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Perioden får vara högst {MAX_RECOMMENDATION_DAYS} dagar"
+        )
+    
+    range_start = datetime.combine(first_day, datetime.min.time())
+    range_end = datetime.combine(last_day, datetime.min.time()) + timedelta(days=1)
+    if range_end <= now:
+        return {"latitude": latitude, "longitude": longitude, "date_from": first_day.isoformat(),
+                "date_to": last_day.isoformat(), "recommendations": []}
+    
+    farriers = {
+        farrier.id: farrier
+        for farrier in db.query(Farrier).options(
+            joinedload(Farrier.user), joinedload(Farrier.schedules)
+        ).filter(Farrier.is_available == True).all()
+    }
+    
+    # Allt som upptar tid i perioden, hämtat med en fråga per tabell (sparat i UTC)
+    query_start = local_to_utc(range_start) - timedelta(days=1)
+    query_end = local_to_utc(range_end)
+    bookings = db.query(
+        Booking.farrier_id, Booking.scheduled_date, Booking.duration_minutes,
+        Booking.location_latitude, Booking.location_longitude
+    ).filter(
+        Booking.farrier_id.in_(farriers.keys()),
+        Booking.scheduled_date >= query_start,
+        Booking.scheduled_date < query_end,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+    ).all()
+    
+    holds = db.query(
+        SlotHold.farrier_id, SlotHold.scheduled_date, SlotHold.duration_minutes
+    ).filter(
+        SlotHold.farrier_id.in_(farriers.keys()),
+        SlotHold.scheduled_date >= query_start,
+        SlotHold.scheduled_date < query_end,
+        SlotHold.expires_at > now_utc
+    ).all()
+    
+    days = {}
+    for farrier in farriers.values():
+        working_hours = {}
+        for schedule in farrier.schedules:
+            if schedule.is_available:
+                working_hours.setdefault(schedule.day_of_week, []).append(
+                    (schedule.start_time, schedule.end_time)
+                )
+        if not farrier.schedules:
+            # Samma standardtider som i dagsöversikten
+            working_hours = {weekday: [DEFAULT_WORKING_HOURS] for weekday in range(7)}
+        base = None
+        if farrier.base_latitude is not None and farrier.base_longitude is not None:
+            base = (farrier.base_latitude, farrier.base_longitude)
+        
+        day = first_day
+        while day <= last_day:
+            if day.weekday() in working_hours:
+                days[(farrier.id, day)] = FarrierDay(
+                    farrier.id, day, base, sorted(working_hours[day.weekday()])
+                )
+            day += timedelta(days=1)
+    
+    def busy_days(farrier_id: int, start: datetime, end: datetime):
+        # Pass över midnatt blockerar även nästa dag
+        day = start.date()
+        while datetime.combine(day, datetime.min.time()) < end:
+            if (farrier_id, day) in days:
+                yield days[(farrier_id, day)]
+            day += timedelta(days=1)
+    
+    for farrier_id, scheduled_date, duration, booking_latitude, booking_longitude in bookings:
+        scheduled_date = utc_to_local(scheduled_date)
+        end = scheduled_date + timedelta(minutes=duration or 60)
+        point_latitude = parse_coordinate(booking_latitude)
+        point_longitude = parse_coordinate(booking_longitude)
+        for farrier_day in busy_days(farrier_id, scheduled_date, end):
+            farrier_day.busy.append((scheduled_date, end))
+            if point_latitude is not None and point_longitude is not None and farrier_day.day == scheduled_date.date():
+                farrier_day.anchors.append((scheduled_date, end, (point_latitude, point_longitude)))
+    
+    for farrier_id, scheduled_date, duration in holds:
+        scheduled_date = utc_to_local(scheduled_date)
+        end = scheduled_date + timedelta(minutes=duration or 60)
+        for farrier_day in busy_days(farrier_id, scheduled_date, end):
+            farrier_day.busy.append((scheduled_date, end))
+    
+    slots = recommend_slots(
+        (latitude, longitude),
+        days.values(),
+        duration=timedelta(minutes=duration_minutes),
+        limit=limit,
+        max_km=radius_km,
+        not_before=now,
+    )
+    
+    def point(value) -> Optional[dict]:
+        return {"lat": value[0], "lng": value[1]} if value else None
+    
+    recommendations = []
+    for slot in slots:
+        farrier = farriers[slot.farrier_id]
+        recommendations.append({
+            "farrier_id": farrier.id,
+            "farrier_name": f"{farrier.user.first_name} {farrier.user.last_name}",
+            "business_name": farrier.business_name,
+            "average_rating": farrier.average_rating,
+            "scheduled_date": local_to_utc(slot.start).replace(tzinfo=timezone.utc),
+            "date": slot.start.date().isoformat(),
+            "time": slot.start.strftime("%H:%M"),
+            "added_km": slot.added_km,
+            "previous_location": point(slot.previous),
+            "next_location": point(slot.next),
+        })
+    
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "date_from": first_day.isoformat(),
+        "date_to": last_day.isoformat(),
+        "recommendations": recommendations
+    }
+
+
 @router.get("/available-farriers")
 async def get_available_farriers_in_area(
     area: str = Query(..., description="Område att söka i"),
@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from datetime import datetime, timezone, timedelta
-import re
+import heapq
+import logging
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.idempotency import run_idempotent
+from app.core.locks import farrier_booking_lock
 from app.core.security import get_current_active_user
 from app.models.user import User
-from app.models.booking import Booking, BookingStatus
-from app.models.farrier import Farrier, FarrierArea
+from app.models.booking import (
+    Booking, BookingStatus, ACTIVE_BOOKING_STATUSES, OWNER_CANCELLABLE_STATUSES, can_transition
+)
+from app.models.farrier import Farrier
 from app.models.horse import Horse
-from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse, BookingStatusUpdate
+from app.models.archive import ArchivedBooking
+from app.models.slot_hold import SlotHold
+from app.models.waitlist import WaitlistEntry
+from app.models.sync import BookingTombstone, current_change_seq, record_booking_changes
+from app.models.rollup import record_booking_update
+from app.schemas.booking import (
+    BookingCreate, BookingUpdate, BookingResponse, BookingStatusUpdate,
+    BookingSeriesCreate, BookingSeriesResponse, StableVisitCreate,
+    BookingChangesResponse, SlotHoldCreate, SlotHoldResponse, DayPlanResponse,
+    MAX_BOOKING_MINUTES
+)
+from app.services.area_matcher import area_matchers
+from app.services.booking_archive import ARCHIVABLE_STATUSES
+from app.services.booking_export import EXPORT_FORMATS, BookingExportFilters, export_chunks
+from app.services.routing import distance_matrix, parse_coordinate, plan_route, route_length
+from app.services.waitlist import (
+    find_best_match, mark_notified, offer_hold_ids, remove_accepted_offers, reopen_lapsed_offers
+)
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 def booking_to_response(booking: Booking) -> dict:
@@ -44,6 +69,7 @@ def booking_to_response(booking: Booking) -> dict:
         "travel_fee": booking.travel_fee,
         "total_price": booking.total_price,
         "status": booking.status,
+        "version": booking.version,
         "notes_from_owner": booking.notes_from_owner,
         "notes_from_farrier": booking.notes_from_farrier,
         "cancelled_by": booking.cancelled_by,
@@ -59,9 +85,226 @@ def booking_to_response(booking: Booking) -> dict:
     }
 
 
+# Hur långt bakåt från ett intervall vi letar efter bokningar som kan överlappa.
+# Schemana tillåter ingen längre bokning än MAX_BOOKING_MINUTES.
+OVERLAP_LOOKBACK = timedelta(minutes=MAX_BOOKING_MINUTES)
+
+
+def to_utc(value: datetime) -> datetime:
+    """Gör datetime tidszonsmedveten i UTC (naiva värden antas redan vara UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def resolve_travel_fee(
+    db: Session,
+    farrier: Farrier,
+    location_city: Optional[str],
+    location_address: Optional[str],
+    travel_fee: float
+) -> float:
+    """Validera att platsen ligger inom hovslagarens arbetsområden och returnera reseavgiften"""
+    matcher = area_matchers.get(db, farrier.id)
+
+    if matcher.is_empty or not location_city:
+        return travel_fee
+
+    # Matcha på stad, annars på postnummer-prefix i adressen
+    area = matcher.match(location_city, location_address)
+
+    if not area:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Hovslagaren arbetar endast i följande områden: {matcher.describe()}. Din bokning är utanför dessa områden."
+        )
+
+    # Om området har travel_fee, använd det
+    if area.travel_fee:
+        travel_fee = area.travel_fee
+
+    return travel_fee
+
+
+def find_overlapping_bookings(
+    db: Session,
+    farrier_id: int,
+    intervals: List[Tuple[datetime, datetime]],
+    holder_id: Optional[int] = None
+) -> Dict[int, Union[Booking, SlotHold]]:
+    """
+    Hitta befintliga bokningar och andras aktiva reservationer som överlappar
+    givna intervall (UTC). Reservationer gjorda av `holder_id` räknas inte.
+    Bokningarna och reservationerna hämtas med en intervallfråga var över hela spannet.
+    Returnerar index i `intervals` -> första krock.
+    """
+    if not intervals:
+        return {}
+
+    span_start = min(start for start, _ in intervals) - OVERLAP_LOOKBACK
+    span_end = max(end for _, end in intervals)
+
+    # Hitta överlappande bokningar (exkludera avbokade)
+    existing_bookings = db.query(Booking).filter(
+        Booking.farrier_id == farrier_id,
+        Booking.status != BookingStatus.CANCELLED.value,
+        Booking.scheduled_date >= span_start.replace(tzinfo=None),
+        Booking.scheduled_date < span_end.replace(tzinfo=None)
+    ).order_by(Booking.scheduled_date).all()
+
+    holds = db.query(SlotHold).filter(
+        SlotHold.farrier_id == farrier_id,
+        SlotHold.expires_at > datetime.utcnow(),
+        SlotHold.scheduled_date >= span_start.replace(tzinfo=None),
+        SlotHold.scheduled_date < span_end.replace(tzinfo=None)
+    )
+    if holder_id is not None:
+        holds = holds.filter(SlotHold.holder_id != holder_id)
+
+    existing_intervals = []
+    for existing in existing_bookings + holds.all():
+        existing_start = to_utc(existing.scheduled_date)
+        existing_end = existing_start + timedelta(minutes=existing.duration_minutes or 60)
+        existing_intervals.append((existing_start, existing_end, existing))
+    existing_intervals.sort(key=lambda item: item[0])
+
+    conflicts = {}
+    for index, (start, end) in enumerate(intervals):
+        for existing_start, existing_end, existing in existing_intervals:
+            # Listan är sorterad på starttid, så inga senare bokningar kan överlappa
+            if existing_start >= end:
+                break
+            if start < existing_end:
+                conflicts[index] = existing
+                break
+
+    return conflicts
+
+
+def conflict_detail(conflict: Union[Booking, SlotHold]) -> str:
+    existing_time = conflict.scheduled_date.strftime('%Y-%m-%d %H:%M')
+    if isinstance(conflict, SlotHold):
+        return f"Tiden är tillfälligt reserverad av en annan kund ({existing_time})"
+    return f"Tiden är redan bokad ({existing_time})"
+
+
+def evict_expired_holds(db: Session, farrier_id: int) -> None:
+    """Radera hovslagarens utgångna reservationer (lat städning, anropas under låset)"""
+    db.query(SlotHold).filter(
+        SlotHold.farrier_id == farrier_id,
+        SlotHold.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+
+def release_holds(
+    db: Session, farrier_id: int, holder_id: int, booked_starts: Iterable[datetime] = ()
+) -> None:
+    """
+    Släpp användarens reservationer hos hovslagaren, t.ex. när bokningen är
+    gjord. Erbjudanden från väntelistan på de bokade tiderna är då uppfyllda.
+    Reservationer för andra erbjudanden från väntelistan ligger kvar.
+    """
+    remove_accepted_offers(
+        db, farrier_id, holder_id, [to_utc(start).replace(tzinfo=None) for start in booked_starts]
+    )
+    db.query(SlotHold).filter(
+        SlotHold.farrier_id == farrier_id,
+        SlotHold.holder_id == holder_id,
+        SlotHold.id.notin_(offer_hold_ids())
+    ).delete(synchronize_session=False)
+
+
+def offer_freed_slot(db: Session, booking: Booking) -> Optional[WaitlistEntry]:
+    """
+    Erbjud en avbokad tid till bästa matchningen på väntelistan. Tiden hålls åt
+    hästägaren i WAITLIST_OFFER_HOLD_SECONDS och posten markeras som erbjuden.
+    """
+    start = to_utc(booking.scheduled_date)
+    end = start + timedelta(minutes=booking.duration_minutes or 60)
+    if start <= datetime.now(timezone.utc):
+        return None
+    
+    # Erbjudanden som gått ut ska tillbaka i kön innan tiden matchas
+    if reopen_lapsed_offers(db):
+        db.commit()
+    
+    entry = find_best_match(
+        db, booking.farrier_id, booking.location_city,
+        start.replace(tzinfo=None), end.replace(tzinfo=None),
+        service_type=booking.service_type,
+        exclude_owner_id=booking.horse_owner_id
+    )
+    if not entry:
+        return None
+    
+    with farrier_booking_lock(db, booking.farrier_id):
+        hold_end = start + timedelta(minutes=entry.duration_minutes)
+        # Någon kan ha hunnit boka eller reservera tiden sedan avbokningen
+        if find_overlapping_bookings(db, booking.farrier_id, [(start, hold_end)], holder_id=entry.owner_id):
+            db.rollback()
+            return None
+        
+        hold = SlotHold(
+            farrier_id=booking.farrier_id,
+            holder_id=entry.owner_id,
+            scheduled_date=start.replace(tzinfo=None),
+            duration_minutes=entry.duration_minutes,
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.WAITLIST_OFFER_HOLD_SECONDS)
+        )
+        db.add(hold)
+        db.flush()
+        if not mark_notified(db, entry, booking.farrier_id, start.replace(tzinfo=None), hold.id):
+            db.rollback()
+            return None
+        db.commit()
+    
+    logger.info("Väntelistepost %s erbjuden tid %s hos hovslagare %s", entry.id, start, booking.farrier_id)
+    return entry
+
+
+def offer_freed_slot_after_cancel(db: Session, booking: Booking) -> None:
+    """
+    Erbjud tiden efter en avbokning som redan är commitad. Ett fel här loggas
+    men får inte ge fel på själva avbokningen.
+    """
+    booking_id = booking.id
+    try:
+        offer_freed_slot(db, booking)
+    except Exception:
+        db.rollback()
+        logger.exception("Kunde inte erbjuda avbokad tid (bokning %s) till väntelistan", booking_id)
+
+
+def load_bookings(db: Session, booking_ids: List[int]) -> List[Booking]:
+    """Ladda bokningar med relationer för response, i en fråga"""
+    if not booking_ids:
+        return []
+    return db.query(Booking).options(
+        joinedload(Booking.horse),
+        joinedload(Booking.farrier).joinedload(Farrier.user),
+        joinedload(Booking.horse_owner),
+        joinedload(Booking.review)
+    ).filter(Booking.id.in_(booking_ids)).order_by(Booking.scheduled_date).all()
+
+
+def apply_booking_scope(query, model, current_user: User, db: Session):
+    """Begränsa en fråga mot Booking eller ArchivedBooking till användarens egna bokningar"""
+    if current_user.role == "farrier":
+        farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
+        if farrier:
+            return query.filter(model.farrier_id == farrier.id)
+        # Om hovslagarprofil saknas, returnera inga bokningar
+        return query.filter(model.id == -1)
+    if current_user.role == "admin":
+        # Admins kan se alla bokningar
+        return query
+    return query.filter(model.horse_owner_id == current_user.id)
+
+
 @router.get("/", response_model=List[BookingResponse])
 async def list_bookings(
     status_filter: Optional[str] = Query(None, description="Filtrera på status"),
+    include_archived: bool = Query(True, description="Ta med arkiverade (gamla, avslutade) bokningar"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -72,33 +315,192 @@ async def list_bookings(
         joinedload(Booking.horse_owner),
         joinedload(Booking.review)
     )
-    
-    if current_user.role == "farrier":
-        farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
-        if farrier:
-            query = query.filter(Booking.farrier_id == farrier.id)
-        else:
-            # Om hovslagarprofil saknas, returnera inga bokningar
-            query = query.filter(Booking.id == -1)
-    elif current_user.role == "admin":
-        # Admins kan se alla bokningar
-        pass
-    else:
-        query = query.filter(Booking.horse_owner_id == current_user.id)
+    query = apply_booking_scope(query, Booking, current_user, db)
     
     if status_filter:
         query = query.filter(Booking.status == status_filter)
     
     bookings = query.order_by(Booking.scheduled_date.desc()).all()
+    
+    if include_archived and (not status_filter or status_filter in ARCHIVABLE_STATUSES):
+        archived_query = db.query(ArchivedBooking).options(
+            joinedload(ArchivedBooking.horse),
+            joinedload(ArchivedBooking.farrier).joinedload(Farrier.user),
+            joinedload(ArchivedBooking.horse_owner)
+        )
+        archived_query = apply_booking_scope(archived_query, ArchivedBooking, current_user, db)
+        if status_filter:
+            archived_query = archived_query.filter(ArchivedBooking.status == status_filter)
+        archived = archived_query.order_by(ArchivedBooking.scheduled_date.desc()).all()
+        bookings = heapq.merge(bookings, archived, key=lambda b: b.scheduled_date, reverse=True)
+    
     return [booking_to_response(b) for b in bookings]
 
 
+def parse_sync_token(token: Optional[str]) -> Tuple[int, Optional[int]]:
+    """
+    Synk-token "löpnummer" (allt t.o.m. löpnumret är hämtat) eller
+    "löpnummer.boknings-id" (mitt i en sida med samma löpnummer)
+    """
+    if not token:
+        return -1, None
+    try:
+        seq, _, booking_id = token.partition(".")
+        return int(seq), int(booking_id) if booking_id else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ogiltig synk-token"
+        )
+
+
+@router.get("/changes", response_model=BookingChangesResponse)
+async def list_booking_changes(
+    since: Optional[str] = Query(None, description="Token från förra synken, utelämna för full synk"),
+    limit: int = Query(200, ge=1, le=1000),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delta-synk: bokningar som skapats, ändrats eller avbokats sedan `since`,
+    samt id:n för borttagna bokningar. Spara `token` och skicka den nästa gång.
+    Om `has_more` är sant, anropa igen direkt med den nya token.
+    """
+    since_seq, since_id = parse_sync_token(since)
+    # Allt med löpnummer <= upper är commitat, senare ändringar tas i nästa synk
+    upper = current_change_seq(db)
+
+    query = db.query(Booking).options(
+        joinedload(Booking.horse),
+        joinedload(Booking.farrier).joinedload(Farrier.user),
+        joinedload(Booking.horse_owner),
+        joinedload(Booking.review)
+    )
+    tombstones = db.query(BookingTombstone.booking_id, BookingTombstone.change_seq)
+
+    if current_user.role == "farrier":
+        farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
+        farrier_id = farrier.id if farrier else -1
+        query = query.filter(Booking.farrier_id == farrier_id)
+        tombstones = tombstones.filter(BookingTombstone.farrier_id == farrier_id)
+    elif current_user.role != "admin":
+        query = query.filter(Booking.horse_owner_id == current_user.id)
+        tombstones = tombstones.filter(BookingTombstone.horse_owner_id == current_user.id)
+
+    if since_id is None:
+        after_token = Booking.change_seq > since_seq
+    else:
+        after_token = (Booking.change_seq > since_seq) | (
+            (Booking.change_seq == since_seq) & (Booking.id > since_id)
+        )
+
+    changes = query.filter(
+        after_token,
+        Booking.change_seq <= upper
+    ).order_by(Booking.change_seq, Booking.id).limit(limit + 1).all()
+
+    has_more = len(changes) > limit
+    if has_more:
+        changes = changes[:limit]
+        last = changes[-1]
+        # Nästa sida fortsätter efter sista bokningen, även inom samma löpnummer
+        upper = last.change_seq
+        token = f"{last.change_seq}.{last.id}"
+    else:
+        token = str(upper)
+
+    deleted = tombstones.filter(
+        BookingTombstone.change_seq > since_seq,
+        BookingTombstone.change_seq <= upper
+    ).all()
+
+    return {
+        "token": token,
+        "has_more": has_more,
+        "changes": [booking_to_response(b) for b in changes],
+        "deleted": [booking_id for booking_id, _ in deleted]
+    }
+
+
+@router.get("/export")
+async def export_bookings(
+    export_format: str = Query("csv", alias="format", description="csv eller ndjson"),
+    date_from: Optional[datetime] = Query(None, description="Från och med (scheduled_date)"),
+    date_to: Optional[datetime] = Query(None, description="Till, exklusive (scheduled_date)"),
+    status_filter: Optional[str] = Query(None, description="Filtrera på status"),
+    farrier_id: Optional[int] = Query(None, description="Endast admin: filtrera på hovslagare"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Exportera bokningar för bokföring (hovslagare: egna, admin: alla). Strömmas rad för rad."""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formatet måste vara csv eller ndjson"
+        )
+    
+    if current_user.role == "farrier":
+        farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
+        if not farrier:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Hovslagarprofil hittades inte"
+            )
+        if farrier_id is not None and farrier_id != farrier.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Du kan bara exportera dina egna bokningar"
+            )
+        farrier_id = farrier.id
+    elif current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Endast hovslagare och admin kan exportera bokningar"
+        )
+    
+    filters = BookingExportFilters(
+        farrier_id=farrier_id,
+        status=status_filter,
+        date_from=to_utc(date_from).replace(tzinfo=None) if date_from else None,
+        date_to=to_utc(date_to).replace(tzinfo=None) if date_to else None,
+    )
+    if filters.date_from and filters.date_to and filters.date_from >= filters.date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Startdatum måste vara före slutdatum"
+        )
+    
+    # Exporten läser med en egen session medan svaret strömmas
+    db.close()
+    filename = f"bokningar-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    return StreamingResponse(
+        export_chunks(export_format, filters),
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# Endpoints som tar hovslagarens bokningslås är vanliga def och körs i trådpoolen,
+# så att ett anrop som väntar på låset inte blockerar event-loopen
 @router.post("/", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
-async def create_booking(
+def create_booking(
     booking_data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """Skapa en ny bokning (omförsök med samma Idempotency-Key ger samma svar)"""
+    return run_idempotent(
+        idempotency_key,
+        scope=f"bookings:{current_user.id}",
+        payload=booking_data,
+        response_model=BookingResponse,
+        status_code=status.HTTP_201_CREATED,
+        handler=lambda: _create_booking(booking_data, current_user, db)
+    )
+
+
+def _create_booking(booking_data: BookingCreate, current_user: User, db: Session) -> dict:
     """Skapa en ny bokning"""
     # Verifiera att hästen tillhör användaren
     horse = db.query(Horse).filter(
@@ -125,100 +527,51 @@ async def create_booking(
         )
     
     # Validera att bokningen är inom hovslagarens arbetsområden (om områden är angivna)
-    farrier_areas = db.query(FarrierArea).filter(FarrierArea.farrier_id == farrier.id).all()
-    travel_fee = booking_data.travel_fee or 0.0
-    
-    if farrier_areas and booking_data.location_city:
-        # Kontrollera om staden matchar något arbetsområde
-        city_match = False
-        matching_area = None
-        
-        for area in farrier_areas:
-            if area.city.lower() == booking_data.location_city.lower():
-                city_match = True
-                matching_area = area
-                # Om området har travel_fee, använd det
-                if area.travel_fee:
-                    travel_fee = area.travel_fee
-                break
-        
-        # Om ingen stad matchar, kontrollera postnummer-prefix om det finns
-        if not city_match and booking_data.location_address:
-            # Försök extrahera postnummer från adressen (t.ex. "123 45 Stockholm" eller "12345")
-            postal_match = re.search(r'\b(\d{3})\d{0,2}\b', booking_data.location_address)
-            if postal_match:
-                postal_prefix = postal_match.group(1)
-                for area in farrier_areas:
-                    if area.postal_code_prefix and area.postal_code_prefix == postal_prefix:
-                        city_match = True
-                        matching_area = area
-                        if area.travel_fee:
-                            travel_fee = area.travel_fee
-                        break
-        
-        if not city_match:
-            # Hitta matchande områden för felmeddelande
-            area_names = ", ".join([f"{area.city}" + (f" (postnr {area.postal_code_prefix}XX" if area.postal_code_prefix else "") + ")" for area in farrier_areas])
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Hovslagaren arbetar endast i följande områden: {area_names}. Din bokning är utanför dessa områden."
-            )
+    travel_fee = resolve_travel_fee(
+        db, farrier,
+        booking_data.location_city,
+        booking_data.location_address,
+        booking_data.travel_fee or 0.0
+    )
     
     # Beräkna totalpris
     total_price = booking_data.service_price + travel_fee
     
     # Ensure scheduled_date is timezone-aware and convert to UTC for storage
-    scheduled_date = booking_data.scheduled_date
-    if scheduled_date.tzinfo is None:
-        # If naive, assume it's already UTC
-        scheduled_date = scheduled_date.replace(tzinfo=timezone.utc)
-    else:
-        # Convert to UTC if timezone-aware
-        scheduled_date = scheduled_date.astimezone(timezone.utc)
+    scheduled_date = to_utc(booking_data.scheduled_date)
     
     # Kontrollera dubbelbokning - se om hovslagaren redan har en bokning vid samma tid
     duration_minutes = booking_data.duration_minutes or 60
     booking_start = scheduled_date
     booking_end = scheduled_date + timedelta(minutes=duration_minutes)
     
-    # Hitta överlappande bokningar (exkludera avbokade)
-    # Vi behöver kontrollera om någon befintlig bokning överlappar med den nya
-    existing_bookings = db.query(Booking).filter(
-        Booking.farrier_id == farrier.id,
-        Booking.status != BookingStatus.CANCELLED.value
-    ).all()
-    
-    for existing_booking in existing_bookings:
-        existing_duration = existing_booking.duration_minutes or 60
-        existing_start = existing_booking.scheduled_date
-        # Om existing_start är timezone-aware, konvertera till UTC för jämförelse
-        if existing_start.tzinfo is not None:
-            existing_start = existing_start.astimezone(timezone.utc)
-        else:
-            existing_start = existing_start.replace(tzinfo=timezone.utc)
-        existing_end = existing_start + timedelta(minutes=existing_duration)
-        
-        # Kontrollera om tiderna överlappar
-        if not (booking_end <= existing_start or booking_start >= existing_end):
-            existing_time = existing_booking.scheduled_date.strftime('%Y-%m-%d %H:%M')
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Tiden är redan bokad ({existing_time}). Välj en annan tid."
-            )
-    
     # Create booking data with UTC datetime
     booking_dict = booking_data.model_dump()
     booking_dict['scheduled_date'] = scheduled_date
     
-    # Skapa bokning
-    booking = Booking(
-        horse_owner_id=current_user.id,
-        total_price=total_price,
-        **booking_dict
-    )
-    
-    db.add(booking)
-    db.commit()
+    # Krockkontroll och insättning under hovslagarens lås, så att två samtidiga
+    # bokningar inte båda kan passera kontrollen
+    with farrier_booking_lock(db, farrier.id):
+        conflicts = find_overlapping_bookings(
+            db, farrier.id, [(booking_start, booking_end)], holder_id=current_user.id
+        )
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{conflict_detail(conflicts[0])}. Välj en annan tid."
+            )
+        
+        # Skapa bokning
+        booking = Booking(
+            horse_owner_id=current_user.id,
+            total_price=total_price,
+            **booking_dict
+        )
+        
+        db.add(booking)
+        # Reservationen har gjort sitt
+        release_holds(db, farrier.id, current_user.id, [booking_start])
+        db.commit()
     db.refresh(booking)
     
     # Ladda relationer för response
@@ -232,6 +585,368 @@ async def create_booking(
     return booking_to_response(booking)
 
 
+@router.post("/series", response_model=BookingSeriesResponse, status_code=status.HTTP_201_CREATED)
+def create_booking_series(
+    series_data: BookingSeriesCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Skapa återkommande bokningar (t.ex. verkning var 6:e vecka).
+    Häst, hovslagare, område och reseavgift valideras en gång, alla tillfällen
+    krockkontrolleras med en fråga och skapas i samma transaktion.
+    Tillfällen som krockar hoppas över och returneras i `conflicts`.
+    """
+    horse = db.query(Horse).filter(
+        Horse.id == series_data.horse_id,
+        Horse.owner_id == current_user.id
+    ).first()
+
+    if not horse:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Häst hittades inte eller tillhör inte dig"
+        )
+
+    farrier = db.query(Farrier).filter(
+        Farrier.id == series_data.farrier_id,
+        Farrier.is_available == True
+    ).first()
+
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagare hittades inte eller är ej tillgänglig"
+        )
+
+    travel_fee = resolve_travel_fee(
+        db, farrier,
+        series_data.location_city,
+        series_data.location_address,
+        series_data.travel_fee or 0.0
+    )
+    total_price = series_data.service_price + travel_fee
+
+    # Beräkna alla tillfällen enligt återkomstregeln
+    first_date = to_utc(series_data.scheduled_date)
+    duration = timedelta(minutes=series_data.duration_minutes or 60)
+    interval = timedelta(weeks=series_data.recurrence.interval_weeks)
+    intervals = [
+        (first_date + interval * i, first_date + interval * i + duration)
+        for i in range(series_data.recurrence.occurrences)
+    ]
+
+    booking_dict = series_data.model_dump(exclude={"recurrence", "scheduled_date", "travel_fee"})
+
+    with farrier_booking_lock(db, farrier.id):
+        conflicts = find_overlapping_bookings(db, farrier.id, intervals, holder_id=current_user.id)
+
+        bookings = [
+            Booking(
+                horse_owner_id=current_user.id,
+                scheduled_date=start,
+                travel_fee=travel_fee,
+                total_price=total_price,
+                **booking_dict
+            )
+            for i, (start, _) in enumerate(intervals)
+            if i not in conflicts
+        ]
+
+        if not bookings:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Alla tider i serien är redan bokade. Välj en annan tid."
+            )
+
+        db.add_all(bookings)
+        release_holds(db, farrier.id, current_user.id, [b.scheduled_date for b in bookings])
+        db.commit()
+
+    created = load_bookings(db, [b.id for b in bookings])
+
+    return {
+        "created": [booking_to_response(b) for b in created],
+        "conflicts": [
+            {
+                "occurrence": i,
+                "scheduled_date": intervals[i][0],
+                "detail": conflict_detail(existing)
+            }
+            for i, existing in sorted(conflicts.items())
+        ]
+    }
+
+
+@router.post("/stable-visit", response_model=List[BookingResponse], status_code=status.HTTP_201_CREATED)
+def create_stable_visit(
+    visit_data: StableVisitCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Boka flera egna hästar i samma stall med tider direkt efter varandra.
+    Hovslagare, område och krockar valideras en gång för hela besöket och
+    alla bokningar skapas i samma transaktion. Reseavgiften tas ut en gång,
+    på första bokningen.
+    """
+    horse_ids = [h.horse_id for h in visit_data.horses]
+    if len(set(horse_ids)) != len(horse_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Samma häst kan bara bokas en gång per besök"
+        )
+
+    owned_horse_ids = {
+        horse_id for (horse_id,) in db.query(Horse.id).filter(
+            Horse.id.in_(horse_ids),
+            Horse.owner_id == current_user.id
+        ).all()
+    }
+    if len(owned_horse_ids) != len(horse_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Häst hittades inte eller tillhör inte dig"
+        )
+
+    farrier = db.query(Farrier).filter(
+        Farrier.id == visit_data.farrier_id,
+        Farrier.is_available == True
+    ).first()
+
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagare hittades inte eller är ej tillgänglig"
+        )
+
+    travel_fee = resolve_travel_fee(
+        db, farrier,
+        visit_data.location_city,
+        visit_data.location_address,
+        visit_data.travel_fee or 0.0
+    )
+
+    # Lägg hästarna direkt efter varandra
+    intervals = []
+    start = to_utc(visit_data.scheduled_date)
+    for horse_data in visit_data.horses:
+        end = start + timedelta(minutes=horse_data.duration_minutes or 60)
+        intervals.append((start, end))
+        start = end
+
+    location = visit_data.model_dump(include={
+        "location_address", "location_city", "location_latitude", "location_longitude"
+    })
+
+    with farrier_booking_lock(db, farrier.id):
+        conflicts = find_overlapping_bookings(db, farrier.id, intervals, holder_id=current_user.id)
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{conflict_detail(next(iter(conflicts.values())))}. Välj en annan tid."
+            )
+
+        bookings = []
+        for i, (horse_data, (start, _)) in enumerate(zip(visit_data.horses, intervals)):
+            fee = travel_fee if i == 0 else 0.0
+            bookings.append(Booking(
+                horse_owner_id=current_user.id,
+                farrier_id=farrier.id,
+                scheduled_date=start,
+                travel_fee=fee,
+                total_price=horse_data.service_price + fee,
+                **horse_data.model_dump(),
+                **location
+            ))
+
+        db.add_all(bookings)
+        release_holds(db, farrier.id, current_user.id, [b.scheduled_date for b in bookings])
+        db.commit()
+
+    return [booking_to_response(b) for b in load_bookings(db, [b.id for b in bookings])]
+
+
+@router.get("/day-plan", response_model=DayPlanResponse)
+async def get_day_plan(
+    date_str: Optional[str] = Query(None, description="Datum (YYYY-MM-DD), default idag"),
+    return_to_base: bool = Query(False, description="Räkna med hemresan till basen"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Föreslå körordning för hovslagarens bokningar en dag. Rutten börjar i
+    hovslagarens bas om den är angiven, annars vid dagens första bokning.
+    """
+    if current_user.role != "farrier":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Endast hovslagare har dagsplanering"
+        )
+    
+    farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagarprofil hittades inte"
+        )
+    
+    try:
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else datetime.utcnow().date()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ogiltigt datum, använd YYYY-MM-DD"
+        )
+    
+    start_of_day = datetime.combine(target_date, datetime.min.time())
+    bookings = db.query(Booking).options(
+        joinedload(Booking.horse)
+    ).filter(
+        Booking.farrier_id == farrier.id,
+        Booking.scheduled_date >= start_of_day,
+        Booking.scheduled_date < start_of_day + timedelta(days=1),
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+    ).order_by(Booking.scheduled_date, Booking.id).all()
+    
+    def stop(booking: Booking, latitude=None, longitude=None) -> dict:
+        return {
+            "booking_id": booking.id,
+            "scheduled_date": to_utc(booking.scheduled_date),
+            "duration_minutes": booking.duration_minutes or 60,
+            "service_type": booking.service_type,
+            "horse_name": booking.horse.name if booking.horse else None,
+            "location_address": booking.location_address,
+            "location_city": booking.location_city,
+            "latitude": latitude,
+            "longitude": longitude,
+        }
+    
+    placed, unplaced = [], []
+    for booking in bookings:
+        latitude = parse_coordinate(booking.location_latitude)
+        longitude = parse_coordinate(booking.location_longitude)
+        if latitude is None or longitude is None:
+            unplaced.append(stop(booking))
+        else:
+            placed.append(stop(booking, latitude, longitude))
+    
+    # Punkt 0 är startpunkten (basen eller första bokningen), ev. basen igen sist
+    has_base = farrier.base_latitude is not None and farrier.base_longitude is not None
+    points = [(s["latitude"], s["longitude"]) for s in placed]
+    if has_base:
+        points.insert(0, (farrier.base_latitude, farrier.base_longitude))
+        if return_to_base:
+            points.append((farrier.base_latitude, farrier.base_longitude))
+    offset = 1 if has_base else 0
+    
+    total_km = scheduled_km = 0.0
+    if points:
+        matrix = distance_matrix(points)
+        fixed_end = has_base and return_to_base
+        order = plan_route(matrix, fixed_end=fixed_end)
+        total_km = route_length(order, matrix)
+        scheduled_km = route_length(list(range(len(points))), matrix)
+        
+        ordered = []
+        for previous, index in zip([None] + order, order):
+            if index < offset or index >= offset + len(placed):
+                continue  # Basen är ingen bokning
+            entry = placed[index - offset]
+            entry["leg_km"] = round(matrix[previous][index], 2) if previous is not None else 0.0
+            ordered.append(entry)
+        placed = ordered
+    
+    return {
+        "date": target_date.isoformat(),
+        "start_latitude": farrier.base_latitude if has_base else (placed[0]["latitude"] if placed else None),
+        "start_longitude": farrier.base_longitude if has_base else (placed[0]["longitude"] if placed else None),
+        "return_to_base": has_base and return_to_base,
+        "stops": placed,
+        "unplaced": unplaced,
+        "total_km": round(total_km, 2),
+        "scheduled_order_km": round(scheduled_km, 2),
+    }
+
+
+@router.post("/holds", response_model=SlotHoldResponse, status_code=status.HTTP_201_CREATED)
+def create_slot_hold(
+    hold_data: SlotHoldCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Reservera en tid i några minuter medan bokningen fylls i. Användaren har
+    högst en reservation per hovslagare, en ny ersätter den förra (erbjudanden
+    från väntelistan räknas inte). Reservationen släpps när bokningen skapas
+    eller när tiden gått ut.
+    """
+    farrier = db.query(Farrier).filter(
+        Farrier.id == hold_data.farrier_id,
+        Farrier.is_available == True
+    ).first()
+    
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagare hittades inte eller är ej tillgänglig"
+        )
+    
+    start = to_utc(hold_data.scheduled_date)
+    end = start + timedelta(minutes=hold_data.duration_minutes)
+    
+    with farrier_booking_lock(db, farrier.id):
+        evict_expired_holds(db, farrier.id)
+        conflicts = find_overlapping_bookings(db, farrier.id, [(start, end)], holder_id=current_user.id)
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"{conflict_detail(conflicts[0])}. Välj en annan tid."
+            )
+        
+        release_holds(db, farrier.id, current_user.id)
+        hold = SlotHold(
+            farrier_id=farrier.id,
+            holder_id=current_user.id,
+            scheduled_date=start.replace(tzinfo=None),
+            duration_minutes=hold_data.duration_minutes,
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.SLOT_HOLD_TTL_SECONDS)
+        )
+        db.add(hold)
+        db.commit()
+    db.refresh(hold)
+    
+    return {
+        "id": hold.id,
+        "farrier_id": hold.farrier_id,
+        "scheduled_date": to_utc(hold.scheduled_date),
+        "duration_minutes": hold.duration_minutes,
+        "expires_at": to_utc(hold.expires_at)
+    }
+
+
+@router.delete("/holds/{hold_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release_slot_hold(
+    hold_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Släpp en reservation (t.ex. när hästägaren avbryter bokningen)"""
+    hold = db.query(SlotHold).filter(
+        SlotHold.id == hold_id,
+        SlotHold.holder_id == current_user.id
+    ).first()
+    
+    if not hold:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reservationen hittades inte"
+        )
+    
+    db.delete(hold)
+    db.commit()
+
+
 @router.get("/{booking_id}", response_model=BookingResponse)
 async def get_booking(
     booking_id: int,
@@ -246,6 +961,14 @@ async def get_booking(
         joinedload(Booking.review)
     ).filter(Booking.id == booking_id).first()
     
+    if not booking:
+        # Gamla, avslutade bokningar har samma id i arkivet
+        booking = db.query(ArchivedBooking).options(
+            joinedload(ArchivedBooking.horse),
+            joinedload(ArchivedBooking.farrier).joinedload(Farrier.user),
+            joinedload(ArchivedBooking.horse_owner)
+        ).filter(ArchivedBooking.id == booking_id).first()
+    
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -267,8 +990,38 @@ async def get_booking(
     return booking_to_response(booking)
 
 
+def apply_booking_update(db: Session, booking: Booking, expected_version: int, values: dict) -> None:
+    """
+    Villkorad uppdatering: UPDATE ... WHERE id = ? AND version = ?.
+    Ger 409 om bokningen har ändrats sedan klienten (eller vi) läste den.
+    Inga radlås hålls under anropet.
+    """
+    updated = db.query(Booking).filter(
+        Booking.id == booking.id,
+        Booking.version == expected_version
+    ).update(
+        {
+            **values,
+            Booking.version: Booking.version + 1
+        },
+        synchronize_session=False
+    )
+    
+    if not updated:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bokningen har ändrats av någon annan. Ladda om och försök igen."
+        )
+    
+    # Satsen går förbi ORM-händelserna, så löpnumret och dagssammanställningen
+    # uppdateras här
+    record_booking_changes(db, [booking.id])
+    record_booking_update(db, booking, values)
+
+
 @router.put("/{booking_id}/status", response_model=BookingResponse)
-async def update_booking_status(
+def update_booking_status(
     booking_id: int,
     status_update: BookingStatusUpdate,
     current_user: User = Depends(get_current_active_user),
@@ -294,32 +1047,60 @@ async def update_booking_status(
             detail="Bokning hittades inte"
         )
     
-    booking.status = status_update.status
+    expected_version = status_update.version if status_update.version is not None else booking.version
+    if expected_version != booking.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bokningen har ändrats av någon annan. Ladda om och försök igen."
+        )
+    
+    if not can_transition(booking.status, status_update.status):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ogiltig statusändring från {booking.status} till {status_update.status}"
+        )
+    
+    now = datetime.utcnow()
+    values = {Booking.status: status_update.status}
     if status_update.notes_from_farrier:
-        booking.notes_from_farrier = status_update.notes_from_farrier
+        values[Booking.notes_from_farrier] = status_update.notes_from_farrier
+    
+    if status_update.status == BookingStatus.CANCELLED.value:
+        values[Booking.cancelled_by] = "farrier"
+        values[Booking.cancelled_at] = now
+    
+    if status_update.status == BookingStatus.COMPLETED.value:
+        values[Booking.completed_at] = now
+    
+    apply_booking_update(db, booking, expected_version, values)
     
     if status_update.status == BookingStatus.COMPLETED.value:
-        booking.completed_at = datetime.utcnow()
         # Uppdatera hästens senaste hovbesök
-        if booking.horse:
-            booking.horse.last_farrier_visit = datetime.utcnow().date()
+        db.query(Horse).filter(Horse.id == booking.horse_id).update(
+            {Horse.last_farrier_visit: now.date()},
+            synchronize_session=False
+        )
     
     db.commit()
     
+    if status_update.status == BookingStatus.CANCELLED.value:
+        offer_freed_slot_after_cancel(db, booking)
+    
     booking = db.query(Booking).options(
         joinedload(Booking.horse),
         joinedload(Booking.farrier).joinedload(Farrier.user),
         joinedload(Booking.horse_owner),
         joinedload(Booking.review)
-    ).filter(Booking.id == booking.id).first()
+    ).filter(Booking.id == booking_id).first()
     
     return booking_to_response(booking)
 
 
 @router.put("/{booking_id}/cancel", response_model=BookingResponse)
-async def cancel_booking(
+def cancel_booking(
     booking_id: int,
     cancellation_reason: Optional[str] = None,
+    version: Optional[int] = Query(None, description="Bokningens version som klienten senast såg"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -343,25 +1124,38 @@ async def cancel_booking(
             detail="Du har inte behörighet att avboka"
         )
     
-    if booking.status in [BookingStatus.COMPLETED.value, BookingStatus.CANCELLED.value]:
+    expected_version = version if version is not None else booking.version
+    if expected_version != booking.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Bokningen har ändrats av någon annan. Ladda om och försök igen."
+        )
+    
+    cancellable = can_transition(booking.status, BookingStatus.CANCELLED.value)
+    if not is_farrier:
+        cancellable = cancellable and booking.status in OWNER_CANCELLABLE_STATUSES
+    
+    if not cancellable:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Bokningen kan inte avbokas"
         )
     
-    booking.status = BookingStatus.CANCELLED.value
-    booking.cancelled_by = "farrier" if is_farrier else "owner"
-    booking.cancellation_reason = cancellation_reason
-    booking.cancelled_at = datetime.utcnow()
-    
+    apply_booking_update(db, booking, expected_version, {
+        Booking.status: BookingStatus.CANCELLED.value,
+        Booking.cancelled_by: "farrier" if is_farrier else "owner",
+        Booking.cancellation_reason: cancellation_reason,
+        Booking.cancelled_at: datetime.utcnow(),
+    })
     db.commit()
     
+    offer_freed_slot_after_cancel(db, booking)
+    
     booking = db.query(Booking).options(
         joinedload(Booking.horse),
         joinedload(Booking.farrier).joinedload(Farrier.user),
         joinedload(Booking.horse_owner),
         joinedload(Booking.review)
-    ).filter(Booking.id == booking.id).first()
+    ).filter(Booking.id == booking_id).first()
     
     return booking_to_response(booking)
-
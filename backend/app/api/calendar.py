@@ -0,0 +1,171 @@
+"""
+Kalenderflöde (iCal) för hovslagare.
+
+Kalenderappar hämtar flödet ofta (ofta var 15:e minut) och skickar med
+If-None-Match/If-Modified-Since. Valideringen görs med en enda aggregatfråga
+över hovslagarens bokningar, så oförändrade flöden besvaras med 304 utan att
+några bokningar läses. Själva flödet strömmas från en indexerad fråga över ett
+datumfönster.
+"""
+import hmac
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime as format_http_date, parsedate_to_datetime
+from typing import Iterator, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.models.booking import Booking
+from app.models.farrier import Farrier
+from app.models.horse import Horse
+from app.models.user import User
+from app.services.ical import booking_event, build_calendar
+
+router = APIRouter()
+
+# Antal rader som hämtas från databasen åt gången när flödet strömmas
+FEED_BATCH_SIZE = 500
+
+
+def feed_window(now: datetime) -> Tuple[datetime, datetime]:
+    """Datumfönstret för flödet, startar vid midnatt så att det byts en gång per dygn"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (
+        today - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS),
+        today + timedelta(days=settings.CALENDAR_FEED_FUTURE_DAYS),
+    )
+
+
+def feed_validators(db: Session, farrier: Farrier, window_start: datetime) -> Tuple[str, datetime]:
+    """
+    ETag och Last-Modified för flödet.
+
+    Senaste updated_at och löpnumret för senaste ändring ändras när en bokning
+    skapas eller ändras, antalet när en bokning tas bort. Fönstrets startdatum
+    ingår eftersom gamla bokningar faller ur flödet när dygnet byts.
+    """
+    newest_update, newest_change, booking_count = db.query(
+        func.max(Booking.updated_at),
+        func.max(Booking.change_seq),
+        func.count(Booking.id)
+    ).filter(Booking.farrier_id == farrier.id).one()
+
+    etag = '"{}-{}-{}-{}"'.format(
+        farrier.id, newest_change or 0, booking_count, window_start.strftime("%Y%m%d")
+    )
+    last_modified = max(newest_update or window_start, window_start).replace(microsecond=0)
+    return etag, last_modified
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Villkorlig GET: If-None-Match har företräde framför If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Jämförelsen är svag, proxyer kan ha lagt till W/
+        return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return last_modified <= since
+    return False
+
+
+def stream_feed_events(farrier_id: int, window_start: datetime, window_end: datetime) -> Iterator[str]:
+    """Strömma händelserna i fönstret, med egen session som lever medan svaret skickas"""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Booking.id,
+            Booking.scheduled_date,
+            Booking.duration_minutes,
+            Booking.service_type,
+            Booking.status,
+            Booking.version,
+            Booking.updated_at,
+            Booking.location_address,
+            Booking.location_city,
+            Booking.notes_from_owner,
+            Horse.name,
+            User.first_name,
+            User.last_name,
+            User.phone
+        ).join(
+            Horse, Horse.id == Booking.horse_id
+        ).join(
+            User, User.id == Booking.horse_owner_id
+        ).filter(
+            Booking.farrier_id == farrier_id,
+            Booking.scheduled_date >= window_start,
+            Booking.scheduled_date < window_end
+        ).order_by(Booking.scheduled_date, Booking.id).execution_options(yield_per=FEED_BATCH_SIZE)
+
+        for row in rows:
+            owner = f"{row.first_name} {row.last_name}"
+            description = "\n".join(part for part in [
+                f"Häst: {row.name}",
+                f"Ägare: {owner}" + (f", {row.phone}" if row.phone else ""),
+                f"Meddelande: {row.notes_from_owner}" if row.notes_from_owner else None,
+            ] if part)
+            location = ", ".join(part for part in [row.location_address, row.location_city] if part)
+            yield booking_event(
+                booking_id=row.id,
+                start=row.scheduled_date,
+                duration_minutes=row.duration_minutes,
+                summary=f"{row.service_type} – {row.name}",
+                status=row.status,
+                sequence=max((row.version or 1) - 1, 0),
+                stamp=row.updated_at or row.scheduled_date,
+                location=location,
+                description=description,
+            )
+    finally:
+        db.close()
+
+
+@router.get("/farriers/{farrier_id}.ics")
+async def farrier_calendar_feed(
+    farrier_id: int,
+    request: Request,
+    token: str = Query(..., description="Kalendertoken från /api/farriers/calendar-token"),
+    db: Session = Depends(get_db)
+):
+    """Prenumererbart kalenderflöde med hovslagarens bokningar (ingen inloggning, token i URL)"""
+    farrier = db.query(Farrier).filter(Farrier.id == farrier_id).first()
+    # Samma svar för okänd hovslagare och fel token
+    if not farrier or not farrier.calendar_token or not hmac.compare_digest(
+        farrier.calendar_token.encode(), token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Kalendern hittades inte"
+        )
+
+    window_start, window_end = feed_window(datetime.utcnow())
+    etag, last_modified = feed_validators(db, farrier, window_start)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_http_date(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    name = farrier.business_name or "Portalen"
+    # Sessionen från get_db används inte under strömningen
+    db.close()
+    return StreamingResponse(
+        build_calendar(f"{name} – bokningar", stream_feed_events(farrier_id, window_start, window_end)),
+        media_type="text/calendar",
+        headers={**headers, "Content-Disposition": f'inline; filename="portalen-{farrier_id}.ics"'},
+    )
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from typing import List, Optional
 from math import radians, cos, sin, asin, sqrt
+import secrets
 
 from app.core.database import get_db
 from app.core.security import get_current_active_user
@@ -13,8 +14,10 @@ from app.schemas.farrier import (
     FarrierServiceCreate, FarrierServiceResponse,
     FarrierScheduleCreate, FarrierScheduleUpdate, FarrierScheduleResponse,
     FarrierAreaCreate, FarrierAreaResponse,
-    FarrierSearchFilters
+    FarrierCalendarFeedResponse, FarrierSearchFilters
 )
+from app.services.area_matcher import area_matchers
+from app.services.ratings import sub_rating_averages
 
 router = APIRouter()
 
@@ -44,6 +47,7 @@ def farrier_to_response(farrier: Farrier) -> dict:
         "base_longitude": farrier.base_longitude,
         "average_rating": farrier.average_rating,
         "total_reviews": farrier.total_reviews,
+        "detailed_ratings": sub_rating_averages(farrier),
         "is_available": farrier.is_available,
         "is_verified": farrier.is_verified,
         "created_at": farrier.created_at,
@@ -60,6 +64,32 @@ def farrier_to_response(farrier: Farrier) -> dict:
     }
 
 
+def farrier_to_list_response(farrier: Farrier, distance: Optional[float] = None) -> dict:
+    """Konvertera farrier-modell till listrad med prisintervall"""
+    prices = [s.price for s in farrier.services if s.is_active]
+    return {
+        "id": farrier.id,
+        "user_id": farrier.user_id,
+        "business_name": farrier.business_name,
+        "description": farrier.description,
+        "experience_years": farrier.experience_years,
+        "average_rating": farrier.average_rating,
+        "total_reviews": farrier.total_reviews,
+        "travel_radius_km": farrier.travel_radius_km,
+        "base_latitude": farrier.base_latitude,
+        "base_longitude": farrier.base_longitude,
+        "is_available": farrier.is_available,
+        "is_verified": farrier.is_verified,
+        "user_first_name": farrier.user.first_name if farrier.user else None,
+        "user_last_name": farrier.user.last_name if farrier.user else None,
+        "user_city": farrier.user.city if farrier.user else None,
+        "user_profile_image": farrier.user.profile_image if farrier.user else None,
+        "min_price": min(prices) if prices else None,
+        "max_price": max(prices) if prices else None,
+        "distance_km": round(distance, 1) if distance else None
+    }
+
+
 @router.get("/", response_model=List[FarrierListResponse])
 async def list_farriers(
     latitude: Optional[float] = Query(None, description="Din latitud"),
@@ -97,12 +127,10 @@ async def list_farriers(
             if distance > radius_km:
                 continue
         
-        # Filter på pris
-        prices = [s.price for s in farrier.services if s.is_active]
-        min_price = min(prices) if prices else None
-        max_service_price = max(prices) if prices else None
+        item = farrier_to_list_response(farrier, distance)
         
-        if max_price and min_price and min_price > max_price:
+        # Filter på pris
+        if max_price and item["min_price"] and item["min_price"] > max_price:
             continue
         
         # Filter på tjänsttyp
@@ -111,27 +139,7 @@ async def list_farriers(
             if not any(service_type.lower() in name for name in service_names):
                 continue
         
-        results.append({
-            "id": farrier.id,
-            "user_id": farrier.user_id,
-            "business_name": farrier.business_name,
-            "description": farrier.description,
-            "experience_years": farrier.experience_years,
-            "average_rating": farrier.average_rating,
-            "total_reviews": farrier.total_reviews,
-            "travel_radius_km": farrier.travel_radius_km,
-            "base_latitude": farrier.base_latitude,
-            "base_longitude": farrier.base_longitude,
-            "is_available": farrier.is_available,
-            "is_verified": farrier.is_verified,
-            "user_first_name": farrier.user.first_name if farrier.user else None,
-            "user_last_name": farrier.user.last_name if farrier.user else None,
-            "user_city": farrier.user.city if farrier.user else None,
-            "user_profile_image": farrier.user.profile_image if farrier.user else None,
-            "min_price": min_price,
-            "max_price": max_service_price,
-            "distance_km": round(distance, 1) if distance else None
-        })
+        results.append(item)
     
     # Sortera på distans om tillgängligt
     if latitude and longitude:
@@ -142,6 +150,29 @@ async def list_farriers(
     return results
 
 
+@router.get("/serving", response_model=List[FarrierListResponse])
+async def list_farriers_serving_postal_code(
+    postal_code: str = Query(..., description="Postnummer, t.ex. 184 32"),
+    db: Session = Depends(get_db)
+):
+    """Hitta hovslagare vars arbetsområden täcker ett postnummer"""
+    farrier_ids = area_matchers.farriers_serving(db, postal_code)
+    if not farrier_ids:
+        return []
+    
+    farriers = db.query(Farrier).options(
+        joinedload(Farrier.user),
+        joinedload(Farrier.services)
+    ).filter(
+        Farrier.id.in_(farrier_ids),
+        Farrier.is_available == True
+    ).all()
+    
+    results = [farrier_to_list_response(farrier) for farrier in farriers]
+    results.sort(key=lambda x: x["average_rating"], reverse=True)
+    return results
+
+
 @router.get("/{farrier_id}", response_model=FarrierResponse)
 async def get_farrier(farrier_id: int, db: Session = Depends(get_db)):
     """Hämta specifik hovslagares profil"""
@@ -376,6 +407,7 @@ async def add_area(
     db.add(area)
     db.commit()
     db.refresh(area)
+    area_matchers.invalidate(farrier.id)
     return area
 
 
@@ -397,6 +429,38 @@ async def delete_area(
     
     db.delete(area)
     db.commit()
+    area_matchers.invalidate(farrier.id)
+
+
+# === Kalenderflöde ===
+@router.post("/calendar-token", response_model=FarrierCalendarFeedResponse)
+async def get_calendar_feed_token(
+    rotate: bool = Query(False, description="Skapa en ny token, den gamla adressen slutar fungera"),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Hämta (eller skapa) adressen till sitt kalenderflöde för prenumeration i mobilen"""
+    if current_user.role != "farrier":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Endast hovslagare har kalenderflöde"
+        )
+    
+    farrier = db.query(Farrier).filter(Farrier.user_id == current_user.id).first()
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagarprofil hittades inte"
+        )
+    
+    if rotate or not farrier.calendar_token:
+        farrier.calendar_token = secrets.token_urlsafe(32)
+        db.commit()
+    
+    return {
+        "token": farrier.calendar_token,
+        "feed_path": f"/api/calendar/farriers/{farrier.id}.ics?token={farrier.calendar_token}"
+    }
 
 
 @router.get("/stats/average-rating")
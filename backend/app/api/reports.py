@@ -0,0 +1,171 @@
+"""
+Rapportjobb för admin: beställ, följ förloppet och hämta filen när den är klar.
+Rapporterna räknas fram i bakgrunden, se app/services/reports.py. Här syns
+även omräkningar av betygsaggregat, som körs i samma kö.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List
+import json
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.security import get_admin_user
+from app.models.farrier import Farrier
+from app.models.report import ReportJob, ReportStatus
+from app.models.user import User
+from app.schemas.report import ReportJobCreate, ReportJobResponse
+from app.services.reports import (
+    MAX_REPORT_MONTHS, OUTPUT_FORMATS, REPORTS, is_stale, month_start, partial_report_path, report_job_to_response,
+    report_months, report_path, report_runner
+)
+
+router = APIRouter()
+
+ACTIVE_STATUSES = (ReportStatus.QUEUED.value, ReportStatus.RUNNING.value)
+
+
+def _get_job(db: Session, job_id: int) -> ReportJob:
+    job = db.query(ReportJob).filter(ReportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Rapportjobbet hittades inte"
+        )
+    return job
+
+
+@router.post("/", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    job_data: ReportJobCreate,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Beställ en månadsrapport. Jobbet köas och svaret kommer direkt; följ
+    förloppet med GET /{id} och hämta filen från download_url när den är klar.
+    """
+    if job_data.report_type not in REPORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Okänd rapport, välj bland: {', '.join(REPORTS)}"
+        )
+    if job_data.format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Okänt format, välj bland: {', '.join(OUTPUT_FORMATS)}"
+        )
+
+    month_from = month_start(job_data.month_from)
+    month_to = month_start(job_data.month_to)
+    if month_to < month_from:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sista månad måste vara samma som eller efter första månad"
+        )
+    if len(report_months(month_from, month_to)) > MAX_REPORT_MONTHS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"En rapport kan omfatta högst {MAX_REPORT_MONTHS} månader"
+        )
+    if job_data.farrier_id is not None and not db.query(Farrier.id).filter(
+        Farrier.id == job_data.farrier_id
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagare hittades inte"
+        )
+
+    active = db.query(ReportJob).filter(ReportJob.status.in_(ACTIVE_STATUSES)).count()
+    if active >= settings.REPORT_MAX_QUEUED_JOBS:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="För många rapporter i kö, försök igen senare"
+        )
+
+    parameters = {"month_from": month_from.isoformat(), "month_to": month_to.isoformat()}
+    if job_data.farrier_id is not None:
+        parameters["farrier_id"] = job_data.farrier_id
+    job = ReportJob(
+        report_type=job_data.report_type,
+        output_format=job_data.format,
+        parameters=json.dumps(parameters),
+        requested_by_id=current_user.id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    report_runner.submit(job.id, SessionLocal)
+    return report_job_to_response(job)
+
+
+@router.get("/", response_model=List[ReportJobResponse])
+async def list_report_jobs(
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """De senaste rapportjobben, nyast först"""
+    jobs = db.query(ReportJob).order_by(ReportJob.id.desc()).limit(50).all()
+    return [report_job_to_response(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Status och förlopp för ett rapportjobb"""
+    return report_job_to_response(_get_job(db, job_id))
+
+
+@router.get("/{job_id}/download")
+async def download_report(
+    job_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Hämta rapportfilen för ett klart jobb"""
+    job = _get_job(db, job_id)
+    if job.status != ReportStatus.COMPLETED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Rapporten är inte klar"
+        )
+    path = report_path(job)
+    if not path.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Rapportfilen finns inte längre"
+        )
+    return FileResponse(
+        path,
+        media_type=OUTPUT_FORMATS[job.output_format],
+        filename=f"{job.report_type}-{job.id}.{job.output_format}",
+    )
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_report_job(
+    job_id: int,
+    current_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ta bort ett rapportjobb och dess fil. Pågående jobb kan bara tas bort när
+    de hängt sig, dvs. inte skickat någon livssignal på REPORT_STALE_SECONDS.
+    """
+    job = _get_job(db, job_id)
+    if job.status == ReportStatus.RUNNING.value:
+        if not is_stale(job):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Rapporten räknas fram just nu, försök igen när den är klar"
+            )
+        partial_report_path(job).unlink(missing_ok=True)
+    if job.file_name:
+        report_path(job).unlink(missing_ok=True)
+    db.delete(job)
+    db.commit()
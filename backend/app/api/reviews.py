@@ -1,19 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import and_, or_, tuple_
+from typing import Optional, Tuple
 
 from app.core.database import get_db
+from app.core.idempotency import run_idempotent
 from app.core.security import get_current_active_user
 from app.models.user import User
 from app.models.review import Review
 from app.models.booking import Booking, BookingStatus
 from app.models.farrier import Farrier
-from app.schemas.review import ReviewCreate, ReviewUpdate, ReviewResponse, FarrierResponseToReview
+from app.schemas.review import (
+    ReviewCreate, ReviewUpdate, ReviewResponse, ReviewPageResponse, FarrierResponseToReview
+)
+from app.services.ratings import apply_rating_change, rating_contribution, rating_histogram
 from datetime import datetime
 
 router = APIRouter()
 
+REVIEW_SORTS = ("newest", "highest", "lowest", "with_text")
+CURSOR_TIME_FORMAT = "%Y%m%dT%H%M%S%f"
+
 
 def review_to_response(review: Review) -> dict:
     """Konvertera review till response"""
@@ -40,47 +47,113 @@ def review_to_response(review: Review) -> dict:
     }
 
 
-def update_farrier_rating(farrier_id: int, db: Session):
-    """Uppdatera hovslagarens genomsnittsbetyg"""
-    result = db.query(
-        func.avg(Review.rating),
-        func.count(Review.id)
-    ).filter(
-        Review.farrier_id == farrier_id,
-        Review.is_visible == True
-    ).first()
-    
-    avg_rating, total_reviews = result
-    
-    farrier = db.query(Farrier).filter(Farrier.id == farrier_id).first()
-    if farrier:
-        farrier.average_rating = round(avg_rating, 2) if avg_rating else 0
-        farrier.total_reviews = total_reviews or 0
-        db.commit()
+def encode_review_cursor(review: Review, sort: str) -> str:
+    """Cursor "[betyg.]skapad.id" för sista omdömet på sidan"""
+    cursor = f"{review.created_at.strftime(CURSOR_TIME_FORMAT)}.{review.id}"
+    if sort in ("highest", "lowest"):
+        cursor = f"{review.rating}.{cursor}"
+    return cursor
+
 
+def parse_review_cursor(cursor: str, sort: str) -> Tuple[Optional[int], datetime, int]:
+    try:
+        parts = cursor.split(".")
+        rating = int(parts.pop(0)) if sort in ("highest", "lowest") else None
+        created_at, review_id = parts
+        return rating, datetime.strptime(created_at, CURSOR_TIME_FORMAT), int(review_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ogiltig cursor"
+        )
 
-@router.get("/farrier/{farrier_id}", response_model=List[ReviewResponse])
+
+@router.get("/farrier/{farrier_id}", response_model=ReviewPageResponse)
 async def list_farrier_reviews(
     farrier_id: int,
+    sort: str = Query("newest", description="newest, highest, lowest eller with_text"),
+    cursor: Optional[str] = Query(None, description="next_cursor från föregående sida"),
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    """Lista omdömen för en hovslagare"""
-    reviews = db.query(Review).options(
+    """
+    Lista omdömen för en hovslagare, en sida i taget, med snittbetyg och
+    fördelning per stjärna. `with_text` visar bara omdömen med text, nyast först.
+    """
+    if sort not in REVIEW_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ogiltig sortering, välj en av: {', '.join(REVIEW_SORTS)}"
+        )
+    
+    farrier = db.query(Farrier).filter(Farrier.id == farrier_id).first()
+    if not farrier:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hovslagare hittades inte"
+        )
+    
+    query = db.query(Review).options(
         joinedload(Review.author)
     ).filter(
         Review.farrier_id == farrier_id,
         Review.is_visible == True
-    ).order_by(Review.created_at.desc()).all()
+    )
+    if sort == "with_text":
+        query = query.filter(Review.comment.isnot(None), Review.comment != "")
+    
+    # Nyast först inom samma betyg, id skiljer omdömen med samma tidpunkt åt
+    newest_first = (Review.created_at.desc(), Review.id.desc())
+    if sort == "highest":
+        query = query.order_by(Review.rating.desc(), *newest_first)
+    elif sort == "lowest":
+        query = query.order_by(Review.rating.asc(), *newest_first)
+    else:
+        query = query.order_by(*newest_first)
+    
+    if cursor:
+        rating, created_at, review_id = parse_review_cursor(cursor, sort)
+        after_in_time = tuple_(Review.created_at, Review.id) < tuple_(created_at, review_id)
+        if sort == "highest":
+            query = query.filter(
+                tuple_(Review.rating, Review.created_at, Review.id) < tuple_(rating, created_at, review_id)
+            )
+        elif sort == "lowest":
+            query = query.filter(or_(Review.rating > rating, and_(Review.rating == rating, after_in_time)))
+        else:
+            query = query.filter(after_in_time)
+    
+    reviews = query.limit(limit + 1).all()
+    next_cursor = encode_review_cursor(reviews[limit - 1], sort) if len(reviews) > limit else None
     
-    return [review_to_response(r) for r in reviews]
+    return {
+        "reviews": [review_to_response(r) for r in reviews[:limit]],
+        "next_cursor": next_cursor,
+        "average_rating": farrier.average_rating or 0,
+        "total_reviews": farrier.total_reviews or 0,
+        "histogram": rating_histogram(farrier),
+    }
 
 
 @router.post("/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_data: ReviewCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """Skapa omdöme för en slutförd bokning (omförsök med samma Idempotency-Key ger samma svar)"""
+    return run_idempotent(
+        idempotency_key,
+        scope=f"reviews:{current_user.id}",
+        payload=review_data,
+        response_model=ReviewResponse,
+        status_code=status.HTTP_201_CREATED,
+        handler=lambda: _create_review(review_data, current_user, db)
+    )
+
+
+def _create_review(review_data: ReviewCreate, current_user: User, db: Session) -> dict:
     """Skapa omdöme för en slutförd bokning"""
     # Hämta bokningen
     booking = db.query(Booking).filter(
@@ -115,11 +188,11 @@ async def create_review(
     )
     
     db.add(review)
-    db.commit()
-    db.refresh(review)
+    db.flush()
     
-    # Uppdatera hovslagarens betyg
-    update_farrier_rating(booking.farrier_id, db)
+    # Uppdatera hovslagarens betyg i samma transaktion
+    apply_rating_change(db, booking.farrier_id, {}, rating_contribution(review))
+    db.commit()
     
     review = db.query(Review).options(
         joinedload(Review.author)
@@ -147,15 +220,14 @@ async def update_review(
             detail="Omdöme hittades inte"
         )
     
+    before = rating_contribution(review)
     update_data = review_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(review, field, value)
     
+    # Uppdatera hovslagarens betyg i samma transaktion
+    apply_rating_change(db, review.farrier_id, before, rating_contribution(review))
     db.commit()
-    db.refresh(review)
-    
-    # Uppdatera hovslagarens betyg
-    update_farrier_rating(review.farrier_id, db)
     
     review = db.query(Review).options(
         joinedload(Review.author)
@@ -221,10 +293,8 @@ async def delete_review(
             detail="Omdöme hittades inte"
         )
     
-    farrier_id = review.farrier_id
+    # Uppdatera hovslagarens betyg i samma transaktion
+    apply_rating_change(db, review.farrier_id, rating_contribution(review), {})
     db.delete(review)
     db.commit()
-    
-    # Uppdatera hovslagarens betyg
-    update_farrier_rating(farrier_id, db)
 
@@ -2,11 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
 from app.core.security import get_current_active_user, get_password_hash
 from app.models.user import User
 from app.schemas.user import UserUpdate, UserResponse
 from app.schemas.auth import PasswordChange
+from app.services.user_purge import mark_users_deleted, user_purge
 
 router = APIRouter()
 
@@ -60,8 +61,9 @@ async def delete_account(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Ta bort eget konto"""
-    db.delete(current_user)
+    """Ta bort eget konto (markeras direkt, data rensas i bakgrunden)"""
+    mark_users_deleted(db, [current_user.id])
     db.commit()
+    user_purge.schedule(SessionLocal)
     return None
 
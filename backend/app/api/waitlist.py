@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime, date, time, timedelta
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_active_user
+from app.models.user import User
+from app.models.farrier import Farrier
+from app.models.horse import Horse
+from app.models.waitlist import WaitlistEntry
+from app.schemas.waitlist import WaitlistEntryCreate, WaitlistEntryResponse
+from app.services.area_matcher import normalize_city
+from app.services.waitlist import reopen_lapsed_offers
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[WaitlistEntryResponse])
+async def list_waitlist_entries(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Lista egna väntelisteposter, inklusive erbjudna tider"""
+    if reopen_lapsed_offers(db, owner_id=current_user.id):
+        db.commit()
+    return db.query(WaitlistEntry).filter(
+        WaitlistEntry.owner_id == current_user.id
+    ).order_by(WaitlistEntry.window_start).all()
+
+
+@router.post("/", response_model=WaitlistEntryResponse, status_code=status.HTTP_201_CREATED)
+async def create_waitlist_entry(
+    entry_data: WaitlistEntryCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ställ dig i kö för en tid hos en hovslagare eller i ett område.
+    Blir en tid ledig genom avbokning erbjuds den först i kön och hålls åt dig.
+    """
+    if bool(entry_data.farrier_id) == bool(entry_data.area_city and entry_data.area_city.strip()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ange antingen en hovslagare eller ett område"
+        )
+
+    if entry_data.latest_date < entry_data.earliest_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sista datum måste vara efter första datum"
+        )
+
+    if entry_data.latest_date < date.today():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tidsfönstret har redan passerat"
+        )
+
+    window_start = datetime.combine(entry_data.earliest_date, time.min)
+    window_end = datetime.combine(entry_data.latest_date, time.min) + timedelta(days=1)
+    if window_end - window_start > timedelta(days=settings.WAITLIST_MAX_WINDOW_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tidsfönstret får vara högst {settings.WAITLIST_MAX_WINDOW_DAYS} dagar"
+        )
+
+    if entry_data.farrier_id:
+        farrier = db.query(Farrier).filter(Farrier.id == entry_data.farrier_id).first()
+        if not farrier:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Hovslagare hittades inte"
+            )
+
+    if entry_data.horse_id:
+        horse = db.query(Horse).filter(
+            Horse.id == entry_data.horse_id,
+            Horse.owner_id == current_user.id
+        ).first()
+        if not horse:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Häst hittades inte"
+            )
+
+    entry = WaitlistEntry(
+        owner_id=current_user.id,
+        horse_id=entry_data.horse_id,
+        farrier_id=entry_data.farrier_id,
+        area_city=normalize_city(entry_data.area_city) if not entry_data.farrier_id else None,
+        window_start=window_start,
+        window_end=window_end,
+        service_type=entry_data.service_type,
+        duration_minutes=entry_data.duration_minutes
+    )
+    db.add(entry)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+@router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_waitlist_entry(
+    entry_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Lämna väntelistan"""
+    entry = db.query(WaitlistEntry).filter(
+        WaitlistEntry.id == entry_id,
+        WaitlistEntry.owner_id == current_user.id
+    ).first()
+
+    if not entry:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Väntelisteposten hittades inte"
+        )
+
+    db.delete(entry)
+    db.commit()
@@ -17,6 +17,50 @@ class Settings(BaseSettings):
     # App
     DEBUG: bool = True
     
+    # Idempotency-Key för omförsök av POST-anrop
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400  # 24 timmar
+    
+    # Kalenderflöde (iCal) för hovslagare: bokningar så här långt bakåt/framåt
+    CALENDAR_FEED_PAST_DAYS: int = 30
+    CALENDAR_FEED_FUTURE_DAYS: int = 365
+    
+    # Tillfällig reservation av en tid medan bokningen fylls i
+    SLOT_HOLD_TTL_SECONDS: int = 300
+    
+    # Väntelista: längsta önskade tidsfönster, och hur länge en erbjuden tid hålls
+    WAITLIST_MAX_WINDOW_DAYS: int = 60
+    WAITLIST_OFFER_HOLD_SECONDS: int = 3600
+    
+    # Arkivering av slutförda/avbokade bokningar (se archive_bookings.py)
+    BOOKING_ARCHIVE_AFTER_DAYS: int = 365
+    BOOKING_ARCHIVE_BATCH_SIZE: int = 1000
+    
+    # Omräkning av betygsaggregat, antal hovslagare per omgång (se rebuild_ratings.py)
+    RATING_RECOMPUTE_CHUNK_SIZE: int = 1000
+    
+    # Adminstatistik: ålder innan den räknas om i bakgrunden, och max ålder att visa
+    ADMIN_STATS_TTL_SECONDS: int = 60
+    ADMIN_STATS_MAX_STALE_SECONDS: int = 3600
+    
+    # Massåtgärder på användare i admin, antal användare per transaktion
+    ADMIN_BULK_BATCH_SIZE: int = 500
+    
+    # Rensning av borttagna konton, antal rader per transaktion (se purge_deleted_users.py)
+    USER_PURGE_BATCH_SIZE: int = 1000
+    
+    # Rapportjobb i bakgrunden: samtidiga jobb totalt över alla API-processer
+    # (jobben tas an med ett villkor i databasen), och max antal köade eller
+    # pågående totalt
+    REPORT_MAX_CONCURRENT_JOBS: int = 2
+    REPORT_MAX_QUEUED_JOBS: int = 20
+    # Ett pågående jobb skickar en livssignal så här ofta; har ingen kommit på
+    # REPORT_STALE_SECONDS räknas jobbet som avbrutet och markeras som misslyckat
+    REPORT_HEARTBEAT_SECONDS: int = 30
+    REPORT_STALE_SECONDS: int = 300
+    
+    # Tidszon för hovslagarnas scheman (arbetstider anges i lokal tid)
+    TIMEZONE: str = "Europe/Stockholm"
+    
     # CORS - frontend URLs (kommaseparerade i produktion)
     FRONTEND_URL: str = "http://localhost:5174"
     ALLOWED_ORIGINS: str = "http://localhost:5173,http://localhost:5174,http://localhost:3000"
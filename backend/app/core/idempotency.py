@@ -0,0 +1,154 @@
+"""
+Idempotensnycklar för POST-anrop.
+
+Klienter på dåliga uppkopplingar skickar om samma anrop. Med en
+`Idempotency-Key`-header sparas svaret (status + body) och ett omförsök får
+tillbaka det sparade svaret direkt, utan att validering eller bokningstabeller
+körs igen. Nycklarna sparas i tabellen idempotency_keys, så ett omförsök som
+hamnar hos en annan arbetsprocess (flera uvicorn-workers) känner också igen
+nyckeln; primärnyckeln (scope, nyckel) gör att bara ett anrop kan reservera
+den. Utgångna nycklar rensas efter hand.
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.idempotency import IdempotencyKey
+
+# Längsta nyckel som sparas, samma som kolumnen
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """
+    (scope, nyckel) -> (status, response body) med TTL. Varje operation är en
+    egen kort transaktion, skild från anropets session, så att reservationen
+    syns för andra processer direkt.
+    """
+
+    def __init__(self, bind: Engine, ttl_seconds: int, sweep_interval_seconds: int = 60):
+        self._bind = bind
+        self._ttl = ttl_seconds
+        self._sweep_interval = sweep_interval_seconds
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def _sweep(self, conn, now: datetime) -> None:
+        # Rensa alla utgångna nycklar högst en gång per intervall och process
+        with self._lock:
+            if time.monotonic() < self._next_sweep:
+                return
+            self._next_sweep = time.monotonic() + self._sweep_interval
+        conn.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+
+    def begin(self, scope: str, key: str, fingerprint: str) -> Optional[Tuple[int, object]]:
+        """Returnera sparat (status, body), eller reservera nyckeln för ett nytt anrop"""
+        now = datetime.utcnow()
+        where = (IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        with self._bind.begin() as conn:
+            self._sweep(conn, now)
+            conn.execute(delete(IdempotencyKey).where(*where, IdempotencyKey.expires_at <= now))
+        try:
+            with self._bind.begin() as conn:
+                conn.execute(insert(IdempotencyKey).values(
+                    scope=scope, key=key, fingerprint=fingerprint,
+                    expires_at=now + timedelta(seconds=self._ttl)
+                ))
+            return None
+        except IntegrityError:
+            pass
+
+        with self._bind.connect() as conn:
+            entry = conn.execute(
+                select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.body)
+                .where(*where)
+            ).first()
+        if entry is not None and entry.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key har redan använts för ett annat anrop"
+            )
+        # Saknas raden nu har det andra anropet just släppt den; be klienten försöka igen
+        if entry is None or entry.status_code is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ett anrop med samma Idempotency-Key pågår redan"
+            )
+        return entry.status_code, json.loads(entry.body)
+
+    def complete(self, scope: str, key: str, status_code: int, body) -> None:
+        with self._bind.begin() as conn:
+            conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+                .values(status_code=status_code, body=json.dumps(body))
+            )
+
+    def release(self, scope: str, key: str) -> None:
+        """Släpp en reserverad nyckel när anropet misslyckades oväntat"""
+        with self._bind.begin() as conn:
+            conn.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None)
+            ))
+
+
+idempotency_store = IdempotencyStore(engine, ttl_seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+
+def run_idempotent(
+    key: Optional[str],
+    scope: str,
+    payload: BaseModel,
+    response_model: Type[BaseModel],
+    status_code: int,
+    handler: Callable[[], dict]
+):
+    """
+    Kör `handler` en gång per idempotensnyckel.
+    Omförsök med samma nyckel och samma body får det sparade svaret.
+    Klientfel (HTTPException) sparas också så att omförsök får samma fel.
+    """
+    if not key:
+        return handler()
+
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key får vara högst {MAX_KEY_LENGTH} tecken"
+        )
+    fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+    stored = idempotency_store.begin(scope, key, fingerprint)
+    if stored is not None:
+        stored_status, stored_body = stored
+        return JSONResponse(
+            status_code=stored_status,
+            content=stored_body,
+            headers={"Idempotent-Replayed": "true"}
+        )
+
+    try:
+        result = handler()
+    except HTTPException as e:
+        idempotency_store.complete(scope, key, e.status_code, {"detail": e.detail})
+        raise
+    except Exception:
+        idempotency_store.release(scope, key)
+        raise
+
+    body = response_model.model_validate(result).model_dump(mode="json")
+    idempotency_store.complete(scope, key, status_code, body)
+    return result
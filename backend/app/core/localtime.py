@@ -0,0 +1,23 @@
+"""
+Omvandling mellan lokal tid och UTC.
+
+Bokningar och reservationer sparas som naiv UTC. Hovslagarnas arbetstider
+(FarrierSchedule) är klocktider i lokal tid, settings.TIMEZONE, och en lokal
+klocktid motsvarar olika UTC-tider över sommar- och vintertid.
+"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.core.config import settings
+
+LOCAL_TIMEZONE = ZoneInfo(settings.TIMEZONE)
+
+
+def local_to_utc(value: datetime) -> datetime:
+    """Naiv lokal tid -> naiv UTC"""
+    return value.replace(tzinfo=LOCAL_TIMEZONE).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def utc_to_local(value: datetime) -> datetime:
+    """Naiv UTC -> naiv lokal tid"""
+    return value.replace(tzinfo=timezone.utc).astimezone(LOCAL_TIMEZONE).replace(tzinfo=None)
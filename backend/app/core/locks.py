@@ -0,0 +1,80 @@
+"""
+Serialisering av bokningar per hovslagare.
+
+Krockkontrollen och insättningen av en bokning måste ske atomiskt, annars kan
+två samtidiga anrop båda passera kontrollen och dubbelboka. Låset tas bara för
+den aktuella hovslagaren, så bokningar hos olika hovslagare går parallellt.
+
+Låsen blockerar tråden som väntar. Endpoints som tar dem ska därför vara vanliga
+`def`, som FastAPI kör i sin trådpool, och inte `async def` där väntan skulle
+stoppa hela event-loopen.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Namnrymder för advisory locks så att nycklarna inte krockar med andra lås
+BOOKING_LOCK_NAMESPACE = 4201
+REPORT_LOCK_NAMESPACE = 4202
+
+
+class KeyedLock:
+    """Ett lås per nyckel, som tas bort när ingen längre håller eller väntar på det"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[Hashable, List] = {}  # nyckel -> [lås, antal användare]
+
+    @contextmanager
+    def hold(self, key: Hashable):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+_farrier_locks = KeyedLock()
+
+
+@contextmanager
+def farrier_booking_lock(db: Session, farrier_id: int):
+    """
+    Håll ett lås för hovslagaren från krockkontroll till commit.
+
+    Postgres: pg_advisory_xact_lock, som släpps automatiskt vid commit/rollback
+    och därför fungerar mellan flera processer. Övriga databaser: ett lås i
+    processen. På SQLite startas dessutom transaktionen med BEGIN IMMEDIATE,
+    så att databasens skrivlås serialiserar krockkontrollen mot andra processer.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+            {"namespace": BOOKING_LOCK_NAMESPACE, "key": farrier_id}
+        )
+        yield
+    else:
+        with _farrier_locks.hold(farrier_id):
+            if db.get_bind().dialect.name == "sqlite":
+                _begin_immediate(db)
+            yield
+
+
+def _begin_immediate(db: Session) -> None:
+    """
+    Ta SQLite:s skrivlås innan krockkontrollen läser. pysqlite startar annars
+    transaktionen först vid första skrivningen, efter kontrollen.
+    """
+    connection = db.connection().connection.dbapi_connection
+    if not connection.in_transaction:
+        connection.execute("BEGIN IMMEDIATE")
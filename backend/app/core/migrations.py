@@ -0,0 +1,208 @@
+"""
+Enkla schemamigreringar som körs vid uppstart.
+
+`Base.metadata.create_all` skapar bara tabeller som saknas. Kolumner och index
+som läggs till på befintliga tabeller läggs till här, idempotent, så att
+befintliga databaser (SQLite och Postgres) följer med modellerna.
+"""
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.user import normalize_email
+from app.services.daily_metrics import ensure_daily_metrics
+
+logger = logging.getLogger(__name__)
+
+# Antal dubblettgrupper som listas när email_normalized inte kan fyllas i
+MAX_REPORTED_DUPLICATES = 50
+
+
+def _review_backfill(column: str, aggregate: str, condition: str = "TRUE") -> str:
+    """Fyll i en betygskolumn på farriers från befintliga synliga omdömen"""
+    return (
+        f"UPDATE farriers SET {column} = (SELECT {aggregate} FROM reviews "
+        f"WHERE reviews.farrier_id = farriers.id AND reviews.is_visible = TRUE AND {condition})"
+    )
+
+
+# (tabell, kolumn, SQL-typ och default, ev. SQL som fyller i befintliga rader)
+ADDED_COLUMNS: List[Tuple[str, str, str, Optional[str]]] = [
+    ("bookings", "version", "INTEGER NOT NULL DEFAULT 1", None),
+    ("bookings", "change_seq", "INTEGER NOT NULL DEFAULT 0", None),
+    ("farriers", "calendar_token", "VARCHAR(64)", None),
+    ("users", "deleted_at", "TIMESTAMP", None),
+    ("report_jobs", "heartbeat_at", "TIMESTAMP", None),
+    # Fylls i av backfill_email_normalized
+    ("users", "email_normalized", "VARCHAR(255)", None),
+    ("farriers", "rating_sum", "INTEGER NOT NULL DEFAULT 0",
+     _review_backfill("rating_sum", "COALESCE(SUM(rating), 0)")),
+    *[
+        ("farriers", f"{name}_rating_{part}", "INTEGER NOT NULL DEFAULT 0",
+         _review_backfill(f"{name}_rating_{part}", f"COALESCE({function}({name}_rating), 0)"))
+        for name in ("quality", "punctuality", "communication", "price")
+        for part, function in (("sum", "SUM"), ("count", "COUNT"))
+    ],
+    *[
+        ("farriers", f"rating_{stars}_count", "INTEGER NOT NULL DEFAULT 0",
+         _review_backfill(f"rating_{stars}_count", "COUNT(*)", f"reviews.rating = {stars}"))
+        for stars in range(1, 6)
+    ],
+]
+
+
+def add_missing_columns(engine: Engine) -> None:
+    inspector = inspect(engine)
+    existing_columns = {}
+    with engine.begin() as conn:
+        for table, column, ddl, backfill in ADDED_COLUMNS:
+            if table not in existing_columns:
+                existing_columns[table] = {c["name"] for c in inspector.get_columns(table)}
+            if column in existing_columns[table]:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            if backfill:
+                conn.execute(text(backfill))
+            existing_columns[table].add(column)
+
+
+# Samma platshållare som mark_users_deleted (app/services/user_purge.py) sätter
+_DELETED_EMAIL = "'deleted-' || id || '@deleted.invalid'"
+
+
+def release_deleted_emails(engine: Engine) -> None:
+    """
+    Konton som markerades som borttagna innan e-postadressen byttes ut vid
+    borttagningen håller fortfarande adressen, så att den inte kan
+    registreras på nytt förrän kontot rensats. Byt ut den mot platshållaren.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"UPDATE users SET email = {_DELETED_EMAIL}, email_normalized = {_DELETED_EMAIL} "
+            f"WHERE deleted_at IS NOT NULL AND email <> {_DELETED_EMAIL}"
+        ))
+
+
+def email_conflicts(conn) -> Dict[str, List[Tuple[int, str, Optional[str]]]]:
+    """
+    Normaliserad adress -> konton (id, email, email_normalized) för adresser
+    som används av flera konton och bara skiljer sig i skiftläge eller blanksteg
+    """
+    accounts = defaultdict(list)
+    for user_id, email, normalized in conn.execute(
+        text("SELECT id, email, email_normalized FROM users ORDER BY id")
+    ):
+        accounts[normalized or normalize_email(email)].append((user_id, email, normalized))
+    return {normalized: rows for normalized, rows in accounts.items() if len(rows) > 1}
+
+
+def backfill_email_normalized(engine: Engine) -> None:
+    """
+    Fyll i email_normalized där den saknas, med samma normalisering som
+    inloggningen. Konton vars adresser bara skiljer sig i skiftläge eller
+    blanksteg skulle krocka i det unika indexet. De slås inte ihop eller väljs
+    automatiskt; i stället lämnas de utan värde (indexet gäller bara ifyllda
+    rader) och loggas, så att de kan lösas med resolve_duplicate_emails.py.
+    Tills dess kan de kontona inte logga in. Körs vid varje uppstart tills alla
+    rader är ifyllda.
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM users WHERE email_normalized IS NULL")).first() is None:
+            return
+
+        duplicates = email_conflicts(conn)
+        missing = [
+            {"normalized": normalize_email(email), "user_id": user_id}
+            for user_id, email in conn.execute(text("SELECT id, email FROM users WHERE email_normalized IS NULL"))
+            if normalize_email(email) not in duplicates
+        ]
+        if missing:
+            conn.execute(text("UPDATE users SET email_normalized = :normalized WHERE id = :user_id"), missing)
+            logger.info("Fyllde i email_normalized för %s användare", len(missing))
+
+        unresolved = {
+            normalized: rows for normalized, rows in duplicates.items()
+            if any(existing is None for _, _, existing in rows)
+        }
+        if unresolved:
+            report = "\n".join(
+                f"  {normalized}: " + ", ".join(f"id {user_id} <{email}>" for user_id, email, _ in rows)
+                for normalized, rows in list(unresolved.items())[:MAX_REPORTED_DUPLICATES]
+            )
+            if len(unresolved) > MAX_REPORTED_DUPLICATES:
+                report += f"\n  ... och {len(unresolved) - MAX_REPORTED_DUPLICATES} till"
+            logger.warning(
+                "%s e-postadresser används av flera konton som bara skiljer sig i skiftläge eller "
+                "blanksteg. Kontona utan email_normalized kan inte logga in förrän det lösts med "
+                "resolve_duplicate_emails.py:\n%s",
+                len(unresolved), report
+            )
+
+
+def create_missing_indexes(engine: Engine) -> None:
+    """Skapa index som definierats i modellerna men saknas i databasen"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+USER_SEARCH_EXPRESSION = "lower(email || ' ' || first_name || ' ' || last_name)"
+
+_SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE users_fts USING fts5("
+    "email, first_name, last_name, content='users', content_rowid='id', tokenize='unicode61', prefix='2 3')",
+    "CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, email, first_name, last_name) "
+    "VALUES (new.id, new.email, new.first_name, new.last_name); END",
+    "CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name) "
+    "VALUES ('delete', old.id, old.email, old.first_name, old.last_name); END",
+    "CREATE TRIGGER users_fts_update AFTER UPDATE OF email, first_name, last_name ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name) "
+    "VALUES ('delete', old.id, old.email, old.first_name, old.last_name); "
+    "INSERT INTO users_fts(rowid, email, first_name, last_name) "
+    "VALUES (new.id, new.email, new.first_name, new.last_name); END",
+    # Fyll indexet med befintliga användare
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+
+def create_user_search_index(engine: Engine) -> None:
+    """Index för användarsökningen (app/services/user_search.py), dialektberoende"""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'"
+            )).first()
+            if not exists:
+                for statement in _SQLITE_FTS:
+                    conn.execute(text(statement))
+    elif dialect == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users "
+                    f"USING gin (({USER_SEARCH_EXPRESSION}) gin_trgm_ops)"
+                ))
+        except Exception:
+            # T.ex. saknad behörighet att installera tillägget: sökningen fungerar ändå, utan index
+            logger.warning("Kunde inte skapa trigramindex för användarsökning", exc_info=True)
+
+
+def run_migrations(engine: Engine) -> None:
+    add_missing_columns(engine)
+    release_deleted_emails(engine)
+    # Före indexen, så att det unika indexet byggs över ifyllda rader
+    backfill_email_normalized(engine)
+    create_missing_indexes(engine)
+    create_user_search_index(engine)
+    # Historiken i daily_metrics; görs en gång, sedan räknar händelserna löpande
+    with Session(engine) as db:
+        ensure_daily_metrics(db)
@@ -67,7 +67,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = db.query(User).filter(User.id == int(user_id), User.deleted_at.is_(None)).first()
     if user is None:
         raise credentials_exception
     return user
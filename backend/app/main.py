@@ -1,12 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import auth, users, farriers, horses, bookings, reviews, admin, availability, upload
+from app.api import auth, users, farriers, horses, bookings, reviews, admin, availability, upload, calendar, waitlist, reports
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.services.reports import recover_report_jobs
 
-# Skapa databastabeller
+# Skapa databastabeller och lägg till nya kolumner/index i befintliga
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(
     title="Portalen API",
@@ -33,8 +36,17 @@ app.include_router(horses.router, prefix="/api/horses", tags=["Hästar"])
 app.include_router(bookings.router, prefix="/api/bookings", tags=["Bokningar"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["Omdömen"])
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(reports.router, prefix="/api/admin/reports", tags=["Rapporter"])
 app.include_router(availability.router, prefix="/api/availability", tags=["Tillgänglighet"])
 app.include_router(upload.router, prefix="/api/upload", tags=["Uppladdning"])
+app.include_router(calendar.router, prefix="/api/calendar", tags=["Kalender"])
+app.include_router(waitlist.router, prefix="/api/waitlist", tags=["Väntelista"])
+
+
+@app.on_event("startup")
+def recover_background_jobs():
+    # Jobb som avbröts av omstarten markeras som misslyckade, köade jobb tas an
+    recover_report_jobs(SessionLocal)
 
 
 @app.get("/")
@@ -3,6 +3,13 @@ from app.models.farrier import Farrier, FarrierService, FarrierSchedule, Farrier
 from app.models.horse import Horse
 from app.models.booking import Booking
 from app.models.review import Review
+from app.models.sync import SyncCounter, BookingTombstone
+from app.models.archive import ArchivedBooking
+from app.models.slot_hold import SlotHold
+from app.models.waitlist import WaitlistEntry
+from app.models.rollup import DailyMetric, RollupState
+from app.models.report import ReportJob
+from app.models.idempotency import IdempotencyKey
 
 __all__ = [
     "User",
@@ -12,6 +19,15 @@ __all__ = [
     "FarrierArea",
     "Horse",
     "Booking",
-    "Review"
+    "Review",
+    "SyncCounter",
+    "BookingTombstone",
+    "ArchivedBooking",
+    "SlotHold",
+    "WaitlistEntry",
+    "DailyMetric",
+    "RollupState",
+    "ReportJob",
+    "IdempotencyKey"
 ]
 
@@ -0,0 +1,61 @@
+"""
+Arkiv för gamla, avslutade bokningar.
+
+Slutförda och avbokade bokningar som är äldre än BOOKING_ARCHIVE_AFTER_DAYS
+flyttas i omgångar från `bookings` till `bookings_archive` (se
+app/services/booking_archive.py), så att den aktiva tabellen och dess index
+hålls små för överlappskontroller och tillgänglighet. Arkivraderna behåller
+sitt id, så samma boknings-id fungerar före och efter arkivering.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Table, delete, event
+from sqlalchemy.orm import foreign, relationship
+
+from app.core.database import Base
+from app.models.booking import Booking
+from app.models.farrier import Farrier
+from app.models.horse import Horse
+from app.models.user import User
+
+
+def _archive_columns():
+    """Samma kolumner som bookings, utan främmande nycklar och defaults"""
+    for column in Booking.__table__.columns:
+        yield Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+
+
+bookings_archive = Table(
+    "bookings_archive",
+    Base.metadata,
+    *_archive_columns(),
+    Column("archived_at", DateTime, default=datetime.utcnow),
+    Index("ix_bookings_archive_owner_scheduled", "horse_owner_id", "scheduled_date"),
+    Index("ix_bookings_archive_farrier_scheduled", "farrier_id", "scheduled_date"),
+    Index("ix_bookings_archive_scheduled", "scheduled_date"),
+    Index("ix_bookings_archive_horse", "horse_id"),
+)
+
+
+class ArchivedBooking(Base):
+    """Arkiverad bokning, skrivskyddad och med samma fält som Booking"""
+    __table__ = bookings_archive
+
+    horse_owner = relationship(
+        User, primaryjoin=foreign(bookings_archive.c.horse_owner_id) == User.id, viewonly=True
+    )
+    farrier = relationship(
+        Farrier, primaryjoin=foreign(bookings_archive.c.farrier_id) == Farrier.id, viewonly=True
+    )
+    horse = relationship(
+        Horse, primaryjoin=foreign(bookings_archive.c.horse_id) == Horse.id, viewonly=True
+    )
+
+    # Bokningar med omdöme arkiveras inte (omdömet pekar på bookings.id)
+    review = None
+
+
+@event.listens_for(Horse, "after_delete")
+def _delete_archived_bookings_for_horse(mapper, connection, target):
+    """Arkiverade bokningar följer med när hästen tas bort, precis som aktiva"""
+    connection.execute(delete(bookings_archive).where(bookings_archive.c.horse_id == target.id))
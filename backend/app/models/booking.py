@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -14,6 +14,31 @@ class BookingStatus(str, enum.Enum):
     CANCELLED = "cancelled"      # Avbokad
 
 
+# Tillåtna statusövergångar. Hovslagaren kan slutföra en bekräftad bokning
+# direkt, utan att först markera den som pågående.
+BOOKING_STATUS_TRANSITIONS = {
+    BookingStatus.PENDING.value: {BookingStatus.CONFIRMED.value, BookingStatus.CANCELLED.value},
+    BookingStatus.CONFIRMED.value: {
+        BookingStatus.IN_PROGRESS.value, BookingStatus.COMPLETED.value, BookingStatus.CANCELLED.value
+    },
+    BookingStatus.IN_PROGRESS.value: {BookingStatus.COMPLETED.value, BookingStatus.CANCELLED.value},
+    BookingStatus.COMPLETED.value: set(),
+    BookingStatus.CANCELLED.value: set(),
+}
+
+# Bokningar som tar upp tid i hovslagarens dag
+ACTIVE_BOOKING_STATUSES = [
+    BookingStatus.PENDING.value, BookingStatus.CONFIRMED.value, BookingStatus.IN_PROGRESS.value
+]
+
+# Hästägare kan bara avboka innan arbetet har påbörjats
+OWNER_CANCELLABLE_STATUSES = {BookingStatus.PENDING.value, BookingStatus.CONFIRMED.value}
+
+
+def can_transition(current_status: str, new_status: str) -> bool:
+    return new_status in BOOKING_STATUS_TRANSITIONS.get(current_status, set())
+
+
 class Booking(Base):
     """Bokningar mellan hästägare och hovslagare"""
     __tablename__ = "bookings"
@@ -43,6 +68,10 @@ class Booking(Base):
     
     # Status
     status = Column(String(20), default=BookingStatus.PENDING.value)
+    # Ökas vid varje statusändring, för optimistisk samtidighetskontroll
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Löpnummer för senaste ändring, för delta-synk (se app/models/sync.py)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Meddelanden
     notes_from_owner = Column(Text)  # Meddelande från hästägare
@@ -64,3 +93,11 @@ class Booking(Base):
     horse = relationship("Horse", back_populates="bookings")
     review = relationship("Review", back_populates="booking", uselist=False)
 
+    __table_args__ = (
+        Index("ix_bookings_farrier_change_seq", "farrier_id", "change_seq"),
+        Index("ix_bookings_owner_change_seq", "horse_owner_id", "change_seq"),
+        Index("ix_bookings_farrier_scheduled", "farrier_id", "scheduled_date"),
+        # Månadsrapporter över alla hovslagare (app/services/reports.py)
+        Index("ix_bookings_scheduled", "scheduled_date"),
+    )
+
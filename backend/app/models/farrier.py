@@ -22,6 +22,24 @@ class Farrier(Base):
     average_rating = Column(Float, default=0.0)
     total_reviews = Column(Integer, default=0)
     
+    # Löpande summor och antal för synliga omdömen, se app/services/ratings.py
+    rating_sum = Column(Integer, nullable=False, default=0)
+    quality_rating_sum = Column(Integer, nullable=False, default=0)
+    quality_rating_count = Column(Integer, nullable=False, default=0)
+    punctuality_rating_sum = Column(Integer, nullable=False, default=0)
+    punctuality_rating_count = Column(Integer, nullable=False, default=0)
+    communication_rating_sum = Column(Integer, nullable=False, default=0)
+    communication_rating_count = Column(Integer, nullable=False, default=0)
+    price_rating_sum = Column(Integer, nullable=False, default=0)
+    price_rating_count = Column(Integer, nullable=False, default=0)
+    
+    # Antal synliga omdömen per stjärna (1-5)
+    rating_1_count = Column(Integer, nullable=False, default=0)
+    rating_2_count = Column(Integer, nullable=False, default=0)
+    rating_3_count = Column(Integer, nullable=False, default=0)
+    rating_4_count = Column(Integer, nullable=False, default=0)
+    rating_5_count = Column(Integer, nullable=False, default=0)
+    
     # Arbetsområde (radie i km från bas)
     travel_radius_km = Column(Integer, default=50)
     base_latitude = Column(Float)
@@ -31,6 +49,9 @@ class Farrier(Base):
     is_available = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     
+    # Hemlig token för kalenderprenumeration (iCal), se app/api/calendar.py
+    calendar_token = Column(String(64), unique=True, index=True)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,21 @@
+"""
+Sparade svar för Idempotency-Key, se app/core/idempotency.py.
+
+En rad per (scope, nyckel), där scope innehåller endpoint och användare
+(t.ex. "bookings:42"). Primärnyckeln gör att bara ett anrop kan reservera
+nyckeln, även när omförsöket hamnar hos en annan arbetsprocess.
+"""
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(100), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 av request body
+    status_code = Column(Integer)  # NULL = anropet pågår
+    body = Column(Text)  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
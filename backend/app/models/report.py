@@ -0,0 +1,44 @@
+"""
+Rapportjobb som admin beställer och som räknas fram i bakgrunden.
+
+Själva rapporterna finns i app/services/reports.py. Resultatet skrivs som en
+fil i REPORTS_DIR och jobbet pekar ut den.
+"""
+from datetime import datetime
+import enum
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app.core.database import Base
+
+
+class ReportStatus(str, enum.Enum):
+    QUEUED = "queued"        # Väntar på en ledig arbetstråd
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ReportJob(Base):
+    """En beställd rapport med parametrar, förlopp och resultatfil"""
+    __tablename__ = "report_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_type = Column(String(50), nullable=False)
+    output_format = Column(String(10), nullable=False, default="csv")
+    parameters = Column(Text, nullable=False, default="{}")  # JSON
+    
+    status = Column(String(20), nullable=False, default=ReportStatus.QUEUED.value, index=True)
+    progress = Column(Integer, nullable=False, default=0)  # Procent
+    row_count = Column(Integer, nullable=False, default=0)
+    file_name = Column(String(255))
+    error = Column(Text)
+    
+    # Ingen främmande nyckel: jobbet ska finnas kvar även om admin-kontot tas bort
+    requested_by_id = Column(Integer, index=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # Livssignal från arbetstråden medan jobbet körs, se is_stale
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
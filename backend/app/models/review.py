@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -47,4 +47,9 @@ class Review(Base):
     booking = relationship("Booking", back_populates="review")
     author = relationship("User", back_populates="reviews_written", foreign_keys=[author_id])
     farrier = relationship("Farrier", back_populates="reviews")
-
+    
+    # Sidvis listning per hovslagare, se app/api/reviews.py
+    __table_args__ = (
+        Index("ix_reviews_farrier_created", "farrier_id", "is_visible", "created_at", "id"),
+        Index("ix_reviews_farrier_rating", "farrier_id", "is_visible", "rating", "created_at", "id"),
+    )
@@ -0,0 +1,261 @@
+"""
+Dagliga sammanställningar för adminstatistikens tidsserier.
+
+En rad per (dag, mått, dimension) med ett antal och en summa:
+    bookings  dimension = status   bokningar per skapad dag och nuvarande status
+    revenue                        slutförda bokningar per schemalagd dag, summa = intäkt
+    users     dimension = roll     nya användare per registreringsdag
+    reviews                        omdömen per skapad dag, summa = betygssumma
+
+Raderna hålls uppdaterade av mapper-händelser på Booking, User och Review.
+Ändringarna samlas i sessionen under transaktionen och läggs på med en upsert
+som ökar (eller minskar) antal och summa precis före commit, i samma
+transaktion. Radlåsen på de heta raderna (t.ex. dagens bokningar per status)
+hålls alltså bara från upserten till commit, inte under hela bokningen.
+Bokningarnas villkorade uppdateringar (UPDATE ... WHERE version = ?) går förbi
+ORM:en och anropar record_booking_update själva, mängdraderingen av användare
+anropar record_bulk_delete. Arkiveringen går förbi händelserna med avsikt: en
+arkiverad bokning finns kvar i historiken. backfill_daily_metrics.py räknar om
+raderna från tabellerna.
+
+Händelserna räknar bara det som händer efter driftsättningen. Historiken byggs
+upp en gång av migreringarna vid uppstart, som då sätter markeringen
+DAILY_METRICS i rollup_state. Tills markeringen finns läser adminstatistiken
+tabellerna i stället för daily_metrics.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import Column, Date, DateTime, Float, Integer, String, event, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+
+from app.core.database import Base
+from app.models.booking import Booking, BookingStatus
+from app.models.review import Review
+from app.models.user import User
+
+BOOKINGS = "bookings"
+REVENUE = "revenue"
+USERS = "users"
+REVIEWS = "reviews"
+
+# Markering i rollup_state: daily_metrics har byggts upp från hela historiken
+DAILY_METRICS = "daily_metrics"
+
+# (dag, mått, dimension) -> [antal, summa]
+MetricDeltas = Dict[Tuple[date, str, str], list]
+
+# Nyckel i Session.info för ändringar som läggs på vid commit
+_PENDING_DELTAS = "daily_metric_deltas"
+
+# Bokningsfält som påverkar sammanställningarna, i den ordning _booking_deltas läser dem
+BOOKING_ATTRIBUTES = ("created_at", "scheduled_date", "status", "total_price")
+
+
+class DailyMetric(Base):
+    """Antal och summa per dag, mått och dimension"""
+    __tablename__ = "daily_metrics"
+
+    day = Column(Date, primary_key=True)
+    metric = Column(String(30), primary_key=True)
+    dimension = Column(String(30), primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)
+
+
+class RollupState(Base):
+    """Sammanställningar som har byggts upp från tabellerna, och när"""
+    __tablename__ = "rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    completed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def _day(value) -> date:
+    return (value or datetime.utcnow()).date()
+
+
+def apply_metric_deltas(connection, deltas: MetricDeltas) -> None:
+    """Lägg på ändringarna med en upsert (INSERT ... ON CONFLICT DO UPDATE)"""
+    # Sorterade, så att samtidiga transaktioner låser raderna i samma ordning
+    rows = [
+        {"day": day, "metric": metric, "dimension": dimension, "count": count, "total": total}
+        for (day, metric, dimension), (count, total) in sorted(deltas.items())
+        if count or total
+    ]
+    if not rows:
+        return
+
+    table = DailyMetric.__table__
+    dialect_module = {"postgresql": postgresql, "sqlite": sqlite}.get(connection.dialect.name)
+    if dialect_module is None:
+        # Andra databaser: uppdatera först, lägg till raden om den saknas
+        for row in rows:
+            result = connection.execute(update(table).where(
+                table.c.day == row["day"], table.c.metric == row["metric"],
+                table.c.dimension == row["dimension"]
+            ).values(count=table.c.count + row["count"], total=table.c.total + row["total"]))
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(row))
+        return
+
+    statement = dialect_module.insert(table).values(rows)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.metric, table.c.dimension],
+        set_={
+            "count": table.c.count + statement.excluded.count,
+            "total": table.c.total + statement.excluded.total,
+        },
+    ))
+
+
+def _buffer_deltas(session: Session, deltas: MetricDeltas) -> None:
+    """Spara ändringarna i sessionen; de läggs på vid commit"""
+    pending = session.info.setdefault(_PENDING_DELTAS, _new_deltas())
+    for key, (count, total) in deltas.items():
+        pending[key][0] += count
+        pending[key][1] += total
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_pending_deltas(session):
+    session.flush()
+    deltas = session.info.pop(_PENDING_DELTAS, None)
+    if deltas:
+        apply_metric_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_deltas(session, transaction):
+    # Rollback eller close utan commit: ändringarna gäller inte
+    if transaction.parent is None:
+        session.info.pop(_PENDING_DELTAS, None)
+
+
+def _booking_deltas(deltas: MetricDeltas, values: Iterable[Tuple], sign: int) -> None:
+    for created_at, scheduled_date, status, total_price in values:
+        deltas[(_day(created_at), BOOKINGS, status or "")][0] += sign
+        if status == BookingStatus.COMPLETED.value:
+            deltas[(_day(scheduled_date), REVENUE, "")][0] += sign
+            deltas[(_day(scheduled_date), REVENUE, "")][1] += sign * (total_price or 0)
+
+
+def _previous(target, attribute: str):
+    """Värdet före ändringen i pågående flush, eller nuvarande om oförändrat"""
+    history = inspect(target).attrs[attribute].history
+    return history.deleted[0] if history.deleted else getattr(target, attribute)
+
+
+def _new_deltas() -> MetricDeltas:
+    return defaultdict(lambda: [0, 0.0])
+
+
+@event.listens_for(Booking, "after_insert")
+def _count_new_booking(mapper, connection, target):
+    deltas = _new_deltas()
+    _booking_deltas(deltas, [tuple(getattr(target, name) for name in BOOKING_ATTRIBUTES)], 1)
+    _buffer_deltas(object_session(target), deltas)
+
+
+def _count_booking_change(session: Session, before: Tuple, after: Tuple) -> None:
+    if before == after:
+        return
+    deltas = _new_deltas()
+    _booking_deltas(deltas, [before], -1)
+    _booking_deltas(deltas, [after], 1)
+    _buffer_deltas(session, deltas)
+
+
+def record_booking_update(session: Session, booking: Booking, values: dict) -> None:
+    """
+    För UPDATE-satser som går förbi ORM-händelserna (villkorade uppdateringar):
+    `booking` har fortfarande de gamla värdena, `values` är det som skrevs.
+    """
+    written = {getattr(column, "key", column): value for column, value in values.items()}
+    before = tuple(getattr(booking, name) for name in BOOKING_ATTRIBUTES)
+    after = tuple(written.get(name, getattr(booking, name)) for name in BOOKING_ATTRIBUTES)
+    _count_booking_change(session, before, after)
+
+
+def record_bulk_delete(session: Session, bookings: Iterable[Tuple] = (), users: Iterable[Tuple] = (),
+                       reviews: Iterable[Tuple] = ()) -> None:
+    """
+    För mängdraderingar som går förbi ORM-händelserna. Bokningar som tupler i
+    BOOKING_ATTRIBUTES-ordning, användare som (created_at, role) och omdömen
+    som (created_at, rating).
+    """
+    deltas = _new_deltas()
+    _booking_deltas(deltas, bookings, -1)
+    for created_at, role in users:
+        deltas[(_day(created_at), USERS, role or "")][0] -= 1
+    for created_at, rating in reviews:
+        entry = deltas[(_day(created_at), REVIEWS, "")]
+        entry[0] -= 1
+        entry[1] -= rating
+    _buffer_deltas(session, deltas)
+
+
+@event.listens_for(Booking, "after_update")
+def _count_updated_booking(mapper, connection, target):
+    _count_booking_change(
+        object_session(target),
+        tuple(_previous(target, name) for name in BOOKING_ATTRIBUTES),
+        tuple(getattr(target, name) for name in BOOKING_ATTRIBUTES),
+    )
+
+
+@event.listens_for(Booking, "after_delete")
+def _count_deleted_booking(mapper, connection, target):
+    deltas = _new_deltas()
+    _booking_deltas(deltas, [tuple(getattr(target, name) for name in BOOKING_ATTRIBUTES)], -1)
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(User, "after_insert")
+def _count_new_user(mapper, connection, target):
+    deltas = _new_deltas()
+    deltas[(_day(target.created_at), USERS, target.role or "")][0] += 1
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(User, "after_update")
+def _count_updated_user(mapper, connection, target):
+    if not inspect(target).attrs.role.history.has_changes():
+        return
+    deltas = _new_deltas()
+    day = _day(target.created_at)
+    deltas[(day, USERS, _previous(target, "role") or "")][0] -= 1
+    deltas[(day, USERS, target.role or "")][0] += 1
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(User, "after_delete")
+def _count_deleted_user(mapper, connection, target):
+    deltas = _new_deltas()
+    deltas[(_day(target.created_at), USERS, target.role or "")][0] -= 1
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(Review, "after_insert")
+def _count_new_review(mapper, connection, target):
+    deltas = _new_deltas()
+    deltas[(_day(target.created_at), REVIEWS, "")] = [1, target.rating]
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(Review, "after_update")
+def _count_updated_review(mapper, connection, target):
+    if not inspect(target).attrs.rating.history.has_changes():
+        return
+    deltas = _new_deltas()
+    deltas[(_day(target.created_at), REVIEWS, "")][1] += target.rating - _previous(target, "rating")
+    _buffer_deltas(object_session(target), deltas)
+
+
+@event.listens_for(Review, "after_delete")
+def _count_deleted_review(mapper, connection, target):
+    deltas = _new_deltas()
+    deltas[(_day(target.created_at), REVIEWS, "")] = [-1, -target.rating]
+    _buffer_deltas(object_session(target), deltas)
@@ -0,0 +1,47 @@
+"""
+Tillfälliga reservationer av tider medan en hästägare fyller i bokningen.
+
+En reservation gäller i SLOT_HOLD_TTL_SECONDS och räknas som upptagen tid i
+krockkontrollen och tillgängligheten för alla utom den som reserverat. Utgångna
+reservationer filtreras bort i frågorna och raderas lat, per hovslagare, när
+någon ändå ska skriva under hovslagarens lås (se app/api/bookings.py). Ingen
+bakgrundsstädning behövs.
+
+Reservationerna finns bara i databasen, utan någon cache i minnet framför.
+Med flera API-processer måste alla se samma reservationer, och krockkontrollen
+läser dem i samma transaktion och under samma lås som bokningarna. En cache
+per process skulle kunna släppa igenom en tid som en annan process just
+reserverat.
+
+Samma tabell används för tider som erbjuds från väntelistan
+(WaitlistEntry.offered_hold_id). De ligger kvar när hästägaren gör en egen
+reservation hos samma hovslagare.
+"""
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+
+class SlotHold(Base):
+    """Kortlivad reservation av en tid hos en hovslagare"""
+    __tablename__ = "slot_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    farrier_id = Column(Integer, ForeignKey("farriers.id", ondelete="CASCADE"), nullable=False)
+    holder_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    
+    scheduled_date = Column(DateTime, nullable=False)  # Naiv UTC, som bokningar
+    duration_minutes = Column(Integer, nullable=False, default=60)
+    expires_at = Column(DateTime, nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    farrier = relationship("Farrier")
+
+    __table_args__ = (
+        Index("ix_slot_holds_farrier_scheduled", "farrier_id", "scheduled_date"),
+        Index("ix_slot_holds_holder", "holder_id"),
+    )
@@ -0,0 +1,134 @@
+"""
+Ändringslogg för bokningar, för delta-synk till apparna.
+
+Varje ändrad bokning stämplas med ett löpnummer från en räknare i databasen.
+Under transaktionen samlas bara id:n för ändrade och borttagna bokningar i
+sessionen; precis före commit ökas räknaren och alla bokningar (och
+gravstenar) i transaktionen får det nya numret. Radlåset på räknaren hålls
+alltså bara från den sista satsen till commit, inte under hela bokningen, så
+skrivningar hos olika hovslagare köar inte bakom varandra. Låset gör samtidigt
+att numren delas ut i commit-ordning, så en klient som synkar "efter nummer N"
+kan inte missa ändringar på grund av klockskillnader eller parallella
+transaktioner. Borttagna bokningar lämnar en gravsten med löpnummer.
+"""
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import Column, Integer, String, DateTime, event, insert, select, update
+from sqlalchemy.orm import Session, object_session
+
+from app.core.database import Base
+from app.models.booking import Booking
+
+BOOKING_CHANGES = "bookings"
+
+# Nycklar i Session.info för bokningar som ska få löpnummer vid commit
+_CHANGED_BOOKINGS = "sync_changed_bookings"
+_DELETED_BOOKINGS = "sync_deleted_bookings"
+
+
+class SyncCounter(Base):
+    """Monotona räknare för ändringsloggar"""
+    __tablename__ = "sync_counters"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class BookingTombstone(Base):
+    """Borttagna bokningar, så att klienter kan ta bort dem vid delta-synk"""
+    __tablename__ = "booking_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    booking_id = Column(Integer, nullable=False)
+    farrier_id = Column(Integer, index=True)
+    horse_owner_id = Column(Integer, index=True)
+    change_seq = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+
+def next_change_seq(connection, name: str = BOOKING_CHANGES) -> int:
+    """Öka räknaren och returnera nästa löpnummer (i anroparens transaktion)"""
+    counters = SyncCounter.__table__
+    result = connection.execute(
+        update(counters).where(counters.c.name == name).values(value=counters.c.value + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(counters).values(name=name, value=1))
+        return 1
+    return connection.execute(select(counters.c.value).where(counters.c.name == name)).scalar_one()
+
+
+def current_change_seq(db: Session, name: str = BOOKING_CHANGES) -> int:
+    """Senaste utdelade löpnummer som är synligt för läsaren"""
+    value = db.query(SyncCounter.value).filter(SyncCounter.name == name).scalar()
+    return value or 0
+
+
+def record_booking_changes(session: Session, booking_ids: Iterable[int]) -> None:
+    """Ge bokningarna transaktionens löpnummer vid commit (för satser förbi ORM:en)"""
+    session.info.setdefault(_CHANGED_BOOKINGS, set()).update(booking_ids)
+
+
+def record_booking_deletions(session: Session, booking_ids: Iterable[int]) -> None:
+    """Ge gravstenarna (insatta med change_seq = 0) transaktionens löpnummer vid commit"""
+    session.info.setdefault(_DELETED_BOOKINGS, set()).update(booking_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_booking_changes(session, flush_context):
+    """Nya och ändrade bokningar i flushen (new/dirty gäller fortfarande här)"""
+    changed = [
+        obj.id for obj in session.new
+        if isinstance(obj, Booking)
+    ] + [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Booking) and session.is_modified(obj)
+    ]
+    if changed:
+        record_booking_changes(session, changed)
+
+
+@event.listens_for(Session, "before_commit")
+def _assign_change_seq(session):
+    """Öka räknaren och stämpla transaktionens bokningar, sist före commit"""
+    session.flush()
+    changed = session.info.pop(_CHANGED_BOOKINGS, None)
+    deleted = session.info.pop(_DELETED_BOOKINGS, None)
+    if not changed and not deleted:
+        return
+    connection = session.connection()
+    seq = next_change_seq(connection)
+    if changed:
+        bookings = Booking.__table__
+        connection.execute(
+            update(bookings).where(bookings.c.id.in_(changed)).values(change_seq=seq)
+        )
+    if deleted:
+        tombstones = BookingTombstone.__table__
+        connection.execute(
+            update(tombstones).where(
+                tombstones.c.booking_id.in_(deleted), tombstones.c.change_seq == 0
+            ).values(change_seq=seq)
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_booking_changes(session, transaction):
+    # Rollback eller close utan commit: inget att stämpla
+    if transaction.parent is None:
+        session.info.pop(_CHANGED_BOOKINGS, None)
+        session.info.pop(_DELETED_BOOKINGS, None)
+
+
+@event.listens_for(Booking, "after_delete")
+def _record_booking_tombstone(mapper, connection, target):
+    """Lämna en gravsten när en bokning tas bort via ORM (även kaskader)"""
+    connection.execute(insert(BookingTombstone.__table__).values(
+        booking_id=target.id,
+        farrier_id=target.farrier_id,
+        horse_owner_id=target.horse_owner_id,
+        change_seq=0,
+        deleted_at=datetime.utcnow()
+    ))
+    record_booking_deletions(object_session(target), [target.id])
@@ -1,11 +1,20 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Enum, Index, text
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 import enum
 
 from app.core.database import Base
 
 
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def _email_normalized_default(context) -> str:
+    # För inserts som går förbi ORM:en (t.ex. bulk-insert i skript)
+    return normalize_email(context.get_current_parameters().get("email"))
+
+
 class UserRole(str, enum.Enum):
     HORSE_OWNER = "horse_owner"
     FARRIER = "farrier"
@@ -17,6 +26,10 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
+    # Normaliserad e-post för inloggning och registrering, så att uppslaget går
+    # via ett vanligt unikt index i stället för lower(email) över hela tabellen.
+    # Tom för konton som krockar med ett annat konto, se backfill_email_normalized
+    email_normalized = Column(String(255), default=_email_normalized_default)
     hashed_password = Column(String(255), nullable=False)
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=False)
@@ -33,6 +46,8 @@ class User(Base):
     # Status
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
+    # Satt när kontot tagits bort; raderna rensas sedan i bakgrunden (user_purge)
+    deleted_at = Column(DateTime, index=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -47,6 +62,20 @@ class User(Base):
     reviews_written = relationship("Review", back_populates="author", foreign_keys="Review.author_id")
     farrier_profile = relationship("Farrier", back_populates="user", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Unikt bland ifyllda värden; konton utan värde (krockar som inte lösts) hålls utanför
+        Index(
+            "ix_users_email_normalized", "email_normalized", unique=True,
+            postgresql_where=text("email_normalized IS NOT NULL"),
+            sqlite_where=text("email_normalized IS NOT NULL"),
+        ),
+    )
+
+    @validates("email")
+    def _set_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email)
+        return email
+
     @property
     def full_name(self) -> str:
         return f"{self.first_name} {self.last_name}"
@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import enum
+
+from app.core.database import Base
+
+
+class WaitlistStatus(str, enum.Enum):
+    WAITING = "waiting"      # Väntar på en ledig tid
+    NOTIFIED = "notified"    # Har erbjudits en avbokad tid
+
+
+class WaitlistEntry(Base):
+    """Hästägare som vill ha en tid hos en viss hovslagare eller i ett område"""
+    __tablename__ = "waitlist_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    horse_id = Column(Integer, ForeignKey("horses.id", ondelete="SET NULL"))
+    
+    # Antingen en viss hovslagare eller ett område (normaliserat stadsnamn)
+    farrier_id = Column(Integer, ForeignKey("farriers.id", ondelete="CASCADE"))
+    area_city = Column(String(100))
+    
+    # Önskat tidsfönster, naiv UTC [window_start, window_end)
+    window_start = Column(DateTime, nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    
+    service_type = Column(String(200))
+    duration_minutes = Column(Integer, nullable=False, default=60)
+    
+    status = Column(String(20), nullable=False, default=WaitlistStatus.WAITING.value)
+    
+    # Erbjuden tid (reserveras åt hästägaren, se SlotHold)
+    offered_farrier_id = Column(Integer)
+    offered_start = Column(DateTime)
+    offered_hold_id = Column(Integer)
+    notified_at = Column(DateTime)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    owner = relationship("User")
+    farrier = relationship("Farrier", foreign_keys=[farrier_id])
+
+    # Intervallindex: en ledig tid matchas med en avgränsad indexsökning på
+    # fönstrets start, per hovslagare respektive område (se app/services/waitlist.py)
+    __table_args__ = (
+        Index("ix_waitlist_farrier_window", "farrier_id", "status", "window_start"),
+        Index("ix_waitlist_area_window", "area_city", "status", "window_start"),
+        Index("ix_waitlist_owner", "owner_id"),
+        # Erbjudanden vars reservation gått ut söks på status
+        Index("ix_waitlist_status_hold", "status", "offered_hold_id"),
+    )
@@ -1,14 +1,18 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from datetime import datetime
 
+# Längsta tillåtna bokning. Överlappskontrollen i app/api/bookings.py letar
+# bara så här långt bakåt efter bokningar som kan krocka.
+MAX_BOOKING_MINUTES = 24 * 60
+
 
 class BookingBase(BaseModel):
     farrier_id: int
     horse_id: int
     service_type: str
     scheduled_date: datetime
-    duration_minutes: int = 60
+    duration_minutes: int = Field(60, ge=1, le=MAX_BOOKING_MINUTES)
     location_address: Optional[str] = None
     location_city: Optional[str] = None
     location_latitude: Optional[str] = None
@@ -46,6 +50,7 @@ class BookingResponse(BaseModel):
     travel_fee: float
     total_price: float
     status: str
+    version: int = 1
     notes_from_owner: Optional[str] = None
     notes_from_farrier: Optional[str] = None
     cancelled_by: Optional[str] = None
@@ -68,4 +73,93 @@ class BookingResponse(BaseModel):
 class BookingStatusUpdate(BaseModel):
     status: str
     notes_from_farrier: Optional[str] = None
+    version: Optional[int] = None  # Versionen klienten senast såg, ger 409 om den ändrats
+
+
+
+class BookingRecurrence(BaseModel):
+    interval_weeks: int = Field(6, ge=1, le=52)  # Hovvård var 6-8:e vecka
+    occurrences: int = Field(..., ge=2, le=26)
+
+
+class BookingSeriesCreate(BookingBase):
+    recurrence: BookingRecurrence
+
+
+class BookingSeriesConflict(BaseModel):
+    occurrence: int  # 0 = första tillfället
+    scheduled_date: datetime
+    detail: str
+
+
+class BookingSeriesResponse(BaseModel):
+    created: List[BookingResponse]
+    conflicts: List[BookingSeriesConflict]
+
+
+class StableVisitHorse(BaseModel):
+    horse_id: int
+    service_type: str
+    service_price: float
+    duration_minutes: int = Field(60, ge=1, le=MAX_BOOKING_MINUTES)
+    notes_from_owner: Optional[str] = None
+
+
+class StableVisitCreate(BaseModel):
+    """Flera hästar i samma stall, bokade direkt efter varandra"""
+    farrier_id: int
+    scheduled_date: datetime  # Starttid för första hästen
+    location_address: Optional[str] = None
+    location_city: Optional[str] = None
+    location_latitude: Optional[str] = None
+    location_longitude: Optional[str] = None
+    travel_fee: float = 0.0
+    horses: List[StableVisitHorse] = Field(..., min_length=1, max_length=30)
 
+
+class BookingChangesResponse(BaseModel):
+    token: str  # Skickas som `since` vid nästa synk
+    has_more: bool
+    changes: List[BookingResponse]  # Nya, ändrade och avbokade bokningar
+    deleted: List[int]  # Id:n för borttagna bokningar
+
+
+class DayPlanStop(BaseModel):
+    booking_id: int
+    scheduled_date: datetime
+    duration_minutes: int
+    service_type: str
+    horse_name: Optional[str] = None
+    location_address: Optional[str] = None
+    location_city: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    leg_km: Optional[float] = None  # Körsträcka från föregående stopp
+
+
+class DayPlanResponse(BaseModel):
+    date: str
+    start_latitude: Optional[float] = None
+    start_longitude: Optional[float] = None
+    return_to_base: bool
+    stops: List[DayPlanStop]           # Föreslagen körordning
+    unplaced: List[DayPlanStop]        # Bokningar utan koordinater, i tidsordning
+    total_km: float
+    scheduled_order_km: float          # Körsträcka i bokad tidsordning, för jämförelse
+
+
+class SlotHoldCreate(BaseModel):
+    farrier_id: int
+    scheduled_date: datetime
+    duration_minutes: int = Field(60, ge=1, le=MAX_BOOKING_MINUTES)
+
+
+class SlotHoldResponse(BaseModel):
+    id: int
+    farrier_id: int
+    scheduled_date: datetime
+    duration_minutes: int
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
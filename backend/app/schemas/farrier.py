@@ -72,6 +72,15 @@ class FarrierAreaResponse(FarrierAreaBase):
         from_attributes = True
 
 
+# === Rating Schemas ===
+class FarrierDetailedRatings(BaseModel):
+    """Snitt per delbetyg, None om inget omdöme har satt delbetyget"""
+    quality: Optional[float] = None
+    punctuality: Optional[float] = None
+    communication: Optional[float] = None
+    price: Optional[float] = None
+
+
 # === Farrier Profile Schemas ===
 class FarrierBase(BaseModel):
     business_name: Optional[str] = None
@@ -103,6 +112,7 @@ class FarrierResponse(FarrierBase):
     user_id: int
     average_rating: float
     total_reviews: int
+    detailed_ratings: Optional[FarrierDetailedRatings] = None
     is_available: bool
     is_verified: bool
     created_at: datetime
@@ -156,6 +166,12 @@ class FarrierListResponse(BaseModel):
         from_attributes = True
 
 
+class FarrierCalendarFeedResponse(BaseModel):
+    """Prenumerationsadress för hovslagarens kalenderflöde (iCal)"""
+    token: str
+    feed_path: str
+
+
 class FarrierSearchFilters(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import date, datetime
+
+
+class ReportJobCreate(BaseModel):
+    report_type: str
+    format: str = "csv"
+    # Alla dagar i månaden ger samma månad
+    month_from: date
+    month_to: date
+    farrier_id: Optional[int] = None
+
+
+class ReportJobResponse(BaseModel):
+    id: int
+    report_type: str
+    output_format: str
+    parameters: Dict[str, Any]
+    status: str
+    progress: int
+    row_count: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Satt när rapporten är klar
+    download_url: Optional[str] = None
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, validator
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -24,13 +24,26 @@ class ReviewCreate(ReviewBase):
 
 
 class ReviewUpdate(BaseModel):
-    rating: Optional[int] = None
+    rating: Optional[int] = None  # Kan utelämnas men inte sättas till null
     quality_rating: Optional[int] = None
     punctuality_rating: Optional[int] = None
     communication_rating: Optional[int] = None
     price_rating: Optional[int] = None
     title: Optional[str] = None
     comment: Optional[str] = None
+    
+    @validator('rating', 'quality_rating', 'punctuality_rating', 'communication_rating', 'price_rating')
+    def validate_rating(cls, v):
+        if v is not None and (v < 1 or v > 5):
+            raise ValueError('Betyg måste vara mellan 1 och 5')
+        return v
+    
+    @validator('rating')
+    def validate_rating_not_null(cls, v):
+        # Totalbetyget är obligatoriskt, bara delbetygen kan tas bort
+        if v is None:
+            raise ValueError('Betyg kan inte tas bort')
+        return v
 
 
 class ReviewResponse(ReviewBase):
@@ -53,6 +66,36 @@ class ReviewResponse(ReviewBase):
         from_attributes = True
 
 
+class ReviewPageResponse(BaseModel):
+    """En sida omdömen för en hovslagare med betygssammanfattning"""
+    reviews: List[ReviewResponse]
+    next_cursor: Optional[str] = None  # Skicka som `cursor` för nästa sida
+    average_rating: float
+    total_reviews: int
+    histogram: Dict[int, int]  # Antal omdömen per stjärna (1-5)
+
+
+class ModerationReviewResponse(ReviewResponse):
+    farrier_name: Optional[str] = None
+
+
+class ModerationQueueResponse(BaseModel):
+    reviews: List[ModerationReviewResponse]
+    next_cursor: Optional[str] = None
+
+
+class ReviewVisibilityUpdate(BaseModel):
+    review_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    is_visible: bool
+
+
+class ReviewVisibilityResult(BaseModel):
+    updated_ids: List[int]  # Bytte synlighet
+    unchanged_ids: List[int]  # Hade redan rätt synlighet
+    not_found_ids: List[int]
+    farriers_updated: int
+
+
 class FarrierResponseToReview(BaseModel):
     response: str
 
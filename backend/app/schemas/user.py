@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -56,6 +56,46 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserPageResponse(BaseModel):
+    users: List[UserResponse]
+    next_cursor: Optional[int] = None
+    # Räknas bara för första sidan; exakt upp till ett tak, därefter uppskattat
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+
+class BulkUserFilter(BaseModel):
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_verified: Optional[bool] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    search: Optional[str] = None
+
+
+class BulkUserSelection(BaseModel):
+    """Antingen user_ids eller filter"""
+    user_ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[BulkUserFilter] = None
+
+
+class BulkUserActiveUpdate(BulkUserSelection):
+    is_active: bool
+
+
+class BulkUserResult(BaseModel):
+    updated_ids: List[int] = []
+    unchanged_ids: List[int] = []  # Hade redan rätt värde
+    not_found_ids: List[int] = []
+    skipped_ids: List[int] = []  # Det egna kontot
+
+
+class BulkUserDeleteResult(BaseModel):
+    deleted_ids: List[int] = []
+    not_found_ids: List[int] = []
+    skipped_ids: List[int] = []
+
+
 class UserWithStats(UserResponse):
     total_horses: int = 0
     total_bookings: int = 0
@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import date, datetime
+
+
+class WaitlistEntryCreate(BaseModel):
+    # Ange en hovslagare eller ett område (stad)
+    farrier_id: Optional[int] = None
+    area_city: Optional[str] = None
+    horse_id: Optional[int] = None
+    earliest_date: date
+    latest_date: date
+    service_type: Optional[str] = None
+    duration_minutes: int = Field(60, ge=15, le=8 * 60)
+
+
+class WaitlistEntryResponse(BaseModel):
+    id: int
+    farrier_id: Optional[int] = None
+    area_city: Optional[str] = None
+    horse_id: Optional[int] = None
+    window_start: datetime
+    window_end: datetime
+    service_type: Optional[str] = None
+    duration_minutes: int
+    status: str
+    offered_farrier_id: Optional[int] = None
+    offered_start: Optional[datetime] = None
+    offered_hold_id: Optional[int] = None
+    notified_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
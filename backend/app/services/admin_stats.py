@@ -0,0 +1,208 @@
+"""
+Statistik för admin-dashboarden.
+
+Siffrorna läses från de dagliga sammanställningarna (daily_metrics, se
+app/models/rollup.py), som redan har antal per roll, bokningsstatus och dag,
+intäkt och betygssumma. En framräkning läser därför några rader per dag i
+stället för att skanna bokningstabellerna. Borttagna konton som ännu inte
+rensats (users.deleted_at) dras av via indexet på deleted_at. "Senaste 30
+dagarna" räknas från midnatt (UTC) för 30 dagar sedan, eftersom
+sammanställningarna är per dag.
+
+Tills daily_metrics har byggts upp från hela historiken (markeringen i
+rollup_state, som migreringarna sätter) räknas siffrorna fram från tabellerna
+med ett fåtal kombinerade aggregatfrågor i stället.
+
+Resultatet sparas som en ögonblicksbild i processen. En bild yngre än
+ADMIN_STATS_TTL_SECONDS lämnas ut direkt. En äldre bild lämnas också ut
+direkt medan en ny räknas fram i bakgrunden (stale-while-revalidate), upp
+till ADMIN_STATS_MAX_STALE_SECONDS.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.archive import ArchivedBooking
+from app.models.booking import Booking, BookingStatus
+from app.models.horse import Horse
+from app.models.review import Review
+from app.models.rollup import BOOKINGS, DailyMetric, REVENUE, REVIEWS, USERS
+from app.models.user import User
+from app.services.daily_metrics import daily_metrics_backfilled
+
+logger = logging.getLogger(__name__)
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def recent_since(now: datetime) -> datetime:
+    """Början på "senaste 30 dagarna": midnatt för 30 dagar sedan"""
+    return datetime.combine((now - timedelta(days=30)).date(), datetime.min.time())
+
+
+def _statistics(
+    now: datetime, users_by_role: dict, new_users: int, total_horses: int,
+    total_reviews: int, rating_sum: float, bookings_by_status: dict,
+    recent_bookings: int, total_revenue: float,
+) -> dict:
+    return {
+        "total_users": sum(users_by_role.values()),
+        "total_horse_owners": users_by_role.get("horse_owner", 0),
+        "total_farriers": users_by_role.get("farrier", 0),
+        "total_horses": total_horses,
+        "total_bookings": sum(bookings_by_status.values()),
+        "total_reviews": total_reviews,
+        "bookings_by_status": {key: value for key, value in bookings_by_status.items() if value},
+        "recent_bookings": recent_bookings,
+        "new_users_last_30_days": new_users,
+        "average_rating": round(rating_sum / total_reviews, 2) if total_reviews else 0,
+        "total_revenue": total_revenue,
+        "generated_at": now.replace(tzinfo=timezone.utc),
+    }
+
+
+def compute_statistics(db: Session, now: Optional[datetime] = None) -> dict:
+    """Räkna fram all dashboardstatistik ur daily_metrics (tabellerna som reserv)"""
+    now = now or datetime.utcnow()
+    if not daily_metrics_backfilled(db):
+        return compute_statistics_from_tables(db, now)
+    since = recent_since(now)
+
+    users_by_role, bookings_by_status = {}, {}
+    new_users = recent_bookings = total_reviews = 0
+    total_revenue = rating_sum = 0.0
+    rows = db.query(
+        DailyMetric.metric,
+        DailyMetric.dimension,
+        func.sum(DailyMetric.count),
+        func.sum(DailyMetric.total),
+        func.coalesce(func.sum(case((DailyMetric.day >= since.date(), DailyMetric.count), else_=0)), 0),
+    ).group_by(DailyMetric.metric, DailyMetric.dimension)
+    for metric, dimension, count, total, recent in rows:
+        if metric == USERS:
+            users_by_role[dimension] = users_by_role.get(dimension, 0) + count
+            new_users += recent
+        elif metric == BOOKINGS:
+            bookings_by_status[dimension] = bookings_by_status.get(dimension, 0) + count
+            recent_bookings += recent
+        elif metric == REVENUE:
+            total_revenue += total
+        elif metric == REVIEWS:
+            total_reviews += count
+            rating_sum += total
+
+    # Borttagna konton ligger kvar i sammanställningen tills de rensats
+    for role, count, recent in db.query(
+        User.role, func.count(User.id), _count_where(User.created_at >= since)
+    ).filter(User.deleted_at.isnot(None)).group_by(User.role):
+        users_by_role[role or ""] = users_by_role.get(role or "", 0) - count
+        new_users -= recent
+
+    total_horses = db.query(func.count(Horse.id)).scalar()
+    return _statistics(
+        now, users_by_role, new_users, total_horses, total_reviews, rating_sum,
+        bookings_by_status, recent_bookings, total_revenue,
+    )
+
+
+def compute_statistics_from_tables(db: Session, now: Optional[datetime] = None) -> dict:
+    """Samma siffror direkt från tabellerna (fem aggregatfrågor)"""
+    now = now or datetime.utcnow()
+    since = recent_since(now)
+
+    users_by_role, new_users = {}, 0
+    for role, count, recent in db.query(
+        User.role, func.count(User.id), _count_where(User.created_at >= since)
+    ).filter(User.deleted_at.is_(None)).group_by(User.role):
+        users_by_role[role or ""] = count
+        new_users += recent
+
+    total_horses = db.query(func.count(Horse.id)).scalar()
+
+    total_reviews, rating_sum = db.query(
+        func.count(Review.id), func.coalesce(func.sum(Review.rating), 0)
+    ).one()
+
+    # Bokningar räknas både i den aktiva tabellen och i arkivet, per status
+    bookings_by_status = {}
+    recent_bookings = 0
+    total_revenue = 0
+    for model in (Booking, ArchivedBooking):
+        rows = db.query(
+            model.status,
+            func.count(model.id),
+            _count_where(model.created_at >= since),
+            func.coalesce(func.sum(model.total_price), 0),
+        ).group_by(model.status).all()
+        for booking_status, count, recent, revenue in rows:
+            bookings_by_status[booking_status] = bookings_by_status.get(booking_status, 0) + count
+            recent_bookings += recent
+            # Intäkter = summan av slutförda bokningar
+            if booking_status == BookingStatus.COMPLETED.value:
+                total_revenue += revenue
+
+    return _statistics(
+        now, users_by_role, new_users, total_horses, total_reviews, rating_sum,
+        bookings_by_status, recent_bookings, total_revenue,
+    )
+
+
+class StatisticsCache:
+    """Trådsäker ögonblicksbild av statistiken med bakgrundsuppdatering"""
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_stale_seconds: Optional[int] = None):
+        self._ttl = settings.ADMIN_STATS_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._max_stale = (
+            settings.ADMIN_STATS_MAX_STALE_SECONDS if max_stale_seconds is None else max_stale_seconds
+        )
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Tuple[float, dict]] = None
+        self._refreshing = False
+
+    def get(self, session_factory: Callable[[], Session]) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshot
+            age = now - snapshot[0] if snapshot else None
+            if snapshot and age < self._ttl:
+                return snapshot[1]
+            if snapshot and age < self._max_stale:
+                # Gammal men användbar: lämna ut den och uppdatera i bakgrunden
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_in_background, args=(session_factory,), daemon=True
+                    ).start()
+                return snapshot[1]
+        return self.refresh(session_factory)
+
+    def refresh(self, session_factory: Callable[[], Session]) -> dict:
+        """Räkna fram en ny bild direkt"""
+        db = session_factory()
+        try:
+            stats = compute_statistics(db)
+        finally:
+            db.close()
+        with self._lock:
+            self._snapshot = (time.monotonic(), stats)
+        return stats
+
+    def _refresh_in_background(self, session_factory: Callable[[], Session]) -> None:
+        try:
+            self.refresh(session_factory)
+        except Exception:
+            logger.exception("Kunde inte uppdatera adminstatistiken")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+admin_statistics = StatisticsCache()
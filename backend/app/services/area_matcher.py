@@ -0,0 +1,176 @@
+"""
+Matchning av bokningsadresser mot hovslagares arbetsområden.
+
+Varje hovslagares områden kompileras till en uppslagstabell för städer och ett
+prefixträd för postnummer, och cachas per hovslagare. Ett omvänt index
+(postnummerprefix -> hovslagare) används för att svara på "vem jobbar här?"
+utan att läsa alla områdesrader.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.farrier import FarrierArea
+
+# Postnummer i adressen, t.ex. "123 45 Stockholm" eller "12345"
+POSTAL_CODE_PATTERN = re.compile(r'\b(\d{3}\s\d{2}|\d{3,5})\b')
+
+# Cachade matchare lever som längst så här länge, så att ändringar gjorda av
+# andra processer (flera uvicorn-workers) slår igenom även utan invalidering
+CACHE_TTL_SECONDS = 300
+
+
+def normalize_city(city: str) -> str:
+    return (city or "").strip().lower()
+
+
+def normalize_postal_code(value: str) -> str:
+    """Behåll bara siffrorna, "184 32" -> "18432" """
+    return "".join(ch for ch in (value or "") if ch.isdigit())
+
+
+def extract_postal_code(address: Optional[str]) -> Optional[str]:
+    """Hitta postnumret i en adress"""
+    if not address:
+        return None
+    match = POSTAL_CODE_PATTERN.search(address)
+    return normalize_postal_code(match.group(1)) if match else None
+
+
+class PostalTrie:
+    """Prefixträd över postnummersiffror"""
+
+    _VALUES = "$"
+
+    def __init__(self):
+        self._root: dict = {}
+
+    def insert(self, prefix: str, value) -> None:
+        node = self._root
+        for digit in prefix:
+            node = node.setdefault(digit, {})
+        node.setdefault(self._VALUES, []).append(value)
+
+    def matches(self, digits: str) -> List[list]:
+        """Värden för alla prefix av `digits`, kortaste prefixet först"""
+        found = []
+        node = self._root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                break
+            if self._VALUES in node:
+                found.append(node[self._VALUES])
+        return found
+
+
+@dataclass(frozen=True)
+class AreaMatch:
+    area_id: int
+    city: str
+    postal_code_prefix: Optional[str]
+    travel_fee: float
+
+
+class AreaMatcher:
+    """Förkompilerade arbetsområden för en hovslagare"""
+
+    def __init__(self, areas: List[AreaMatch]):
+        self.areas = areas
+        self._cities: Dict[str, AreaMatch] = {}
+        self._postal = PostalTrie()
+        for area in areas:
+            self._cities.setdefault(normalize_city(area.city), area)
+            prefix = normalize_postal_code(area.postal_code_prefix)
+            if prefix:
+                self._postal.insert(prefix, area)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.areas
+
+    def match(self, city: Optional[str], address: Optional[str] = None) -> Optional[AreaMatch]:
+        """Matcha först på stad, annars på längsta postnummerprefix i adressen"""
+        if city:
+            area = self._cities.get(normalize_city(city))
+            if area:
+                return area
+
+        postal_code = extract_postal_code(address)
+        if postal_code:
+            matches = self._postal.matches(postal_code)
+            if matches:
+                return matches[-1][0]
+
+        return None
+
+    def describe(self) -> str:
+        """Områdeslista för felmeddelanden"""
+        return ", ".join([f"{area.city}" + (f" (postnr {area.postal_code_prefix}XX" if area.postal_code_prefix else "") + ")" for area in self.areas])
+
+
+class AreaMatcherCache:
+    """Trådsäker cache av matchare per hovslagare plus omvänt postnummerindex"""
+
+    def __init__(self, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._matchers: Dict[int, Tuple[float, AreaMatcher]] = {}
+        self._postal_index: Optional[Tuple[float, PostalTrie]] = None
+
+    def get(self, db: Session, farrier_id: int) -> AreaMatcher:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._matchers.get(farrier_id)
+        if cached and now - cached[0] < self._ttl:
+            return cached[1]
+
+        areas = db.query(
+            FarrierArea.id, FarrierArea.city, FarrierArea.postal_code_prefix, FarrierArea.travel_fee
+        ).filter(FarrierArea.farrier_id == farrier_id).order_by(FarrierArea.id).all()
+        matcher = AreaMatcher([AreaMatch(*row) for row in areas])
+
+        with self._lock:
+            self._matchers[farrier_id] = (now, matcher)
+        return matcher
+
+    def farriers_serving(self, db: Session, postal_code: str) -> Set[int]:
+        """Hovslagare med ett arbetsområde vars postnummerprefix matchar"""
+        digits = normalize_postal_code(postal_code)
+        if not digits:
+            return set()
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._postal_index
+        if cached and now - cached[0] < self._ttl:
+            index = cached[1]
+        else:
+            index = PostalTrie()
+            rows = db.query(FarrierArea.farrier_id, FarrierArea.postal_code_prefix).filter(
+                FarrierArea.postal_code_prefix.isnot(None)
+            ).all()
+            for farrier_id, prefix in rows:
+                prefix = normalize_postal_code(prefix)
+                if prefix:
+                    index.insert(prefix, farrier_id)
+            with self._lock:
+                self._postal_index = (now, index)
+
+        return {farrier_id for values in index.matches(digits) for farrier_id in values}
+
+    def invalidate(self, farrier_id: Optional[int] = None) -> None:
+        """Släng cachad data efter att arbetsområden ändrats"""
+        with self._lock:
+            if farrier_id is None:
+                self._matchers.clear()
+            else:
+                self._matchers.pop(farrier_id, None)
+            self._postal_index = None
+
+
+area_matchers = AreaMatcherCache()
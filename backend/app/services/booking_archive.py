@@ -0,0 +1,77 @@
+"""
+Flytt av gamla, avslutade bokningar till arkivtabellen.
+
+Varje omgång väljer ut upp till `batch_size` id:n, kopierar raderna med
+INSERT ... SELECT och tar bort dem från `bookings` i samma transaktion. Korta
+transaktioner gör att arkiveringen kan köras medan appen är i drift.
+"""
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.archive import bookings_archive
+from app.models.booking import Booking, BookingStatus
+from app.models.review import Review
+
+ARCHIVABLE_STATUSES = [BookingStatus.COMPLETED.value, BookingStatus.CANCELLED.value]
+
+
+def archive_cutoff(now: Optional[datetime] = None, days: Optional[int] = None) -> datetime:
+    """Bokningar schemalagda före denna tidpunkt kan arkiveras"""
+    days = settings.BOOKING_ARCHIVE_AFTER_DAYS if days is None else days
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def archivable_conditions(cutoff: datetime) -> list:
+    """Avslutade bokningar äldre än cutoff som inte har något omdöme"""
+    has_review = select(Review.id).where(Review.booking_id == Booking.id).exists()
+    return [
+        Booking.status.in_(ARCHIVABLE_STATUSES),
+        Booking.scheduled_date < cutoff,
+        ~has_review,
+    ]
+
+
+def archivable_booking_ids(db: Session, cutoff: datetime, limit: int) -> List[int]:
+    """Nästa omgång bokningar att arkivera, äldst först"""
+    rows = db.query(Booking.id).filter(
+        *archivable_conditions(cutoff)
+    ).order_by(Booking.scheduled_date, Booking.id).limit(limit).all()
+    return [booking_id for booking_id, in rows]
+
+
+def archive_batch(db: Session, booking_ids: List[int], cutoff: datetime) -> int:
+    """Flytta en omgång bokningar till arkivet och committa"""
+    # Villkoren upprepas så att en bokning som fått omdöme sedan urvalet blir kvar
+    selected = [Booking.id.in_(booking_ids), *archivable_conditions(cutoff)]
+    columns = [column.name for column in Booking.__table__.columns]
+    source = select(
+        *[Booking.__table__.c[name] for name in columns], literal(datetime.utcnow())
+    ).where(*selected)
+    db.execute(insert(bookings_archive).from_select(columns + ["archived_at"], source))
+    # Ingen gravsten för delta-synk: bokningen finns kvar, bara i arkivet
+    result = db.execute(delete(Booking).where(*selected).execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount
+
+
+def archive_old_bookings(
+    db: Session,
+    cutoff: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Arkivera alla avslutade bokningar äldre än cutoff, returnera antal flyttade"""
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or settings.BOOKING_ARCHIVE_BATCH_SIZE
+    total = 0
+    while True:
+        booking_ids = archivable_booking_ids(db, cutoff, batch_size)
+        if not booking_ids:
+            return total
+        total += archive_batch(db, booking_ids, cutoff)
+        if on_batch:
+            on_batch(total)
@@ -0,0 +1,160 @@
+"""
+Export av bokningar som CSV eller NDJSON, för bokföring.
+
+Raderna strömmas från databasen i omgångar (yield_per, och server-side cursor
+där drivrutinen stöder det) och skrivs ut i bitar, så minnesanvändningen är
+densamma oavsett hur många bokningar exporten omfattar.
+"""
+import csv
+import heapq
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy.orm import Session, aliased
+
+from app.core.database import SessionLocal
+from app.models.archive import ArchivedBooking
+from app.models.booking import Booking
+from app.models.farrier import Farrier
+from app.models.horse import Horse
+from app.models.user import User
+from app.services.booking_archive import ARCHIVABLE_STATUSES
+
+# Rader per databasomgång respektive per utskriven bit
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_ROWS = 500
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+OwnerUser = aliased(User, name="owner_user")
+FarrierUser = aliased(User, name="farrier_user")
+
+# (kolumnnamn i exporten, bokningsfält eller uttryck i frågan)
+EXPORT_COLUMNS = [
+    ("id", "id"),
+    ("scheduled_date", "scheduled_date"),
+    ("status", "status"),
+    ("service_type", "service_type"),
+    ("duration_minutes", "duration_minutes"),
+    ("service_price", "service_price"),
+    ("travel_fee", "travel_fee"),
+    ("total_price", "total_price"),
+    ("farrier_id", "farrier_id"),
+    ("farrier_business_name", Farrier.business_name),
+    ("farrier_first_name", FarrierUser.first_name),
+    ("farrier_last_name", FarrierUser.last_name),
+    ("horse_owner_id", "horse_owner_id"),
+    ("owner_first_name", OwnerUser.first_name),
+    ("owner_last_name", OwnerUser.last_name),
+    ("owner_email", OwnerUser.email),
+    ("horse_id", "horse_id"),
+    ("horse_name", Horse.name),
+    ("location_address", "location_address"),
+    ("location_city", "location_city"),
+    ("created_at", "created_at"),
+    ("completed_at", "completed_at"),
+    ("cancelled_at", "cancelled_at"),
+    ("cancelled_by", "cancelled_by"),
+]
+EXPORT_HEADER = [name for name, _ in EXPORT_COLUMNS]
+
+
+@dataclass
+class BookingExportFilters:
+    farrier_id: Optional[int] = None
+    status: Optional[str] = None
+    date_from: Optional[datetime] = None  # Naiv UTC, inklusive
+    date_to: Optional[datetime] = None    # Naiv UTC, exklusive
+
+
+def _export_query(db: Session, model, filters: BookingExportFilters):
+    """Exportfrågan mot Booking eller ArchivedBooking, sorterad på (scheduled_date, id)"""
+    columns = [getattr(model, column) if isinstance(column, str) else column
+               for _, column in EXPORT_COLUMNS]
+    query = db.query(*columns).join(
+        Farrier, Farrier.id == model.farrier_id
+    ).join(
+        FarrierUser, FarrierUser.id == Farrier.user_id
+    ).join(
+        OwnerUser, OwnerUser.id == model.horse_owner_id
+    ).join(
+        Horse, Horse.id == model.horse_id
+    )
+
+    if filters.farrier_id is not None:
+        query = query.filter(model.farrier_id == filters.farrier_id)
+    if filters.status:
+        query = query.filter(model.status == filters.status)
+    if filters.date_from:
+        query = query.filter(model.scheduled_date >= filters.date_from)
+    if filters.date_to:
+        query = query.filter(model.scheduled_date < filters.date_to)
+
+    return query.order_by(model.scheduled_date, model.id).execution_options(
+        stream_results=True, yield_per=EXPORT_BATCH_SIZE
+    )
+
+
+def export_rows(filters: BookingExportFilters) -> Iterator[tuple]:
+    """
+    Strömma exportrader med en egen session som lever medan svaret skickas.
+    Aktiva och arkiverade bokningar läses parallellt och flätas ihop i datumordning.
+    """
+    db = SessionLocal()
+    try:
+        streams = [_export_query(db, Booking, filters)]
+        if not filters.status or filters.status in ARCHIVABLE_STATUSES:
+            streams.append(_export_query(db, ArchivedBooking, filters))
+        # Kolumn 0 är id och kolumn 1 scheduled_date
+        for row in heapq.merge(*streams, key=lambda row: (row[1], row[0])):
+            yield tuple(row)
+    finally:
+        db.close()
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    """CSV med rubrikrad, en bit per EXPORT_CHUNK_ROWS rader"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    for row in rows:
+        writer.writerow([_format_value(value) for value in row])
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    """Ett JSON-objekt per rad, en bit per EXPORT_CHUNK_ROWS rader"""
+    lines = []
+    for row in rows:
+        record = {name: _format_value(value) for name, value in zip(EXPORT_HEADER, row)}
+        lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def export_chunks(export_format: str, filters: BookingExportFilters) -> Iterator[str]:
+    rows = export_rows(filters)
+    if export_format == "csv":
+        return csv_chunks(rows)
+    return ndjson_chunks(rows)
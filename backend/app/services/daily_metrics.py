@@ -0,0 +1,187 @@
+"""
+Tidsserier och återuppbyggnad av de dagliga sammanställningarna.
+
+Se app/models/rollup.py för vad som räknas och hur raderna hålls uppdaterade.
+En tidsserie läser bara daily_metrics (högst några rader per dag), så även
+diagram över flera år kräver bara några hundra till några tusen rader.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.archive import ArchivedBooking
+from app.models.booking import Booking, BookingStatus
+from app.models.review import Review
+from app.models.rollup import BOOKINGS, DAILY_METRICS, DailyMetric, REVENUE, REVIEWS, RollupState, USERS
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Publikt namn -> (mått i daily_metrics, värde, uppdelat per dimension)
+TIMESERIES_METRICS = {
+    "bookings": (BOOKINGS, "count", True),
+    "revenue": (REVENUE, "total", False),
+    "completed_bookings": (REVENUE, "count", False),
+    "new_users": (USERS, "count", True),
+    "reviews": (REVIEWS, "count", False),
+    "average_rating": (REVIEWS, "average", False),
+}
+
+INTERVALS = ("day", "week", "month")
+
+
+def _as_date(value) -> date:
+    """func.date() ger en sträng i SQLite och ett datum i Postgres"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def bucket_start(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day: date, interval: str) -> date:
+    if interval == "week":
+        return day + timedelta(days=7)
+    if interval == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def timeseries(db: Session, metric: str, start: date, end: date, interval: str = "day") -> List[dict]:
+    """En punkt per dag, vecka eller månad från start till och med end"""
+    name, value_kind, has_breakdown = TIMESERIES_METRICS[metric]
+    rows = db.query(
+        DailyMetric.day, DailyMetric.dimension, DailyMetric.count, DailyMetric.total
+    ).filter(
+        DailyMetric.metric == name,
+        DailyMetric.day >= start,
+        DailyMetric.day <= end
+    ).all()
+
+    # bucket -> dimension -> [antal, summa]
+    buckets: Dict[date, Dict[str, list]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    for day, dimension, count, total in rows:
+        entry = buckets[bucket_start(_as_date(day), interval)][dimension]
+        entry[0] += count
+        entry[1] += total
+
+    def value(count: int, total: float):
+        if value_kind == "count":
+            return count
+        if value_kind == "average":
+            return round(total / count, 2) if count else None
+        return round(total, 2)
+
+    points = []
+    current = bucket_start(start, interval)
+    while current <= end:
+        dimensions = buckets.get(current, {})
+        count = sum(entry[0] for entry in dimensions.values())
+        total = sum(entry[1] for entry in dimensions.values())
+        points.append({
+            "date": current.isoformat(),
+            "value": value(count, total),
+            "breakdown": {
+                dimension: value(*entry) for dimension, entry in dimensions.items() if entry[0] or entry[1]
+            } if has_breakdown else None,
+        })
+        current = _next_bucket(current, interval)
+    return points
+
+
+def backfill_daily_metrics(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Räkna om sammanställningarna för dagarna start..end (default allt) från
+    bokningar (även arkiverade), användare och omdömen. Returnerar antal rader.
+    En omräkning av allt sätter markeringen som visar att daily_metrics är
+    komplett.
+    """
+    def in_range(column):
+        conditions = []
+        if start:
+            conditions.append(column >= datetime.combine(start, datetime.min.time()))
+        if end:
+            conditions.append(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        return conditions
+
+    deltas: Dict[tuple, list] = defaultdict(lambda: [0, 0.0])
+
+    for model in (Booking, ArchivedBooking):
+        day = func.date(model.created_at)
+        for booking_day, status, count in db.query(day, model.status, func.count(model.id)).filter(
+            *in_range(model.created_at)
+        ).group_by(day, model.status):
+            deltas[(_as_date(booking_day), BOOKINGS, status or "")][0] += count
+
+        day = func.date(model.scheduled_date)
+        for scheduled_day, count, revenue in db.query(
+            day, func.count(model.id), func.coalesce(func.sum(model.total_price), 0)
+        ).filter(
+            model.status == BookingStatus.COMPLETED.value, *in_range(model.scheduled_date)
+        ).group_by(day):
+            entry = deltas[(_as_date(scheduled_day), REVENUE, "")]
+            entry[0] += count
+            entry[1] += revenue
+
+    day = func.date(User.created_at)
+    for user_day, role, count in db.query(day, User.role, func.count(User.id)).filter(
+        *in_range(User.created_at)
+    ).group_by(day, User.role):
+        deltas[(_as_date(user_day), USERS, role or "")][0] += count
+
+    day = func.date(Review.created_at)
+    for review_day, count, rating_sum in db.query(day, func.count(Review.id), func.sum(Review.rating)).filter(
+        *in_range(Review.created_at)
+    ).group_by(day):
+        deltas[(_as_date(review_day), REVIEWS, "")] = [count, rating_sum or 0]
+
+    existing = db.query(DailyMetric)
+    if start:
+        existing = existing.filter(DailyMetric.day >= start)
+    if end:
+        existing = existing.filter(DailyMetric.day <= end)
+    existing.delete(synchronize_session=False)
+
+    db.bulk_insert_mappings(DailyMetric, [
+        {"day": day, "metric": metric, "dimension": dimension, "count": count, "total": total}
+        for (day, metric, dimension), (count, total) in deltas.items()
+    ])
+    if start is None and end is None:
+        db.merge(RollupState(name=DAILY_METRICS, completed_at=datetime.utcnow()))
+    db.commit()
+    return len(deltas)
+
+
+def daily_metrics_backfilled(db: Session) -> bool:
+    """Har daily_metrics byggts upp från hela historiken?"""
+    return db.query(RollupState.name).filter(RollupState.name == DAILY_METRICS).first() is not None
+
+
+def ensure_daily_metrics(db: Session) -> None:
+    """
+    Bygg upp daily_metrics från tabellerna om det inte redan gjorts. Startar
+    flera processer samtidigt kan två omräkningar krocka på primärnyckeln; den
+    som förlorar rullar tillbaka och lämnar den andras resultat.
+    """
+    if daily_metrics_backfilled(db):
+        return
+    try:
+        rows = backfill_daily_metrics(db)
+    except IntegrityError:
+        db.rollback()
+        logger.info("daily_metrics byggdes upp av en annan process")
+        return
+    logger.info("Byggde upp daily_metrics: %s dagsrader", rows)
@@ -0,0 +1,123 @@
+"""
+Generering av iCalendar-data (RFC 5545) för kalenderprenumerationer.
+
+Raderna byggs en händelse i taget så att ett flöde kan strömmas utan att hela
+kalendern hålls i minnet.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+PRODID = "-//Portalen//Bokningar//SV"
+UID_DOMAIN = "portalen.se"
+
+# RFC 5545: rader längre än 75 oktetter viks med CRLF + mellanslag
+MAX_LINE_OCTETS = 75
+
+
+def escape_text(value: Optional[str]) -> str:
+    """Escapa TEXT-värden (backslash, semikolon, komma och radbrytningar)"""
+    if not value:
+        return ""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def format_datetime(value: datetime) -> str:
+    """Naiv UTC-tid -> 20300107T100000Z"""
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def fold_line(line: str) -> str:
+    """Vik en innehållsrad till max 75 oktetter utan att dela UTF-8-tecken"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return line + "\r\n"
+
+    parts = []
+    current = ""
+    current_octets = 0
+    limit = MAX_LINE_OCTETS
+    for char in line:
+        char_octets = len(char.encode("utf-8"))
+        if current_octets + char_octets > limit:
+            parts.append(current)
+            current = ""
+            current_octets = 0
+            # Fortsättningsrader börjar med ett mellanslag
+            limit = MAX_LINE_OCTETS - 1
+        current += char
+        current_octets += char_octets
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def calendar_header(name: str) -> str:
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape_text(name)}",
+        # Förslag till kalenderappar om hur ofta flödet ska hämtas
+        "REFRESH-INTERVAL;VALUE=DURATION:PT15M",
+        "X-PUBLISHED-TTL:PT15M",
+    ]
+    return "".join(fold_line(line) for line in lines)
+
+
+def calendar_footer() -> str:
+    return "END:VCALENDAR\r\n"
+
+
+def booking_event(
+    booking_id: int,
+    start: datetime,
+    duration_minutes: Optional[int],
+    summary: str,
+    status: str,
+    sequence: int,
+    stamp: datetime,
+    location: Optional[str] = None,
+    description: Optional[str] = None,
+) -> str:
+    """En VEVENT för en bokning, avbokade markeras CANCELLED"""
+    end = start + timedelta(minutes=duration_minutes or 60)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:booking-{booking_id}@{UID_DOMAIN}",
+        f"DTSTAMP:{format_datetime(stamp)}",
+        f"LAST-MODIFIED:{format_datetime(stamp)}",
+        f"SEQUENCE:{sequence}",
+        f"DTSTART:{format_datetime(start)}",
+        f"DTEND:{format_datetime(end)}",
+        f"SUMMARY:{escape_text(summary)}",
+        f"STATUS:{ical_status(status)}",
+    ]
+    if location:
+        lines.append(f"LOCATION:{escape_text(location)}")
+    if description:
+        lines.append(f"DESCRIPTION:{escape_text(description)}")
+    lines.append("END:VEVENT")
+    return "".join(fold_line(line) for line in lines)
+
+
+def ical_status(booking_status: str) -> str:
+    if booking_status == "cancelled":
+        return "CANCELLED"
+    if booking_status == "pending":
+        return "TENTATIVE"
+    return "CONFIRMED"
+
+
+def build_calendar(name: str, events: Iterable[str]) -> Iterator[str]:
+    """Hela kalendern som en ström av textbitar"""
+    yield calendar_header(name)
+    for event in events:
+        yield event
+    yield calendar_footer()
@@ -0,0 +1,220 @@
+"""
+Löpande betygsaggregat på hovslagaren.
+
+Hovslagaren har summor och antal för totalbetyget och varje delbetyg samt antal
+omdömen per stjärna. När ett omdöme skapas, ändras eller tas bort räknas
+skillnaden mellan omdömets bidrag före och efter ut och läggs på med en relativ
+UPDATE (`summa = summa + ?`) i samma transaktion som omdömet. Samtidiga omdömen skriver då inte över varandra
+och inga omdömen behöver läsas om. `rebuild_rating_aggregates` räknar om allt
+från reviews om aggregaten någon gång skulle ha glidit isär.
+"""
+from collections import Counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import Float, Numeric, bindparam, case, cast, func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.farrier import Farrier
+from app.models.review import Review
+
+SUB_RATINGS = ("quality", "punctuality", "communication", "price")
+STARS = range(1, 6)
+
+# Alla aggregatkolumner på Farrier som härleds från synliga omdömen
+AGGREGATE_COLUMNS = ["rating_sum", "total_reviews"] + [
+    f"{name}_rating_{part}" for name in SUB_RATINGS for part in ("sum", "count")
+] + [f"rating_{stars}_count" for stars in STARS]
+
+
+def rating_contribution(review: Optional[Review]) -> Dict[str, int]:
+    """Vad ett omdöme bidrar med till hovslagarens aggregat (dolda bidrar inte)"""
+    if review is None or not review.is_visible:
+        return {}
+    return _contribution(review)
+
+
+def _contribution(review: Review) -> Dict[str, int]:
+    contribution = {"rating_sum": review.rating, "total_reviews": 1, f"rating_{review.rating}_count": 1}
+    for name in SUB_RATINGS:
+        value = getattr(review, f"{name}_rating")
+        if value is not None:
+            contribution[f"{name}_rating_sum"] = value
+            contribution[f"{name}_rating_count"] = 1
+    return contribution
+
+
+def average_expression(total, count):
+    """Snitt avrundat till två decimaler, 0 utan omdömen"""
+    # Division som flyttal och avrundning som numeric fungerar i både SQLite och Postgres
+    average = cast(cast(total, Float) / count, Numeric(10, 4))
+    return case((count > 0, func.round(average, 2)), else_=0.0)
+
+
+def apply_rating_change(
+    db: Session,
+    farrier_id: int,
+    before: Dict[str, int],
+    after: Dict[str, int],
+) -> None:
+    """
+    Lägg skillnaden mellan två bidrag på hovslagarens aggregat. Committar inte,
+    så ändringen hamnar i samma transaktion som omdömet.
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+    delta = {column: amount for column, amount in delta.items() if amount}
+    if not delta:
+        return
+
+    values = {column: getattr(Farrier, column) + amount for column, amount in delta.items()}
+    # Kolumnerna i SET läses med sina gamla värden, så snittet räknas på de nya
+    new_sum = Farrier.rating_sum + delta.get("rating_sum", 0)
+    new_count = Farrier.total_reviews + delta.get("total_reviews", 0)
+    values["average_rating"] = average_expression(new_sum, new_count)
+
+    db.execute(
+        update(Farrier).where(Farrier.id == farrier_id).values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_visibility_change(db: Session, reviews: Iterable[Review], is_visible: bool) -> int:
+    """
+    Justera aggregaten när omdömen döljs eller visas igen, en UPDATE per
+    berörd hovslagare. Omdömena ska vara de som faktiskt byter synlighet.
+    Committar inte. Returnerar antal berörda hovslagare.
+    """
+    totals: Dict[int, Counter] = {}
+    for review in reviews:
+        totals.setdefault(review.farrier_id, Counter()).update(_contribution(review))
+    for farrier_id, contribution in totals.items():
+        if is_visible:
+            apply_rating_change(db, farrier_id, {}, contribution)
+        else:
+            apply_rating_change(db, farrier_id, contribution, {})
+    return len(totals)
+
+
+def apply_review_removal(db: Session, *conditions) -> int:
+    """
+    Dra av bidragen från synliga omdömen som matchar villkoren, innan de tas
+    bort med en mängd-DELETE. En grupperad fråga och en UPDATE per berörd
+    hovslagare. Committar inte. Returnerar antal berörda hovslagare.
+    """
+    rows = db.query(Review.farrier_id, *_aggregate_columns()).filter(
+        *conditions, Review.is_visible == True
+    ).group_by(Review.farrier_id).all()
+    for row in rows:
+        contribution = row._asdict()
+        apply_rating_change(db, contribution.pop("farrier_id"), contribution, {})
+    return len(rows)
+
+
+def sub_rating_averages(farrier: Farrier) -> Dict[str, Optional[float]]:
+    """Snitt per delbetyg, None om inget omdöme har satt delbetyget"""
+    averages = {}
+    for name in SUB_RATINGS:
+        total = getattr(farrier, f"{name}_rating_sum") or 0
+        count = getattr(farrier, f"{name}_rating_count") or 0
+        averages[name] = round(total / count, 2) if count else None
+    return averages
+
+
+def rating_histogram(farrier: Farrier) -> Dict[int, int]:
+    """Antal synliga omdömen per stjärna"""
+    return {stars: getattr(farrier, f"rating_{stars}_count") or 0 for stars in STARS}
+
+
+def _farrier_id_chunks(
+    db: Session, farrier_ids: Optional[List[int]], chunk_size: int
+) -> Iterator[List[int]]:
+    """Hovslagar-id:n i stigande ordning, en omgång i taget"""
+    if farrier_ids is not None:
+        farrier_ids = sorted(set(farrier_ids))
+        for start in range(0, len(farrier_ids), chunk_size):
+            chunk = [farrier_id for farrier_id, in db.query(Farrier.id).filter(
+                Farrier.id.in_(farrier_ids[start:start + chunk_size])
+            ).order_by(Farrier.id)]
+            if chunk:
+                yield chunk
+        return
+    last_id = 0
+    while True:
+        chunk = [farrier_id for farrier_id, in db.query(Farrier.id).filter(
+            Farrier.id > last_id
+        ).order_by(Farrier.id).limit(chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def _aggregate_columns() -> list:
+    columns = [
+        func.coalesce(func.sum(Review.rating), 0).label("rating_sum"),
+        func.count(Review.id).label("total_reviews"),
+    ]
+    for name in SUB_RATINGS:
+        rating = getattr(Review, f"{name}_rating")
+        columns.append(func.coalesce(func.sum(rating), 0).label(f"{name}_rating_sum"))
+        columns.append(func.count(rating).label(f"{name}_rating_count"))
+    for stars in STARS:
+        columns.append(func.sum(case((Review.rating == stars, 1), else_=0)).label(f"rating_{stars}_count"))
+    return columns
+
+
+def _rebuild_chunk(db: Session, farrier_ids: List[int]) -> None:
+    """En grupperad aggregatfråga och en UPDATE med alla rader för omgången"""
+    aggregates = {
+        row.farrier_id: row._asdict()
+        for row in db.query(Review.farrier_id, *_aggregate_columns()).filter(
+            Review.farrier_id.in_(farrier_ids),
+            Review.is_visible == True
+        ).group_by(Review.farrier_id)
+    }
+
+    rows = []
+    for farrier_id in farrier_ids:
+        row = aggregates.get(farrier_id) or {column: 0 for column in AGGREGATE_COLUMNS}
+        values = {f"new_{column}": row[column] for column in AGGREGATE_COLUMNS}
+        values["new_average_rating"] = (
+            round(row["rating_sum"] / row["total_reviews"], 2) if row["total_reviews"] else 0.0
+        )
+        values["farrier_id"] = farrier_id
+        rows.append(values)
+
+    farriers = Farrier.__table__
+    statement = update(farriers).where(farriers.c.id == bindparam("farrier_id")).values({
+        column: bindparam(f"new_{column}") for column in AGGREGATE_COLUMNS + ["average_rating"]
+    })
+    db.execute(statement, rows)
+
+
+def rebuild_rating_aggregates(
+    db: Session,
+    farrier_ids: Optional[Iterable[int]] = None,
+    chunk_size: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, int], None]] = None,
+) -> int:
+    """
+    Räkna om aggregaten från synliga omdömen för alla (eller angivna)
+    hovslagare. Varje omgång committas för sig så att låsen hålls kort.
+    `on_chunk(klara, totalt)` anropas efter varje omgång. Returnerar antal
+    hovslagare.
+    """
+    chunk_size = chunk_size or settings.RATING_RECOMPUTE_CHUNK_SIZE
+    total_query = db.query(func.count(Farrier.id))
+    if farrier_ids is not None:
+        farrier_ids = list(farrier_ids)
+        total_query = total_query.filter(Farrier.id.in_(farrier_ids))
+    total = total_query.scalar()
+
+    done = 0
+    for chunk in _farrier_id_chunks(db, farrier_ids, chunk_size):
+        _rebuild_chunk(db, chunk)
+        db.commit()
+        done += len(chunk)
+        if on_chunk:
+            on_chunk(done, total)
+    return done
@@ -0,0 +1,513 @@
+"""
+Månadsrapporter för admin som räknas fram i bakgrunden.
+
+Ett jobb (ReportJob) beställs via API:et och läggs i kön i databasen. Varje
+process har en trådpool som tar an köade jobb med en villkorad UPDATE, som
+bara lyckas om färre än REPORT_MAX_CONCURRENT_JOBS jobb körs, i alla
+processer tillsammans (på Postgres serialiserat med ett advisory lock). Ett
+jobb som inte får plats ligger kvar i kön och tas an när något annat jobb
+blir klart, av vilken process som helst.
+
+Ett pågående jobb uppdaterar heartbeat_at var REPORT_HEARTBEAT_SECONDS. Jobb
+utan livssignal på REPORT_STALE_SECONDS avbröts (t.ex. av en omstart) och
+markeras som misslyckade, vid start, när ett jobb ska tas an och med jämna
+mellanrum så länge det finns jobb kvar (recover_report_jobs). Jobb som andra
+levande processer kör lämnas i fred.
+
+Rapporten räknas fram en månad i taget med en grupperad aggregatfråga per
+bokningstabell (aktiva och arkiverade), raderna skrivs direkt till filen och
+förloppet sparas efter varje månad. Minnesanvändningen beror alltså bara på
+antal hovslagare, inte på antal bokningar. Formaten är CSV och NDJSON, som
+båda kan skrivas rad för rad; Parquet skulle kräva pyarrow, som inte finns
+bland beroendena.
+
+Rapporter (en rad per månad och hovslagare):
+    farrier_revenue    slutförda bokningar, intäkt och reseersättning
+    cancellation_rate  bokningar, avbokningar och andel avbokade
+    utilization        bokade minuter mot schemalagda minuter enligt veckoschemat
+
+Samma kö kör omräkningen av hovslagarnas betygsaggregat (rating_recompute,
+beställs via POST /api/admin/ratings/recompute). Den skriver ingen fil, men
+förloppet sparas på jobbet efter varje omgång hovslagare på samma sätt.
+"""
+import csv
+import json
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import case, func, or_, select, text, update
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.locks import REPORT_LOCK_NAMESPACE
+from app.models.archive import ArchivedBooking
+from app.models.booking import Booking, BookingStatus
+from app.models.farrier import Farrier, FarrierSchedule
+from app.models.report import ReportJob, ReportStatus
+from app.models.user import User
+from app.services.ratings import rebuild_rating_aggregates
+
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = Path(__file__).parent.parent.parent / "reports"
+
+OUTPUT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+MAX_REPORT_MONTHS = 120
+
+# Jobbtyp för omräkning av betygsaggregat, körs i rapportkön utan resultatfil
+RATING_RECOMPUTE = "rating_recompute"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def report_months(month_from: date, month_to: date) -> List[date]:
+    """Första dagen i varje månad från month_from till och med month_to"""
+    months = []
+    current = month_start(month_from)
+    while current <= month_to:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+@dataclass
+class ReportContext:
+    """Data som läses en gång per jobb och delas mellan månaderna"""
+    db: Session
+    farrier_id: Optional[int] = None
+    farrier_names: Dict[int, str] = field(default_factory=dict)
+    schedule_minutes: Optional[Dict[int, List[int]]] = None
+
+
+def _month_conditions(model, start: datetime, end: datetime, farrier_id: Optional[int]) -> list:
+    conditions = [model.scheduled_date >= start, model.scheduled_date < end]
+    if farrier_id is not None:
+        conditions.append(model.farrier_id == farrier_id)
+    return conditions
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _grouped_totals(context: ReportContext, month: date, columns: list, *conditions) -> Dict[int, list]:
+    """Summor per hovslagare för månaden, över aktiva och arkiverade bokningar"""
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(next_month(month), datetime.min.time())
+    totals: Dict[int, list] = {}
+    for model in (Booking, ArchivedBooking):
+        query = context.db.query(model.farrier_id, *[column(model) for column in columns]).filter(
+            *_month_conditions(model, start, end, context.farrier_id),
+            *[condition(model) for condition in conditions]
+        ).group_by(model.farrier_id)
+        for farrier_id, *values in query:
+            entry = totals.setdefault(farrier_id, [0] * len(columns))
+            for index, value in enumerate(values):
+                entry[index] += value or 0
+    return totals
+
+
+def farrier_revenue_rows(context: ReportContext, month: date) -> Iterator[tuple]:
+    totals = _grouped_totals(
+        context, month,
+        [
+            lambda model: func.count(model.id),
+            lambda model: func.sum(model.total_price),
+            lambda model: func.sum(model.travel_fee),
+        ],
+        lambda model: model.status == BookingStatus.COMPLETED.value,
+    )
+    for farrier_id in sorted(totals):
+        completed, revenue, travel_fees = totals[farrier_id]
+        yield farrier_id, completed, round(revenue, 2), round(travel_fees, 2)
+
+
+def cancellation_rate_rows(context: ReportContext, month: date) -> Iterator[tuple]:
+    totals = _grouped_totals(
+        context, month,
+        [
+            lambda model: func.count(model.id),
+            lambda model: _count_where(model.status == BookingStatus.CANCELLED.value),
+        ],
+    )
+    for farrier_id in sorted(totals):
+        bookings, cancelled = totals[farrier_id]
+        yield farrier_id, bookings, cancelled, round(cancelled / bookings, 4) if bookings else 0.0
+
+
+def _schedule_minutes(context: ReportContext) -> Dict[int, List[int]]:
+    """Schemalagda minuter per veckodag och hovslagare (nuvarande veckoschema)"""
+    if context.schedule_minutes is None:
+        query = context.db.query(
+            FarrierSchedule.farrier_id, FarrierSchedule.day_of_week,
+            FarrierSchedule.start_time, FarrierSchedule.end_time
+        ).filter(FarrierSchedule.is_available == True)
+        if context.farrier_id is not None:
+            query = query.filter(FarrierSchedule.farrier_id == context.farrier_id)
+        minutes: Dict[int, List[int]] = defaultdict(lambda: [0] * 7)
+        for farrier_id, day_of_week, start_time, end_time in query:
+            length = (end_time.hour * 60 + end_time.minute) - (start_time.hour * 60 + start_time.minute)
+            minutes[farrier_id][day_of_week] += max(length, 0)
+        context.schedule_minutes = dict(minutes)
+    return context.schedule_minutes
+
+
+def utilization_rows(context: ReportContext, month: date) -> Iterator[tuple]:
+    booked = _grouped_totals(
+        context, month,
+        [lambda model: func.sum(model.duration_minutes)],
+        lambda model: model.status != BookingStatus.CANCELLED.value,
+    )
+    schedules = _schedule_minutes(context)
+    weekdays = [0] * 7
+    day = month
+    while day < next_month(month):
+        weekdays[day.weekday()] += 1
+        day += timedelta(days=1)
+
+    for farrier_id in sorted(set(booked) | set(schedules)):
+        booked_minutes = booked.get(farrier_id, [0])[0]
+        weekly = schedules.get(farrier_id, [0] * 7)
+        scheduled_minutes = sum(minutes * count for minutes, count in zip(weekly, weekdays))
+        utilization = round(booked_minutes / scheduled_minutes, 4) if scheduled_minutes else None
+        yield farrier_id, booked_minutes, scheduled_minutes, utilization
+
+
+@dataclass
+class ReportDefinition:
+    columns: List[str]
+    rows: Callable[[ReportContext, date], Iterator[tuple]]
+
+
+# Kolumnerna efter month, farrier_id och farrier_name
+REPORTS = {
+    "farrier_revenue": ReportDefinition(
+        ["completed_bookings", "revenue", "travel_fees"], farrier_revenue_rows
+    ),
+    "cancellation_rate": ReportDefinition(
+        ["bookings", "cancelled", "cancellation_rate"], cancellation_rate_rows
+    ),
+    "utilization": ReportDefinition(
+        ["booked_minutes", "scheduled_minutes", "utilization"], utilization_rows
+    ),
+}
+
+
+def _farrier_name(context: ReportContext, farrier_id: int) -> str:
+    if farrier_id not in context.farrier_names:
+        row = context.db.query(Farrier.business_name, User.first_name, User.last_name).join(
+            User, User.id == Farrier.user_id
+        ).filter(Farrier.id == farrier_id).first()
+        if row is None:
+            name = ""
+        else:
+            business_name, first_name, last_name = row
+            name = business_name or f"{first_name} {last_name}"
+        context.farrier_names[farrier_id] = name
+    return context.farrier_names[farrier_id]
+
+
+class _ReportWriter:
+    def __init__(self, handle, output_format: str, header: List[str]):
+        self._format = output_format
+        self._header = header
+        self._handle = handle
+        if output_format == "csv":
+            self._csv = csv.writer(handle)
+            self._csv.writerow(header)
+
+    def write(self, row: tuple) -> None:
+        if self._format == "csv":
+            self._csv.writerow(row)
+        else:
+            self._handle.write(json.dumps(dict(zip(self._header, row)), ensure_ascii=False) + "\n")
+
+
+def report_path(job: ReportJob) -> Path:
+    return REPORTS_DIR / job.file_name
+
+
+def _file_name(job: ReportJob) -> str:
+    return f"report-{job.id}.{job.output_format}"
+
+
+def partial_report_path(job: ReportJob) -> Path:
+    """Filen som skrivs medan jobbet pågår"""
+    return REPORTS_DIR / f"{_file_name(job)}.part"
+
+
+def report_job_to_response(job: ReportJob) -> dict:
+    """Konvertera jobb till response, med nedladdningslänk när filen är klar"""
+    return {
+        "id": job.id,
+        "report_type": job.report_type,
+        "output_format": job.output_format,
+        "parameters": json.loads(job.parameters),
+        "status": job.status,
+        "progress": job.progress,
+        "row_count": job.row_count,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "download_url": (
+            f"/api/admin/reports/{job.id}/download"
+            if job.status == ReportStatus.COMPLETED.value and job.file_name else None
+        ),
+    }
+
+
+def _stale_cutoff(now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(seconds=settings.REPORT_STALE_SECONDS)
+
+
+def is_stale(job: ReportJob, now: Optional[datetime] = None) -> bool:
+    """Pågående jobb utan livssignal på REPORT_STALE_SECONDS"""
+    if job.status != ReportStatus.RUNNING.value:
+        return False
+    last_seen = job.heartbeat_at or job.started_at
+    return last_seen is None or last_seen < _stale_cutoff(now)
+
+
+def fail_stale_jobs(db: Session) -> int:
+    """Markera pågående jobb utan livssignal som misslyckade. Committar inte."""
+    last_seen = func.coalesce(ReportJob.heartbeat_at, ReportJob.started_at)
+    stale = db.query(ReportJob).filter(
+        ReportJob.status == ReportStatus.RUNNING.value,
+        or_(last_seen.is_(None), last_seen < _stale_cutoff())
+    ).with_for_update().all()
+    now = datetime.utcnow()
+    for job in stale:
+        partial_report_path(job).unlink(missing_ok=True)
+        job.status = ReportStatus.FAILED.value
+        job.error = "Avbröts (t.ex. av en omstart), beställ rapporten igen"
+        job.finished_at = now
+    if stale:
+        logger.warning("%s rapportjobb saknade livssignal och markerades som misslyckade", len(stale))
+    return len(stale)
+
+
+def _claim_job(db: Session, job_id: int) -> bool:
+    """
+    Ta an ett köat jobb om det finns en ledig plats bland
+    REPORT_MAX_CONCURRENT_JOBS, räknat över alla processer. Committar.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # Annars kan två processer räkna samma lediga plats samtidigt
+        db.execute(text("SELECT pg_advisory_xact_lock(:namespace, 0)"), {"namespace": REPORT_LOCK_NAMESPACE})
+    fail_stale_jobs(db)
+    db.flush()
+    running_job = aliased(ReportJob)
+    running = select(func.count(running_job.id)).where(
+        running_job.status == ReportStatus.RUNNING.value
+    ).scalar_subquery()
+    now = datetime.utcnow()
+    # På SQLite är satsen atomisk under databasens skrivlås
+    claimed = db.execute(
+        update(ReportJob)
+        .where(
+            ReportJob.id == job_id,
+            ReportJob.status == ReportStatus.QUEUED.value,
+            running < settings.REPORT_MAX_CONCURRENT_JOBS,
+        )
+        .values(status=ReportStatus.RUNNING.value, started_at=now, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+
+class _Heartbeat:
+    """Uppdaterar heartbeat_at i en egen tråd medan jobbet körs"""
+
+    def __init__(self, job_id: int, session_factory: Callable[[], Session]):
+        self._job_id = job_id
+        self._session_factory = session_factory
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"report-heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(settings.REPORT_HEARTBEAT_SECONDS):
+            db = self._session_factory()
+            try:
+                db.execute(
+                    update(ReportJob)
+                    .where(ReportJob.id == self._job_id, ReportJob.status == ReportStatus.RUNNING.value)
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                db.commit()
+            except Exception:
+                logger.warning("Kunde inte spara livssignal för rapportjobb %s", self._job_id, exc_info=True)
+            finally:
+                db.close()
+
+
+def _save_progress(db: Session, job: ReportJob, progress: int, row_count: int) -> None:
+    # Kort transaktion per steg så att förloppet syns för den som frågar
+    job.progress = progress
+    job.row_count = row_count
+    job.heartbeat_at = datetime.utcnow()
+    db.commit()
+
+
+def _write_report(db: Session, job: ReportJob, parameters: dict, partial: Path) -> str:
+    """Skriv rapporten till partial, månad för månad, och returnera filnamnet"""
+    definition = REPORTS[job.report_type]
+    months = report_months(
+        date.fromisoformat(parameters["month_from"]), date.fromisoformat(parameters["month_to"])
+    )
+    context = ReportContext(db=db, farrier_id=parameters.get("farrier_id"))
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    row_count = 0
+    with open(partial, "w", newline="", encoding="utf-8") as handle:
+        header = ["month", "farrier_id", "farrier_name", *definition.columns]
+        writer = _ReportWriter(handle, job.output_format, header)
+        for index, month in enumerate(months):
+            for farrier_id, *values in definition.rows(context, month):
+                name = _farrier_name(context, farrier_id)
+                writer.write((month.strftime("%Y-%m"), farrier_id, name, *values))
+                row_count += 1
+            _save_progress(db, job, (index + 1) * 100 // len(months), row_count)
+    file_name = _file_name(job)
+    partial.replace(REPORTS_DIR / file_name)
+    return file_name
+
+
+def _recompute_ratings(db: Session, job: ReportJob, parameters: dict) -> None:
+    """Räkna om betygsaggregaten; row_count är antal klara hovslagare"""
+    def on_chunk(done: int, total: int) -> None:
+        _save_progress(db, job, done * 100 // total if total else 100, done)
+
+    rebuild_rating_aggregates(
+        db, parameters.get("farrier_ids"), chunk_size=parameters.get("chunk_size"), on_chunk=on_chunk
+    )
+
+
+def run_report_job(job_id: int, session_factory: Callable[[], Session]) -> None:
+    """
+    Kör ett köat jobb (rapportfil eller betygsomräkning); fel sparas på jobbet.
+    Är alla platser upptagna ligger jobbet kvar i kön. När jobbet är klart tas
+    nästa köade jobb an.
+    """
+    db = session_factory()
+    partial: Optional[Path] = None
+    claimed = False
+    try:
+        # Villkorad övergång, så att ett jobb som köats två gånger bara körs en gång
+        claimed = _claim_job(db, job_id)
+        if not claimed:
+            return
+        job = db.get(ReportJob, job_id)
+        parameters = json.loads(job.parameters)
+
+        with _Heartbeat(job_id, session_factory):
+            if job.report_type == RATING_RECOMPUTE:
+                _recompute_ratings(db, job, parameters)
+            else:
+                partial = partial_report_path(job)
+                job.file_name = _write_report(db, job, parameters, partial)
+                partial = None
+
+        job.status = ReportStatus.COMPLETED.value
+        job.progress = 100
+        job.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as exc:
+        logger.exception("Rapportjobb %s misslyckades", job_id)
+        db.rollback()
+        job = db.get(ReportJob, job_id)
+        if job is not None:
+            job.status = ReportStatus.FAILED.value
+            job.error = str(exc)[:1000]
+            job.finished_at = datetime.utcnow()
+            db.commit()
+    finally:
+        if partial is not None:
+            partial.unlink(missing_ok=True)
+        db.close()
+    if claimed:
+        start_queued_jobs(session_factory)
+
+
+class ReportRunner:
+    """Trådpool i processen; hur många jobb som körs begränsas i _claim_job"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int, session_factory: Callable[[], Session]) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers or settings.REPORT_MAX_CONCURRENT_JOBS,
+                    thread_name_prefix="report",
+                )
+            self._executor.submit(run_report_job, job_id, session_factory)
+
+
+report_runner = ReportRunner()
+
+
+def start_queued_jobs(session_factory: Callable[[], Session]) -> None:
+    """Försök ta an de äldsta köade jobben, högst så många som får köras samtidigt"""
+    db = session_factory()
+    try:
+        queued = [job_id for job_id, in db.query(ReportJob.id).filter(
+            ReportJob.status == ReportStatus.QUEUED.value
+        ).order_by(ReportJob.id).limit(settings.REPORT_MAX_CONCURRENT_JOBS)]
+    finally:
+        db.close()
+    for job_id in queued:
+        report_runner.submit(job_id, session_factory)
+
+
+def recover_report_jobs(session_factory: Callable[[], Session]) -> None:
+    """
+    Körs vid start. Pågående jobb utan livssignal markeras som misslyckade,
+    köade jobb tas an om det finns plats. Jobb som andra processer kör har
+    färsk livssignal och lämnas i fred. Finns det pågående eller köade jobb
+    kvar görs samma kontroll igen efter REPORT_STALE_SECONDS, så att jobb som
+    avbröts alldeles nyss inte blockerar kön.
+    """
+    db = session_factory()
+    try:
+        fail_stale_jobs(db)
+        db.commit()
+        remaining = db.query(ReportJob.id).filter(
+            ReportJob.status.in_([ReportStatus.QUEUED.value, ReportStatus.RUNNING.value])
+        ).first() is not None
+    finally:
+        db.close()
+
+    start_queued_jobs(session_factory)
+    if remaining:
+        timer = threading.Timer(settings.REPORT_STALE_SECONDS, recover_report_jobs, args=(session_factory,))
+        timer.daemon = True
+        timer.start()
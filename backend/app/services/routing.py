@@ -0,0 +1,123 @@
+"""
+Avstånd och körordning för hovslagarens dag.
+
+Avståndsmatrisen beräknas i ett svep: varje punkts trigonometriska termer
+räknas ut en gång och återanvänds för alla par, och matrisen är symmetrisk så
+bara halva fylls i. Körordningen tas fram med närmaste granne följt av 2-opt,
+vilket för en dags besök (upp till ett par dussin stopp) tar några millisekunder.
+
+Beräkningarna är vanlig Python och inte vektoriserade med numpy. numpy är inte
+ett beroende i projektet, och med högst ett par dussin punkter per dag och
+hovslagare dominerar kostnaden för att bygga arrayer över själva räknandet.
+"""
+from math import asin, cos, radians, sin, sqrt
+from typing import List, Optional, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+# Säkerhetsgräns för 2-opt, i praktiken konvergerar den långt innan
+MAX_TWO_OPT_ROUNDS = 50
+
+Point = Tuple[float, float]  # (latitud, longitud)
+
+
+def parse_coordinate(value) -> Optional[float]:
+    """Koordinater lagras som text på bokningar, ogiltiga värden blir None"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _prepared(points: Sequence[Point]) -> List[Tuple[float, float, float]]:
+    """(lat i radianer, lon i radianer, cos(lat)) per punkt"""
+    prepared = []
+    for lat, lon in points:
+        lat_rad = radians(lat)
+        prepared.append((lat_rad, radians(lon), cos(lat_rad)))
+    return prepared
+
+
+def _haversine(a: Tuple[float, float, float], b: Tuple[float, float, float]) -> float:
+    dlat = b[0] - a[0]
+    dlon = b[1] - a[1]
+    h = sin(dlat / 2) ** 2 + a[2] * b[2] * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h)))
+
+
+def distances_from(origin: Point, points: Sequence[Point]) -> List[float]:
+    """Avstånd i km från en punkt till alla punkter i listan"""
+    prepared_origin = _prepared([origin])[0]
+    return [_haversine(prepared_origin, p) for p in _prepared(points)]
+
+
+def distance_matrix(points: Sequence[Point]) -> List[List[float]]:
+    """Symmetrisk matris med avstånd i km mellan alla par av punkter"""
+    prepared = _prepared(points)
+    size = len(prepared)
+    matrix = [[0.0] * size for _ in range(size)]
+    for i in range(size):
+        row = matrix[i]
+        for j in range(i + 1, size):
+            distance = _haversine(prepared[i], prepared[j])
+            row[j] = distance
+            matrix[j][i] = distance
+    return matrix
+
+
+def route_length(order: Sequence[int], matrix: List[List[float]]) -> float:
+    return sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+def nearest_neighbor_order(matrix: List[List[float]], start: int = 0) -> List[int]:
+    """Girig rutt: åk alltid till närmaste ej besökta punkt"""
+    remaining = set(range(len(matrix))) - {start}
+    order = [start]
+    while remaining:
+        current = matrix[order[-1]]
+        closest = min(remaining, key=lambda j: (current[j], j))
+        order.append(closest)
+        remaining.remove(closest)
+    return order
+
+
+def two_opt(order: List[int], matrix: List[List[float]], fixed_end: bool = False) -> List[int]:
+    """
+    Förbättra en öppen rutt genom att vända delsträckor så länge det förkortar den.
+    Första punkten ligger fast, och även sista om `fixed_end`.
+    """
+    order = list(order)
+    size = len(order)
+    last = size - 2 if fixed_end else size - 1
+    for _ in range(MAX_TWO_OPT_ROUNDS):
+        improved = False
+        for i in range(1, last):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, last + 1):
+                c = order[j]
+                d = order[j + 1] if j + 1 < size else None
+                # Byt kanterna (a,b) och (c,d) mot (a,c) och (b,d)
+                before = matrix[a][b] + (matrix[c][d] if d is not None else 0.0)
+                after = matrix[a][c] + (matrix[b][d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    b = order[i]
+                    improved = True
+        if not improved:
+            break
+    return order
+
+
+def plan_route(matrix: List[List[float]], fixed_end: bool = False) -> List[int]:
+    """Kort rutt som börjar i punkt 0 (och slutar i sista punkten om `fixed_end`)"""
+    size = len(matrix)
+    if size <= 2:
+        return list(range(size))
+    if fixed_end:
+        end = size - 1
+        order = nearest_neighbor_order([row[:end] for row in matrix[:end]]) + [end]
+    else:
+        order = nearest_neighbor_order(matrix)
+    return two_opt(order, matrix, fixed_end=fixed_end)
@@ -0,0 +1,137 @@
+"""
+Rekommendation av tider utifrån hur mycket extra körning de ger hovslagaren.
+
+För varje hovslagare och dag byggs en sorterad lista med dagens bokningar som
+har koordinater ("ankare"). En ledig tid läggs in mellan föregående ankare (eller
+basen) och nästa ankare, och kostnaden är omvägen:
+    d(föregående, hästägare) + d(hästägare, nästa) - d(föregående, nästa)
+Avstånden från hästägaren till alla ankare räknas ut i ett svep per hovslagare
+och avstånden mellan intilliggande ankare en gång per dag, så varje kandidattid
+kostar två binärsökningar och några uppslag. De bästa N hålls i en begränsad heap.
+
+Alla tider här är naiv lokal tid, samma som hovslagarnas arbetstider. Den som
+anropar räknar om bokningar från UTC innan de läggs in, och tiderna tillbaka.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import Iterable, List, Optional, Tuple
+
+from app.services.routing import Point, distance_matrix, distances_from
+
+SLOT_STEP_MINUTES = 30
+
+
+@dataclass
+class FarrierDay:
+    """Allt som behövs för att bedöma tider hos en hovslagare en viss dag"""
+    farrier_id: int
+    day: date
+    base: Optional[Point]
+    working_hours: List[Tuple[time, time]]
+    busy: List[Tuple[datetime, datetime]] = field(default_factory=list)       # Bokningar och reservationer
+    anchors: List[Tuple[datetime, datetime, Point]] = field(default_factory=list)  # Bokningar med koordinater
+
+
+@dataclass(order=True)
+class SlotRecommendation:
+    added_km: float
+    start: datetime
+    farrier_id: int = field(compare=False)
+    previous: Optional[Point] = field(default=None, compare=False)
+    next: Optional[Point] = field(default=None, compare=False)
+
+
+def candidate_starts(day: date, working_hours: Iterable[Tuple[time, time]], duration: timedelta,
+                     not_before: datetime) -> Iterable[datetime]:
+    step = timedelta(minutes=SLOT_STEP_MINUTES)
+    for start_time, end_time in working_hours:
+        start = datetime.combine(day, start_time)
+        end = datetime.combine(day, end_time)
+        while start + duration <= end:
+            if start >= not_before:
+                yield start
+            start += step
+
+
+def recommend_slots(
+    owner: Point,
+    days: Iterable[FarrierDay],
+    duration: timedelta,
+    limit: int,
+    max_km: float,
+    not_before: datetime,
+) -> List[SlotRecommendation]:
+    """De `limit` tider som ger minst extra körning, bäst först"""
+    # Max-heap (negerade nycklar) med de hittills bästa tiderna
+    best: List[Tuple[float, float, int, SlotRecommendation]] = []
+    counter = 0
+
+    for farrier_day in days:
+        anchors = sorted(farrier_day.anchors, key=lambda a: a[0])
+        if not anchors and farrier_day.base is None:
+            continue  # Ingen aning om var hovslagaren befinner sig
+
+        anchor_starts = [a[0] for a in anchors]
+        anchor_points = [a[2] for a in anchors]
+        owner_to_anchor = distances_from(owner, anchor_points) if anchor_points else []
+        owner_to_base = distances_from(owner, [farrier_day.base])[0] if farrier_day.base else None
+        # Avstånd basen -> första ankaret och mellan intilliggande ankare
+        route_points = ([farrier_day.base] if farrier_day.base else []) + anchor_points
+        matrix = distance_matrix(route_points) if len(route_points) > 1 else [[0.0]]
+        offset = 1 if farrier_day.base else 0
+
+        busy = sorted(farrier_day.busy)
+        busy_starts = [b[0] for b in busy]
+        busy_max_end = list(accumulate((b[1] for b in busy), max))
+
+        for start in candidate_starts(farrier_day.day, farrier_day.working_hours, duration, not_before):
+            end = start + duration
+            # Upptagen om något pass som börjar före slutet slutar efter starten
+            overlapping = bisect_left(busy_starts, end)
+            if overlapping and busy_max_end[overlapping - 1] > start:
+                continue
+
+            previous_index = bisect_left(anchor_starts, start) - 1
+            next_index = bisect_right(anchor_starts, start)
+
+            if previous_index >= 0:
+                to_previous = owner_to_anchor[previous_index]
+                previous_point = anchor_points[previous_index]
+                previous_route = previous_index + offset
+            elif farrier_day.base is not None:
+                to_previous = owner_to_base
+                previous_point = farrier_day.base
+                previous_route = 0
+            else:
+                to_previous = previous_point = previous_route = None
+
+            has_next = next_index < len(anchors)
+            to_next = owner_to_anchor[next_index] if has_next else None
+            next_point = anchor_points[next_index] if has_next else None
+
+            if to_previous is not None and to_next is not None:
+                added = to_previous + to_next - matrix[previous_route][next_index + offset]
+                nearest = min(to_previous, to_next)
+            elif to_previous is not None:
+                added = nearest = to_previous
+            else:
+                added = nearest = to_next
+
+            if nearest > max_km:
+                continue
+
+            recommendation = SlotRecommendation(
+                round(added, 2), start, farrier_day.farrier_id, previous_point, next_point
+            )
+            key = (-recommendation.added_km, -start.timestamp(), counter, recommendation)
+            counter += 1
+            if len(best) < limit:
+                heapq.heappush(best, key)
+            elif key > best[0]:
+                heapq.heapreplace(best, key)
+
+    return sorted(item[3] for item in best)
+
@@ -0,0 +1,173 @@
+"""
+Massåtgärder på användare i admin: aktivera/inaktivera, verifiera och ta bort.
+
+Användarna väljs med en id-lista eller ett filter och behandlas i omgångar om
+ADMIN_BULK_BATCH_SIZE, med en transaktion per omgång. Varje omgång är ett
+fåtal mängd-UPDATE i stället för en ORM-laddning per användare. Borttagning
+markerar bara kontona, se app/services/user_purge.py. Resultatet redovisas
+per id; borttagna konton räknas som ej hittade.
+"""
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import and_, exists, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.farrier import Farrier
+from app.models.user import User
+from app.services.user_purge import mark_users_deleted
+from app.services.user_search import search_condition
+
+BatchOperation = Callable[[Session, List[int]], Dict[str, List[int]]]
+
+
+def user_filter_conditions(
+    db: Session,
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    is_verified: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    search: Optional[str] = None,
+) -> list:
+    conditions = [User.deleted_at.is_(None)]
+    if role:
+        conditions.append(User.role == role)
+    if is_active is not None:
+        conditions.append(User.is_active == is_active)
+    if is_verified is not None:
+        # En hovslagare är verifierad först när även profilen är det (som i verify_user)
+        unverified_profile = exists().where(Farrier.user_id == User.id, Farrier.is_verified == False)
+        if is_verified:
+            conditions.append(and_(User.is_verified == True, ~unverified_profile))
+        else:
+            conditions.append(or_(User.is_verified == False, unverified_profile))
+    if created_after:
+        conditions.append(User.created_at >= created_after)
+    if created_before:
+        conditions.append(User.created_at < created_before)
+    if search:
+        condition = search_condition(db, search)
+        if condition is not None:
+            conditions.append(condition)
+    return conditions
+
+
+def _id_batches(
+    db: Session, user_ids: Optional[List[int]], conditions: Optional[list], batch_size: int
+) -> Iterator[List[int]]:
+    """Id-listan i omgångar, eller matchande id:n för filtret i stigande ordning"""
+    if user_ids is not None:
+        user_ids = sorted(set(user_ids))
+        for start in range(0, len(user_ids), batch_size):
+            yield user_ids[start:start + batch_size]
+        return
+    last_id = 0
+    while True:
+        batch = [user_id for user_id, in db.query(User.id).filter(
+            *conditions, User.id > last_id
+        ).order_by(User.id).limit(batch_size)]
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def run_bulk_operation(
+    db: Session,
+    operation: BatchOperation,
+    user_ids: Optional[List[int]] = None,
+    conditions: Optional[list] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, List[int]]:
+    """Kör operationen omgång för omgång, committa efter varje, och slå ihop resultaten"""
+    batch_size = batch_size or settings.ADMIN_BULK_BATCH_SIZE
+    results: Dict[str, List[int]] = {}
+    for batch in _id_batches(db, user_ids, conditions or [], batch_size):
+        for key, ids in operation(db, batch).items():
+            results.setdefault(key, []).extend(ids)
+        db.commit()
+    return results
+
+
+def _split_found(requested: List[int], found: Dict[int, object], current_user_id: int):
+    """(ej hittade, överhoppade, övriga hittade) för en omgång"""
+    not_found = [user_id for user_id in requested if user_id not in found]
+    skipped = [user_id for user_id in requested if user_id == current_user_id and user_id in found]
+    others = [user_id for user_id in requested if user_id in found and user_id != current_user_id]
+    return not_found, skipped, others
+
+
+def set_active_operation(is_active: bool, current_user_id: int) -> BatchOperation:
+    """Aktivera eller inaktivera; det egna kontot hoppas över"""
+    def operation(db: Session, user_ids: List[int]) -> Dict[str, List[int]]:
+        found = dict(db.query(User.id, User.is_active).filter(
+            User.id.in_(user_ids), User.deleted_at.is_(None)
+        ).with_for_update())
+        not_found, skipped, others = _split_found(user_ids, found, current_user_id)
+        changed = [user_id for user_id in others if found[user_id] != is_active]
+        if changed:
+            db.execute(
+                update(User).where(User.id.in_(changed))
+                .values(is_active=is_active, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        return {
+            "updated_ids": changed,
+            "unchanged_ids": [user_id for user_id in others if found[user_id] == is_active],
+            "not_found_ids": not_found,
+            "skipped_ids": skipped,
+        }
+    return operation
+
+
+def verify_operation(db: Session, user_ids: List[int]) -> Dict[str, List[int]]:
+    """Verifiera användarna, och hovslagarprofilen för hovslagare"""
+    rows = db.query(User.id, User.role, User.is_verified, Farrier.is_verified).outerjoin(
+        Farrier, Farrier.user_id == User.id
+    ).filter(User.id.in_(user_ids), User.deleted_at.is_(None)).with_for_update(of=User).all()
+    found = {row[0]: row[1:] for row in rows}
+
+    def needs_verification(user_id: int) -> bool:
+        role, user_verified, farrier_verified = found[user_id]
+        return not user_verified or (role == "farrier" and farrier_verified is False)
+
+    changed = [user_id for user_id in user_ids if user_id in found and needs_verification(user_id)]
+    changed_set = set(changed)
+    if changed:
+        now = datetime.utcnow()
+        db.execute(
+            update(User).where(User.id.in_(changed), User.is_verified != True)
+            .values(is_verified=True, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        farrier_users = [user_id for user_id in changed if found[user_id][0] == "farrier"]
+        if farrier_users:
+            db.execute(
+                update(Farrier).where(Farrier.user_id.in_(farrier_users), Farrier.is_verified != True)
+                .values(is_verified=True, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+    return {
+        "updated_ids": changed,
+        "unchanged_ids": [user_id for user_id in user_ids if user_id in found and user_id not in changed_set],
+        "not_found_ids": [user_id for user_id in user_ids if user_id not in found],
+        "skipped_ids": [],
+    }
+
+
+def delete_users_operation(current_user_id: int) -> BatchOperation:
+    """
+    Markera användarna som borttagna; resten rensas i bakgrunden av
+    app/services/user_purge.py. Ingen egen borttagning här, så massborttagning
+    rensar samma data som borttagning av ett enskilt konto, även arkiverade
+    bokningar.
+    """
+    def operation(db: Session, user_ids: List[int]) -> Dict[str, List[int]]:
+        rows = db.query(User.id).filter(User.id.in_(user_ids), User.deleted_at.is_(None)).with_for_update()
+        found = dict.fromkeys(user_id for user_id, in rows)
+        not_found, skipped, targets = _split_found(user_ids, found, current_user_id)
+        mark_users_deleted(db, targets)
+        return {"deleted_ids": targets, "not_found_ids": not_found, "skipped_ids": skipped}
+    return operation
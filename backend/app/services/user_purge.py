@@ -0,0 +1,281 @@
+"""
+Borttagning av användarkonton: markera direkt, rensa i bakgrunden.
+
+I anropet sätts bara users.deleted_at (och is_active = false, hovslagarprofilen
+görs otillgänglig), så kontot försvinner direkt utan att något laddas.
+E-postadressen byts mot en platshållare, så att adressen kan registreras på
+nytt direkt, och kontots omdömen döljs och dras av från betygen. Sedan
+rensar en bakgrundstråd allt som hör till kontot: bokningar (som hästägare,
+för deras hästar eller hos deras hovslagarprofil), omdömen, hovslagarprofil
+med tjänster, scheman och områden, hästar, reservationer,
+väntelisteplatser och arkiverade bokningar. Rensningen görs med mängd-DELETE i omgångar om
+USER_PURGE_BATCH_SIZE rader, en transaktion per omgång, så att en hovslagare
+med tusentals bokningar inte håller lås länge. Betygsaggregaten på
+kvarvarande hovslagare justeras, borttagna bokningar får gravstenar för
+delta-synken och dagssammanställningen räknas ned.
+
+Varje omgång börjar med att låsa de markerade användarraderna, så två
+rensningar (t.ex. i olika processer) turas om i stället för att dra av samma
+omdömen två gånger. Konton som blivit kvar, t.ex. efter en omstart, rensas av
+nästa körning eller med purge_deleted_users.py.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import String, cast, delete, exists, insert, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.archive import bookings_archive
+from app.models.booking import Booking
+from app.models.farrier import Farrier, FarrierArea, FarrierSchedule, FarrierService
+from app.models.horse import Horse
+from app.models.review import Review
+from app.models.rollup import BOOKING_ATTRIBUTES, record_bulk_delete
+from app.models.slot_hold import SlotHold
+from app.models.sync import BookingTombstone, record_booking_deletions
+from app.models.user import User
+from app.models.waitlist import WaitlistEntry
+from app.services.area_matcher import area_matchers
+from app.services.ratings import apply_review_removal
+
+logger = logging.getLogger(__name__)
+
+
+def mark_users_deleted(db: Session, user_ids: List[int]) -> None:
+    """Markera kontona som borttagna. Committar inte."""
+    if not user_ids:
+        return
+    now = datetime.utcnow()
+    marked = User.id.in_(user_ids) & User.deleted_at.is_(None)
+    # Omdömena försvinner från de publika listorna och betygen direkt, inte först vid rensningen
+    hidden = Review.author_id.in_(select(User.id).where(marked)) & (Review.is_visible == True)
+    apply_review_removal(db, hidden)
+    db.execute(
+        update(Review).where(hidden).values(is_visible=False, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    # Unik platshållare, så att adressen är ledig för en ny registrering
+    placeholder = literal("deleted-") + cast(User.id, String) + literal("@deleted.invalid")
+    db.execute(
+        update(User).where(marked)
+        .values(deleted_at=now, is_active=False, updated_at=now, email=placeholder, email_normalized=placeholder)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Farrier).where(Farrier.user_id.in_(user_ids))
+        .values(is_available=False, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _lock_users(db: Session, user_ids: List[int]) -> List[int]:
+    """Lås de markerade användarraderna som finns kvar och returnera deras id:n"""
+    rows = db.query(User.id).filter(
+        User.id.in_(user_ids), User.deleted_at.isnot(None)
+    ).with_for_update().all()
+    return [user_id for user_id, in rows]
+
+
+def _farrier_ids(user_ids: List[int]):
+    return select(Farrier.id).where(Farrier.user_id.in_(user_ids))
+
+
+def _booking_condition(user_ids: List[int]):
+    return or_(
+        Booking.horse_owner_id.in_(user_ids),
+        Booking.horse_id.in_(select(Horse.id).where(Horse.owner_id.in_(user_ids))),
+        Booking.farrier_id.in_(_farrier_ids(user_ids)),
+    )
+
+
+def _archived_booking_condition(user_ids: List[int], farrier_ids: List[int]):
+    """Samma urval som _booking_condition, i arkivtabellen"""
+    return or_(
+        bookings_archive.c.horse_owner_id.in_(user_ids),
+        bookings_archive.c.horse_id.in_(select(Horse.id).where(Horse.owner_id.in_(user_ids))),
+        bookings_archive.c.farrier_id.in_(farrier_ids),
+    )
+
+
+def _review_condition(user_ids: List[int]):
+    return or_(Review.author_id.in_(user_ids), Review.farrier_id.in_(_farrier_ids(user_ids)))
+
+
+def _remove(db: Session, model, *conditions) -> None:
+    db.execute(delete(model).where(*conditions).execution_options(synchronize_session=False))
+
+
+def _remove_reviews(db: Session, user_ids: List[int], condition) -> list:
+    """Ta bort omdömena och justera betygen på kvarvarande hovslagare"""
+    removed = db.execute(select(Review.created_at, Review.rating).where(condition)).all()
+    apply_review_removal(db, condition, ~Review.farrier_id.in_(_farrier_ids(user_ids)))
+    _remove(db, Review, condition)
+    return removed
+
+
+def _purge_booking_batch(db: Session, user_ids: List[int], batch_size: int) -> bool:
+    """Ta bort nästa omgång bokningar (med omdömen). False när inga finns kvar."""
+    user_ids = _lock_users(db, user_ids)
+    booking_ids = [booking_id for booking_id, in db.query(Booking.id).filter(
+        _booking_condition(user_ids)
+    ).order_by(Booking.id).limit(batch_size)] if user_ids else []
+    if not booking_ids:
+        db.commit()
+        return False
+
+    selected = Booking.id.in_(booking_ids)
+    # Bara fälten som dagssammanställningen behöver, inga ORM-objekt
+    removed_bookings = db.execute(
+        select(*[getattr(Booking, name) for name in BOOKING_ATTRIBUTES]).where(selected)
+    ).all()
+    removed_reviews = _remove_reviews(db, user_ids, Review.booking_id.in_(booking_ids))
+
+    # En gravsten per bokning; omgångens löpnummer sätts vid commit
+    db.execute(insert(BookingTombstone).from_select(
+        ["booking_id", "farrier_id", "horse_owner_id", "change_seq", "deleted_at"],
+        select(Booking.id, Booking.farrier_id, Booking.horse_owner_id, literal(0), literal(datetime.utcnow()))
+        .where(selected)
+    ))
+    record_booking_deletions(db, booking_ids)
+    _remove(db, Booking, selected)
+
+    record_bulk_delete(db, bookings=removed_bookings, reviews=removed_reviews)
+    db.commit()
+    return True
+
+
+def _purge_review_batch(db: Session, user_ids: List[int], batch_size: int) -> bool:
+    """Omdömen skrivna av användarna eller om deras profil, på bokningar som finns kvar"""
+    user_ids = _lock_users(db, user_ids)
+    review_ids = [review_id for review_id, in db.query(Review.id).filter(
+        _review_condition(user_ids)
+    ).order_by(Review.id).limit(batch_size)] if user_ids else []
+    if not review_ids:
+        db.commit()
+        return False
+
+    removed_reviews = _remove_reviews(db, user_ids, Review.id.in_(review_ids))
+    record_bulk_delete(db, reviews=removed_reviews)
+    db.commit()
+    return True
+
+
+def _purge_accounts(db: Session, user_ids: List[int]) -> bool:
+    """
+    Ta bort resten (några rader per konto) och själva kontona. False om nya
+    bokningar eller omdömen hunnit tillkomma, då tas de först.
+    """
+    user_ids = _lock_users(db, user_ids)
+    if not user_ids:
+        db.commit()
+        return True
+    remaining = db.query(
+        exists().where(_booking_condition(user_ids)) | exists().where(_review_condition(user_ids))
+    ).scalar()
+    if remaining:
+        db.commit()
+        return False
+
+    farrier_ids = [farrier_id for farrier_id, in db.query(Farrier.id).filter(Farrier.user_id.in_(user_ids))]
+    horse_ids = select(Horse.id).where(Horse.owner_id.in_(user_ids))
+    removed_users = db.execute(select(User.created_at, User.role).where(User.id.in_(user_ids))).all()
+
+    # Mängd-DELETE på Horse går förbi arkivets after_delete-händelse, så
+    # arkiverade bokningar tas bort här, innan hästarna och profilerna
+    archived = _archived_booking_condition(user_ids, farrier_ids)
+    removed_archived = db.execute(
+        select(*[bookings_archive.c[name] for name in BOOKING_ATTRIBUTES]).where(archived)
+    ).all()
+    db.execute(delete(bookings_archive).where(archived))
+
+    _remove(db, SlotHold, or_(SlotHold.holder_id.in_(user_ids), SlotHold.farrier_id.in_(farrier_ids)))
+    _remove(db, WaitlistEntry, or_(WaitlistEntry.owner_id.in_(user_ids), WaitlistEntry.farrier_id.in_(farrier_ids)))
+    db.execute(
+        update(WaitlistEntry).where(WaitlistEntry.horse_id.in_(horse_ids)).values(horse_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    for model in (FarrierService, FarrierSchedule, FarrierArea):
+        _remove(db, model, model.farrier_id.in_(farrier_ids))
+    _remove(db, Horse, Horse.owner_id.in_(user_ids))
+    _remove(db, Farrier, Farrier.id.in_(farrier_ids))
+    _remove(db, User, User.id.in_(user_ids))
+
+    record_bulk_delete(db, bookings=removed_archived, users=removed_users)
+    db.commit()
+    for farrier_id in farrier_ids:
+        area_matchers.invalidate(farrier_id)
+    return True
+
+
+def purge_users(db: Session, user_ids: List[int], batch_size: Optional[int] = None) -> None:
+    """Rensa markerade konton och allt som hör till dem, omgång för omgång"""
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    while True:
+        while _purge_booking_batch(db, user_ids, batch_size):
+            pass
+        while _purge_review_batch(db, user_ids, batch_size):
+            pass
+        if _purge_accounts(db, user_ids):
+            return
+
+
+def purge_deleted_users(
+    db: Session,
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Rensa alla markerade konton. Returnerar antal behandlade konton."""
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    purged = 0
+    last_id = 0
+    while True:
+        user_ids = [user_id for user_id, in db.query(User.id).filter(
+            User.deleted_at.isnot(None), User.id > last_id
+        ).order_by(User.id).limit(batch_size)]
+        if not user_ids:
+            return purged
+        purge_users(db, user_ids, batch_size)
+        purged += len(user_ids)
+        last_id = user_ids[-1]
+        if on_batch:
+            on_batch(purged)
+
+
+class UserPurgeWorker:
+    """En bakgrundstråd åt gången; nya borttagningar under körning ger en körning till"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+        self._pending = False
+
+    def schedule(self, session_factory: Callable[[], Session]) -> None:
+        with self._lock:
+            if self._running:
+                self._pending = True
+                return
+            self._running = True
+        threading.Thread(target=self._run, args=(session_factory,), daemon=True).start()
+
+    def _run(self, session_factory: Callable[[], Session]) -> None:
+        while True:
+            db = session_factory()
+            try:
+                count = purge_deleted_users(db)
+                if count:
+                    logger.info("Rensade %s borttagna konton", count)
+            except Exception:
+                logger.exception("Kunde inte rensa borttagna konton")
+            finally:
+                db.close()
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+
+
+user_purge = UserPurgeWorker()
@@ -0,0 +1,89 @@
+"""
+Indexerad sökning på användarnas namn och e-post.
+
+Postgres: ett GIN-trigramindex (pg_trgm) på uttrycket
+lower(email || ' ' || first_name || ' ' || last_name), så att delsträngssökning
+med LIKE '%term%' går via indexet i stället för att skanna tabellen.
+
+SQLite: en FTS5-tabell (users_fts) som hålls synkad med users via triggrar.
+Varje ord i söktermen matchas som prefix mot orden i namn och e-post
+("ann sv" hittar Anna Svensson och anna.svensson@example.com).
+
+Saknas indexet (annan databas, eller pg_trgm kunde inte installeras) används
+samma LIKE-villkor utan index. Indexen skapas vid uppstart, se
+create_user_search_index i app/core/migrations.py.
+"""
+import re
+from typing import Tuple
+
+from sqlalchemy import Integer, and_, column, func, literal_column, select, text
+from sqlalchemy.orm import Query, Session
+
+from app.models.user import User
+
+# Så här många träffar räknas exakt, därefter ges en uppskattning
+COUNT_EXACT_LIMIT = 1000
+
+
+def _search_expression():
+    # Samma uttryck som USER_SEARCH_EXPRESSION i migrations.py. Mellanslagen är
+    # literaler och inte parametrar, annars känner Postgres inte igen indexet.
+    space = literal_column("' '")
+    concat = User.email.op("||")(space).op("||")(User.first_name).op("||")(space).op("||")(User.last_name)
+    return func.lower(concat)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(db: Session, search: str):
+    """
+    Villkor på User som matchar söktermen, eller None om termen saknar
+    sökbara tecken
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        words = re.findall(r"\w+", search.lower())
+        if not words:
+            return None
+        # Varje ord som citerat prefix, så att FTS5-syntax i termen inte tolkas
+        match = " ".join(f'"{word}"*' for word in words)
+        return User.id.in_(
+            text("SELECT rowid FROM users_fts WHERE users_fts MATCH :match")
+            .bindparams(match=match)
+            .columns(column("rowid", Integer))
+        )
+
+    words = search.lower().split()
+    if not words:
+        return None
+    expression = _search_expression()
+    return and_(*[expression.like(f"%{_escape_like(word)}%", escape="\\") for word in words])
+
+
+def matching_user_ids(db: Session, search: str):
+    """Subquery med id för användare som matchar söktermen (None om inget att söka på)"""
+    condition = search_condition(db, search)
+    if condition is None:
+        return None
+    return select(User.id).where(condition)
+
+
+def estimate_count(db: Session, query: Query) -> Tuple[int, bool]:
+    """
+    Antal rader i frågan: exakt upp till COUNT_EXACT_LIMIT, därefter
+    planerarens uppskattning på Postgres. Returnerar (antal, är_uppskattning).
+    """
+    limited = query.with_entities(User.id).order_by(None).limit(COUNT_EXACT_LIMIT + 1).subquery()
+    count = db.query(func.count()).select_from(limited).scalar()
+    if count <= COUNT_EXACT_LIMIT:
+        return count, False
+
+    if db.get_bind().dialect.name == "postgresql":
+        statement = query.with_entities(User.id).order_by(None).statement
+        compiled = statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        return max(estimate, count), True
+    return count, True
+
@@ -0,0 +1,141 @@
+"""
+Matchning av avbokade tider mot väntelistan.
+
+En väntelistepost gäller ett tidsfönster [window_start, window_end) som är
+högst WAITLIST_MAX_WINDOW_DAYS långt. En ledig tid [start, end) kan därför bara
+ligga i fönster som börjar mellan start - WAITLIST_MAX_WINDOW_DAYS och start,
+så matchningen blir en avgränsad sökning i indexet (hovslagare eller område,
+status, window_start). Kostnaden beror på antalet poster i det intervallet,
+inte på väntelistans totala storlek.
+
+Ett erbjudande gäller så länge reservationen (SlotHold) finns och inte gått
+ut. Bokar hästägaren den erbjudna tiden tas posten bort. Går reservationen
+ut, eller släpps den utan att tiden bokas, ställs posten tillbaka i kön med
+sin ursprungliga plats (created_at). Det görs lat, innan en ny ledig tid
+matchas och när hästägaren listar sina poster, på samma sätt som utgångna
+reservationer städas lat.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import case, exists, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.slot_hold import SlotHold
+from app.models.waitlist import WaitlistEntry, WaitlistStatus
+from app.services.area_matcher import normalize_city
+
+
+def find_best_match(
+    db: Session,
+    farrier_id: int,
+    city: Optional[str],
+    start: datetime,
+    end: datetime,
+    service_type: Optional[str] = None,
+    exclude_owner_id: Optional[int] = None,
+) -> Optional[WaitlistEntry]:
+    """
+    Bästa väntande post för en ledig tid (naiv UTC). Poster för just den här
+    hovslagaren går före poster för området, därefter samma tjänst och sist
+    först till kvarn.
+    """
+    lookback = start - timedelta(days=settings.WAITLIST_MAX_WINDOW_DAYS)
+    free_minutes = (end - start).total_seconds() / 60
+
+    def candidates(query):
+        query = query.filter(
+            WaitlistEntry.status == WaitlistStatus.WAITING.value,
+            WaitlistEntry.window_start >= lookback,
+            WaitlistEntry.window_start <= start,
+            WaitlistEntry.window_end >= end,
+            WaitlistEntry.duration_minutes <= free_minutes
+        )
+        if exclude_owner_id is not None:
+            query = query.filter(WaitlistEntry.owner_id != exclude_owner_id)
+        same_service = case((WaitlistEntry.service_type == service_type, 0), else_=1)
+        return query.order_by(same_service, WaitlistEntry.created_at, WaitlistEntry.id).first()
+
+    entry = candidates(db.query(WaitlistEntry).filter(WaitlistEntry.farrier_id == farrier_id))
+    if entry or not city:
+        return entry
+
+    return candidates(db.query(WaitlistEntry).filter(
+        WaitlistEntry.farrier_id.is_(None),
+        WaitlistEntry.area_city == normalize_city(city)
+    ))
+
+
+def mark_notified(db: Session, entry: WaitlistEntry, farrier_id: int, start: datetime, hold_id: int) -> bool:
+    """Markera posten som erbjuden, bara om ingen annan hunnit före (villkorad UPDATE)"""
+    updated = db.query(WaitlistEntry).filter(
+        WaitlistEntry.id == entry.id,
+        WaitlistEntry.status == WaitlistStatus.WAITING.value
+    ).update({
+        WaitlistEntry.status: WaitlistStatus.NOTIFIED.value,
+        WaitlistEntry.offered_farrier_id: farrier_id,
+        WaitlistEntry.offered_start: start,
+        WaitlistEntry.offered_hold_id: hold_id,
+        WaitlistEntry.notified_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    return updated == 1
+
+
+def offer_hold_ids():
+    """Reservationer som hör till ett pågående erbjudande, som delfråga"""
+    return select(WaitlistEntry.offered_hold_id).where(
+        WaitlistEntry.status == WaitlistStatus.NOTIFIED.value,
+        WaitlistEntry.offered_hold_id.isnot(None)
+    )
+
+
+def remove_accepted_offers(
+    db: Session, farrier_id: int, holder_id: int, booked_starts: Iterable[datetime]
+) -> None:
+    """
+    Ta bort poster vars erbjudna tid hästägaren just bokat (naiv UTC). Anropas
+    innan hästägarens reservationer hos hovslagaren släpps.
+    """
+    booked_starts = list(booked_starts)
+    if not booked_starts:
+        return
+    db.query(WaitlistEntry).filter(
+        WaitlistEntry.status == WaitlistStatus.NOTIFIED.value,
+        WaitlistEntry.owner_id == holder_id,
+        WaitlistEntry.offered_farrier_id == farrier_id,
+        WaitlistEntry.offered_start.in_(booked_starts)
+    ).delete(synchronize_session=False)
+
+
+def reopen_lapsed_offers(db: Session, owner_id: Optional[int] = None) -> int:
+    """
+    Ställ tillbaka erbjudna poster i kön när reservationen gått ut eller tagits
+    bort. Committar inte. Returnerar antal poster.
+    """
+    live_hold = exists().where(
+        SlotHold.id == WaitlistEntry.offered_hold_id,
+        SlotHold.expires_at > datetime.utcnow()
+    )
+    query = db.query(WaitlistEntry.id, WaitlistEntry.offered_hold_id).filter(
+        WaitlistEntry.status == WaitlistStatus.NOTIFIED.value, ~live_hold
+    )
+    if owner_id is not None:
+        query = query.filter(WaitlistEntry.owner_id == owner_id)
+
+    reopened = 0
+    for entry_id, hold_id in query.all():
+        # Villkorat på samma reservation, så att ett nytt erbjudande som hunnit
+        # göras sedan frågan inte nollställs
+        reopened += db.query(WaitlistEntry).filter(
+            WaitlistEntry.id == entry_id,
+            WaitlistEntry.status == WaitlistStatus.NOTIFIED.value,
+            WaitlistEntry.offered_hold_id == hold_id
+        ).update({
+            WaitlistEntry.status: WaitlistStatus.WAITING.value,
+            WaitlistEntry.offered_farrier_id: None,
+            WaitlistEntry.offered_start: None,
+            WaitlistEntry.offered_hold_id: None,
+            WaitlistEntry.notified_at: None,
+        }, synchronize_session=False)
+    return reopened
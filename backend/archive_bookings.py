@@ -0,0 +1,55 @@
+"""
+Arkivera gamla, avslutade bokningar.
+
+Slutförda och avbokade bokningar (utan omdöme) som är schemalagda längre
+tillbaka än --days flyttas i omgångar till tabellen bookings_archive. Körs
+med fördel varje natt, t.ex. från cron:
+    python archive_bookings.py
+    python archive_bookings.py --days 180 --batch-size 5000
+    python archive_bookings.py --dry-run
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.models.booking import Booking
+from app.services.booking_archive import archivable_conditions, archive_cutoff, archive_old_bookings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=settings.BOOKING_ARCHIVE_AFTER_DAYS,
+                        help="Arkivera bokningar äldre än så här många dagar")
+    parser.add_argument("--batch-size", type=int, default=settings.BOOKING_ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Räkna bara, flytta ingenting")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    cutoff = archive_cutoff(days=args.days)
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            count = db.query(Booking.id).filter(*archivable_conditions(cutoff)).count()
+            print(f"{count} bokningar schemalagda före {cutoff:%Y-%m-%d} skulle arkiveras")
+            return
+
+        total = archive_old_bookings(
+            db,
+            cutoff=cutoff,
+            batch_size=args.batch_size,
+            on_batch=lambda moved: print(f"  {moved} bokningar arkiverade...", flush=True),
+        )
+        print(f"Klart: {total} bokningar schemalagda före {cutoff:%Y-%m-%d} flyttade till arkivet")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
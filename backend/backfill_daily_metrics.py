@@ -0,0 +1,42 @@
+"""
+Bygg upp de dagliga sammanställningarna (tabellen daily_metrics) från
+bokningar, arkiverade bokningar, användare och omdömen.
+
+Sammanställningarna hålls annars uppdaterade löpande, och historiken byggs upp
+automatiskt av migreringarna vid första uppstarten. Kör detta för att räkna om
+allt, eller en period som behöver räknas om:
+    python backfill_daily_metrics.py
+    python backfill_daily_metrics.py --from 2025-01-01 --to 2025-12-31
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.services.daily_metrics import backfill_daily_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Första dag (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Sista dag (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        rows = backfill_daily_metrics(db, args.date_from, args.date_to)
+        period = f"{args.date_from or 'början'} - {args.date_to or 'idag'}"
+        print(f"Klart: {rows} dagsrader skrivna för {period}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
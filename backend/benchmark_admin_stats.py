@@ -0,0 +1,184 @@
+"""
+Mätning av adminstatistiken: en fråga per siffra, kombinerade aggregat och
+dagliga sammanställningar.
+
+Fyller en databas med --bookings bokningar (plus användare, hästar och
+omdömen), bygger daily_metrics med backfill_daily_metrics och jämför den
+gamla varianten (en fråga per siffra, elva frågor) med
+compute_statistics_from_tables (fem aggregatfrågor), compute_statistics
+(sammanställningarna) och den cachade ögonblicksbilden som dashboarden
+faktiskt läser. Körs mot en temporär SQLite-databas om inget annat anges:
+    python benchmark_admin_stats.py
+    python benchmark_admin_stats.py --bookings 200000 --rounds 5
+    python benchmark_admin_stats.py --database-url postgresql://user:pw@localhost/portalen_bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", help="Databas att köra mot (default: temporär SQLite)")
+parser.add_argument("--bookings", type=int, default=1_000_000)
+parser.add_argument("--rounds", type=int, default=3, help="Antal mätningar per variant")
+args = parser.parse_args()
+
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import func, insert
+
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.models import User, Farrier, Horse, Booking, Review
+from app.models.archive import ArchivedBooking
+from app.models.booking import BookingStatus
+from app.services.admin_stats import (
+    StatisticsCache, compute_statistics, compute_statistics_from_tables, recent_since
+)
+from app.services.daily_metrics import backfill_daily_metrics
+
+STATUSES = [status.value for status in BookingStatus]
+INSERT_BATCH = 20_000
+
+
+def populate(bookings: int) -> None:
+    """Fyll databasen med syntetiska rader via bulk-insert"""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    owners = max(1, bookings // 20)
+    farriers = max(1, bookings // 500)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "id": i + 1, "email": f"bench-{i}@example.com", "hashed_password": "x",
+            "first_name": "Bench", "last_name": str(i),
+            "role": "farrier" if i < farriers else "horse_owner",
+            "created_at": now - timedelta(days=rng.randrange(1000)),
+        } for i in range(owners + farriers)])
+        conn.execute(insert(Farrier), [{"id": i + 1, "user_id": i + 1} for i in range(farriers)])
+        conn.execute(insert(Horse), [
+            {"id": i + 1, "owner_id": farriers + i + 1, "name": f"Häst {i}"} for i in range(owners)
+        ])
+
+    review_id = 0
+    for start in range(0, bookings, INSERT_BATCH):
+        rows, reviews = [], []
+        for booking_id in range(start + 1, min(start + INSERT_BATCH, bookings) + 1):
+            owner = rng.randrange(owners)
+            created = now - timedelta(minutes=rng.randrange(1000 * 24 * 60))
+            status = rng.choice(STATUSES)
+            rows.append({
+                "id": booking_id, "horse_owner_id": farriers + owner + 1, "horse_id": owner + 1,
+                "farrier_id": rng.randrange(farriers) + 1, "service_type": "Verkning",
+                "scheduled_date": created + timedelta(days=14), "status": status,
+                "service_price": 800, "total_price": 950, "created_at": created, "updated_at": created,
+            })
+            if status == BookingStatus.COMPLETED.value and rng.random() < 0.3:
+                review_id += 1
+                reviews.append({
+                    "id": review_id, "booking_id": booking_id, "author_id": farriers + owner + 1,
+                    "farrier_id": rows[-1]["farrier_id"], "rating": rng.randint(1, 5),
+                    "is_visible": True, "created_at": created, "updated_at": created,
+                })
+        with engine.begin() as conn:
+            conn.execute(insert(Booking), rows)
+            if reviews:
+                conn.execute(insert(Review), reviews)
+        print(f"  {min(start + INSERT_BATCH, bookings)}/{bookings} bokningar...", flush=True)
+
+
+def legacy_statistics(db, now: datetime) -> dict:
+    """Den ursprungliga implementationen: en fråga per siffra"""
+    total_users = db.query(func.count(User.id)).scalar()
+    total_horse_owners = db.query(func.count(User.id)).filter(User.role == "horse_owner").scalar()
+    total_farriers = db.query(func.count(User.id)).filter(User.role == "farrier").scalar()
+    total_horses = db.query(func.count(Horse.id)).scalar()
+    total_bookings = db.query(func.count(Booking.id)).scalar() + db.query(func.count(ArchivedBooking.id)).scalar()
+    total_reviews = db.query(func.count(Review.id)).scalar()
+    bookings_by_status = {}
+    for model in (Booking, ArchivedBooking):
+        for status, count in db.query(model.status, func.count(model.id)).group_by(model.status):
+            bookings_by_status[status] = bookings_by_status.get(status, 0) + count
+    thirty_days_ago = recent_since(now)
+    recent_bookings = db.query(func.count(Booking.id)).filter(Booking.created_at >= thirty_days_ago).scalar()
+    new_users = db.query(func.count(User.id)).filter(User.created_at >= thirty_days_ago).scalar()
+    avg_rating = db.query(func.avg(Review.rating)).scalar()
+    total_revenue = sum(
+        db.query(func.sum(model.total_price)).filter(model.status == BookingStatus.COMPLETED.value).scalar() or 0
+        for model in (Booking, ArchivedBooking)
+    )
+    return {
+        "total_users": total_users, "total_horse_owners": total_horse_owners,
+        "total_farriers": total_farriers, "total_horses": total_horses,
+        "total_bookings": total_bookings, "total_reviews": total_reviews,
+        "bookings_by_status": bookings_by_status, "recent_bookings": recent_bookings,
+        "new_users_last_30_days": new_users,
+        "average_rating": round(avg_rating, 2) if avg_rating else 0, "total_revenue": total_revenue,
+    }
+
+
+def measure(label: str, function, rounds: int) -> dict:
+    timings, result = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<34} median {statistics.median(timings):9.1f} ms   min {min(timings):9.1f} ms")
+    return result
+
+
+def main():
+    print(f"Fyller databasen med {args.bookings} bokningar...")
+    populate(args.bookings)
+
+    def run(function):
+        def wrapped():
+            db = SessionLocal()
+            try:
+                return function(db)
+            finally:
+                db.close()
+        return wrapped
+
+    print("Bygger daily_metrics...")
+    db = SessionLocal()
+    try:
+        backfill_daily_metrics(db)
+    finally:
+        db.close()
+
+    # Samma "nu" för alla så att 30-dagarsgränsen blir identisk
+    now = datetime.utcnow()
+    print()
+    before = measure("Före: en fråga per siffra", run(lambda db: legacy_statistics(db, now)), args.rounds)
+    tables = measure(
+        "Kombinerade aggregat (tabeller)", run(lambda db: compute_statistics_from_tables(db, now)), args.rounds
+    )
+    after = measure("Efter: daily_metrics", run(lambda db: compute_statistics(db, now)), args.rounds)
+
+    cache = StatisticsCache(ttl_seconds=60, max_stale_seconds=3600)
+    measure("Efter: första anrop (kall cache)", lambda: cache.get(SessionLocal), 1)
+    measure("Efter: cachad ögonblicksbild", lambda: cache.get(SessionLocal), args.rounds)
+
+    def comparable(stats: dict) -> dict:
+        stats = {key: value for key, value in stats.items() if key != "generated_at"}
+        stats["total_revenue"] = round(stats["total_revenue"], 2)
+        return stats
+
+    for label, result in (("tabeller", tables), ("daily_metrics", after)):
+        same = comparable(before) == comparable(result)
+        print(f"\nSamma resultat ({label}):", "ja" if same else f"NEJ\n  före:  {before}\n  efter: {result}")
+
+if __name__ == "__main__":
+    main()
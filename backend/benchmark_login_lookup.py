@@ -0,0 +1,121 @@
+"""
+Mätning av användaruppslaget vid inloggning, före och efter email_normalized.
+
+Fyller en databas med --users användare och jämför den gamla frågan
+(lower(email) = ?, som inte kan använda något index) med den nya
+(email_normalized = ?, via det unika indexet). Skriver ut frågeplanen för
+båda och avslutar med felkod om den nya frågan inte går via indexet.
+Lösenordskontrollen (bcrypt) är densamma före och efter och mäts inte.
+Körs mot en temporär SQLite-databas om inget annat anges:
+    python benchmark_login_lookup.py
+    python benchmark_login_lookup.py --users 200000 --lookups 50
+    python benchmark_login_lookup.py --database-url postgresql://user:pw@localhost/portalen_bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", help="Databas att köra mot (default: temporär SQLite)")
+parser.add_argument("--users", type=int, default=1_000_000)
+parser.add_argument("--lookups", type=int, default=20, help="Antal uppslag per variant")
+args = parser.parse_args()
+
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import func, insert, text
+
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.models import User
+from app.models.user import normalize_email
+
+INSERT_BATCH = 50_000
+INDEX_NAME = "ix_users_email_normalized"
+
+
+def populate(users: int) -> None:
+    """Fyll databasen med syntetiska användare via bulk-insert"""
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    for start in range(0, users, INSERT_BATCH):
+        rows = []
+        for i in range(start, min(start + INSERT_BATCH, users)):
+            email = f"Bench.User-{i}@Example.com"
+            rows.append({
+                "id": i + 1, "email": email, "email_normalized": normalize_email(email),
+                "hashed_password": "x", "first_name": "Bench", "last_name": str(i),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(User), rows)
+        print(f"  {min(start + INSERT_BATCH, users)}/{users} användare...", flush=True)
+
+
+def legacy_lookup(db, email: str):
+    """Den tidigare frågan i login, register och reset-password"""
+    return db.query(User).filter(func.lower(User.email) == email, User.deleted_at.is_(None))
+
+
+def indexed_lookup(db, email: str):
+    return db.query(User).filter(User.email_normalized == email, User.deleted_at.is_(None))
+
+
+def query_plan(db, query) -> str:
+    dialect = engine.dialect
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    if dialect.name == "sqlite":
+        rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        return "\n".join(row[-1] for row in rows)
+    return "\n".join(row[0] for row in db.execute(text(f"EXPLAIN {compiled}")))
+
+
+def measure(label: str, lookup, emails: list) -> None:
+    timings = []
+    db = SessionLocal()
+    try:
+        for email in emails:
+            started = time.perf_counter()
+            user = lookup(db, email).first()
+            timings.append((time.perf_counter() - started) * 1000)
+            assert user is not None and user.email_normalized == email
+            db.expunge_all()
+    finally:
+        db.close()
+    print(f"{label:<34} median {statistics.median(timings):9.2f} ms   max {max(timings):9.2f} ms")
+
+
+def main():
+    print(f"Fyller databasen med {args.users} användare...")
+    populate(args.users)
+
+    rng = random.Random(1)
+    emails = [normalize_email(f"Bench.User-{rng.randrange(args.users)}@Example.com") for _ in range(args.lookups)]
+
+    db = SessionLocal()
+    try:
+        legacy_plan = query_plan(db, legacy_lookup(db, emails[0]))
+        indexed_plan = query_plan(db, indexed_lookup(db, emails[0]))
+    finally:
+        db.close()
+    print(f"\nPlan före:\n  {legacy_plan}\nPlan efter:\n  {indexed_plan}\n")
+
+    measure("Före: lower(email) = ?", legacy_lookup, emails)
+    measure("Efter: email_normalized = ?", indexed_lookup, emails)
+
+    if INDEX_NAME not in indexed_plan:
+        print(f"\nFEL: uppslaget använder inte {INDEX_NAME}")
+        sys.exit(1)
+    print(f"\nUppslaget går via {INDEX_NAME}")
+
+
+if __name__ == "__main__":
+    main()
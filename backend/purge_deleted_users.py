@@ -0,0 +1,44 @@
+"""
+Rensa borttagna användarkonton.
+
+Konton som tas bort markeras direkt (users.deleted_at) och rensas sedan i
+bakgrunden av API:et. Blir något kvar, t.ex. om servern startades om mitt i
+en rensning, tar det här skriptet hand om det. Lämpligt att köra från cron:
+    python purge_deleted_users.py
+    python purge_deleted_users.py --batch-size 5000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.services.user_purge import purge_deleted_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.USER_PURGE_BATCH_SIZE,
+                        help="Rader per transaktion")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        count = purge_deleted_users(
+            db,
+            batch_size=args.batch_size,
+            on_batch=lambda done: print(f"  {done} konton rensade...", flush=True),
+        )
+        print(f"Klart: {count} borttagna konton rensade")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Räkna om hovslagarnas betygsaggregat från omdömena.
+
+Aggregaten (snitt, antal, summor per delbetyg och fördelning per stjärna)
+hålls uppdaterade löpande när omdömen skrivs. Om de ändå har glidit isär,
+t.ex. efter en import eller manuell ändring i databasen, räknas de om här i
+omgångar om --chunk-size hovslagare:
+    python rebuild_ratings.py
+    python rebuild_ratings.py --chunk-size 5000
+    python rebuild_ratings.py --farrier-id 12 --farrier-id 40
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine, Base
+from app.core.migrations import run_migrations
+from app.services.ratings import rebuild_rating_aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farrier-id", type=int, action="append", dest="farrier_ids",
+                        help="Räkna bara om för denna hovslagare (kan anges flera gånger)")
+    parser.add_argument("--chunk-size", type=int, default=settings.RATING_RECOMPUTE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        count = rebuild_rating_aggregates(
+            db,
+            args.farrier_ids,
+            chunk_size=args.chunk_size,
+            on_chunk=lambda done, total: print(f"  {done}/{total} hovslagare...", flush=True),
+        )
+        print(f"Klart: betyg omräknade för {count} hovslagare på {time.perf_counter() - started:.1f} s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Lös konton vars e-postadresser bara skiljer sig i skiftläge eller blanksteg.
+
+Sådana konton får ingen users.email_normalized vid uppstart (se
+backfill_email_normalized) och kan därför inte logga in. Utan argument listas
+krockarna. Med --keep får det angivna kontot inloggningsadressen; övriga konton
+i samma grupp står kvar utan och listas igen, tills adressen ändrats eller
+kontot tagits bort i admin:
+    python resolve_duplicate_emails.py
+    python resolve_duplicate_emails.py --keep 12 --keep 40
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from app.core.database import engine, Base
+from app.core.migrations import email_conflicts, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", type=int, action="append", default=[], metavar="ID",
+                        help="Konto som ska få inloggningsadressen (kan anges flera gånger)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    with engine.begin() as conn:
+        conflicts = email_conflicts(conn)
+        groups = {user_id: normalized for normalized, rows in conflicts.items() for user_id, _, _ in rows}
+        for user_id in args.keep:
+            if user_id not in groups:
+                sys.exit(f"Konto {user_id} ingår inte i någon krock")
+        for user_id in args.keep:
+            normalized = groups[user_id]
+            # Först bort från det konto som ev. har adressen, sedan till det valda
+            conn.execute(text("UPDATE users SET email_normalized = NULL WHERE email_normalized = :normalized"),
+                         {"normalized": normalized})
+            conn.execute(text("UPDATE users SET email_normalized = :normalized WHERE id = :user_id"),
+                         {"normalized": normalized, "user_id": user_id})
+            print(f"{normalized}: konto {user_id} loggar in med adressen")
+
+        remaining = {
+            normalized: rows for normalized, rows in email_conflicts(conn).items()
+            if any(existing is None for _, _, existing in rows)
+        }
+    if not remaining:
+        print("Inga konton saknar inloggningsadress")
+        return
+    print(f"{len(remaining)} adresser har konton som inte kan logga in:")
+    for normalized, rows in remaining.items():
+        accounts = ", ".join(
+            f"id {user_id} <{email}>{' (loggar in)' if existing else ''}" for user_id, email, existing in rows
+        )
+        print(f"  {normalized}: {accounts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Stresstest för samtidiga bokningar.
+
+Många trådar försöker boka samma tider samtidigt via POST /api/bookings/, i
+samma process som appen (TestClient). Testet verifierar att inga
+dubbelbokningar uppstår och mäter genomströmning när bokningarna sprids över
+allt fler hovslagare (låset tas per hovslagare, så på Postgres ska fler
+hovslagare ge högre genomströmning; SQLite har ett skrivlås för hela databasen).
+
+Körs mot en temporär SQLite-databas om inget annat anges:
+    python stress_test_bookings.py
+    python stress_test_bookings.py --database-url postgresql://user:pw@localhost/portalen_test
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--database-url", help="Databas att köra mot (default: temporär SQLite)")
+parser.add_argument("--threads", type=int, default=16)
+parser.add_argument("--slots", type=int, default=20, help="Tider per hovslagare som alla trådar försöker boka")
+parser.add_argument("--farriers", default="1,2,4,8", help="Antal hovslagare per omgång")
+args = parser.parse_args()
+
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress.db"
+
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal, engine
+from app.core.security import create_access_token
+from app.main import app
+from app.models import User, Farrier, Horse, Booking
+from app.models.booking import BookingStatus
+from app.api.bookings import to_utc
+
+
+def setup(max_farriers: int, threads: int):
+    """Skapa hovslagare och en hästägare med en häst per tråd"""
+    db = SessionLocal()
+    try:
+        owner = User(email=f"stress-owner-{time.time_ns()}@example.com", hashed_password="x",
+                     first_name="Stress", last_name="Ägare", role="horse_owner")
+        db.add(owner)
+        db.flush()
+        horses = [Horse(owner_id=owner.id, name=f"Häst {i}") for i in range(threads)]
+        db.add_all(horses)
+
+        farriers = []
+        for i in range(max_farriers):
+            user = User(email=f"stress-farrier-{i}-{time.time_ns()}@example.com", hashed_password="x",
+                        first_name="Stress", last_name=f"Hovslagare {i}", role="farrier")
+            db.add(user)
+            db.flush()
+            farrier = Farrier(user_id=user.id, is_available=True)
+            db.add(farrier)
+            farriers.append(farrier)
+        db.commit()
+        return owner.id, [h.id for h in horses], [f.id for f in farriers]
+    finally:
+        db.close()
+
+
+def run_round(client, headers, horse_ids, farrier_ids, slots, day):
+    """Trådarna fördelas över hovslagarna och försöker boka samma tider samtidigt"""
+    created = []
+    rejected = []
+    errors = []
+    start_barrier = threading.Barrier(len(horse_ids))
+
+    def worker(index, horse_id):
+        try:
+            start_barrier.wait()
+            for slot in range(slots):
+                # Trådar som delar hovslagare försöker boka exakt samma tider
+                farrier_id = farrier_ids[index % len(farrier_ids)]
+                scheduled_date = day + timedelta(hours=slot % 10, days=slot // 10)
+                response = client.post("/api/bookings/", headers=headers, json={
+                    "farrier_id": farrier_id,
+                    "horse_id": horse_id,
+                    "service_type": "Verkning",
+                    "scheduled_date": scheduled_date.isoformat(),
+                    "duration_minutes": 60,
+                    "service_price": 800
+                })
+                if response.status_code == 201:
+                    created.append(farrier_id)
+                else:
+                    if response.status_code != 409:
+                        errors.append(f"{response.status_code}: {response.text}")
+                    rejected.append(farrier_id)
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=worker, args=(i, h)) for i, h in enumerate(horse_ids)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return created, rejected, errors, elapsed
+
+
+def count_double_bookings(farrier_ids, day, until):
+    """Räkna överlappande aktiva bokningar per hovslagare"""
+    db = SessionLocal()
+    try:
+        doubles = 0
+        for farrier_id in farrier_ids:
+            bookings = db.query(Booking).filter(
+                Booking.farrier_id == farrier_id,
+                Booking.status != BookingStatus.CANCELLED.value,
+                Booking.scheduled_date >= day.replace(tzinfo=None),
+                Booking.scheduled_date < until.replace(tzinfo=None)
+            ).order_by(Booking.scheduled_date).all()
+            previous_end = None
+            for booking in bookings:
+                start = to_utc(booking.scheduled_date)
+                if previous_end and start < previous_end:
+                    doubles += 1
+                previous_end = start + timedelta(minutes=booking.duration_minutes or 60)
+        return doubles
+    finally:
+        db.close()
+
+
+def main():
+    farrier_counts = [int(n) for n in args.farriers.split(",")]
+    owner_id, horse_ids, all_farrier_ids = setup(max(farrier_counts), args.threads)
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': str(owner_id), 'role': 'horse_owner'})}"}
+    print(f"🧪 {args.threads} trådar, {args.slots} tider per tråd, databas: {engine.url.get_backend_name()}")
+
+    total_doubles = 0
+    client = TestClient(app)
+    for round_number, farrier_count in enumerate(farrier_counts):
+        farrier_ids = all_farrier_ids[:farrier_count]
+        day = to_utc(datetime(2031, 1, 1) + timedelta(days=round_number * 100))
+        created, rejected, errors, elapsed = run_round(client, headers, horse_ids, farrier_ids, args.slots, day)
+        doubles = count_double_bookings(farrier_ids, day, day + timedelta(days=100))
+        total_doubles += doubles
+        attempts = len(created) + len(rejected)
+        print(
+            f"  {farrier_count} hovslagare: {len(created)} skapade, {len(rejected)} avvisade, "
+            f"{doubles} dubbelbokningar, {attempts / elapsed:.0f} försök/s"
+        )
+        for error in errors[:5]:
+            print(f"    ❌ {error}")
+
+    if total_doubles:
+        print(f"❌ {total_doubles} dubbelbokningar hittades")
+        sys.exit(1)
+    print("✅ Inga dubbelbokningar")
+
+
+if __name__ == "__main__":
+    main()
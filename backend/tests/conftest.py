@@ -0,0 +1,122 @@
+"""
+Gemensamma fixtures för API-testerna.
+
+Testerna kör mot en egen SQLite-fil i en temporär katalog. DATABASE_URL måste
+sättas innan appen importeras, eftersom motorn skapas vid import.
+"""
+import itertools
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+_test_dir = tempfile.mkdtemp(prefix="portalen-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_dir, 'test.db')}"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.database import SessionLocal
+from app.core.security import create_access_token
+from app.main import app
+from app.models.farrier import Farrier
+from app.models.horse import Horse
+from app.models.user import User
+
+_sequence = itertools.count(1)
+
+
+@dataclass
+class Account:
+    """En testanvändare med token, och hästar eller hovslagarprofil"""
+    user_id: int
+    email: str
+    headers: Dict[str, str]
+    farrier_id: Optional[int] = None
+    horse_ids: List[int] = field(default_factory=list)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Som context manager så att appens startup-händelser körs
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_account(db):
+    """
+    Skapa användare direkt i databasen med token från create_access_token,
+    så att testerna slipper bcrypt vid registrering och inloggning.
+    """
+    def make(role: str = "horse_owner", horses: int = 0, **fields) -> Account:
+        number = next(_sequence)
+        user = User(
+            email=f"test{number}@example.se",
+            hashed_password="-",
+            first_name="Test",
+            last_name=f"Nummer{number}",
+            role=role,
+            is_verified=True,
+            **fields
+        )
+        db.add(user)
+        db.flush()
+
+        farrier_id = None
+        if role == "farrier":
+            farrier = Farrier(user_id=user.id, is_verified=True)
+            db.add(farrier)
+            db.flush()
+            farrier_id = farrier.id
+
+        horse_rows = [Horse(owner_id=user.id, name=f"Häst {number}-{i}") for i in range(horses)]
+        db.add_all(horse_rows)
+        db.commit()
+
+        token = create_access_token(data={"sub": str(user.id), "role": role})
+        return Account(
+            user_id=user.id,
+            email=user.email,
+            headers={"Authorization": f"Bearer {token}"},
+            farrier_id=farrier_id,
+            horse_ids=[horse.id for horse in horse_rows],
+        )
+
+    return make
+
+
+@pytest.fixture
+def farrier(make_account) -> Account:
+    return make_account("farrier")
+
+
+@pytest.fixture
+def owner(make_account) -> Account:
+    return make_account(horses=3)
+
+
+@pytest.fixture
+def admin(make_account) -> Account:
+    return make_account("admin")
+
+
+def booking_payload(farrier: Account, horse_id: int, scheduled_date: str, **fields) -> dict:
+    return {
+        "farrier_id": farrier.farrier_id,
+        "horse_id": horse_id,
+        "service_type": "Verkning",
+        "scheduled_date": scheduled_date,
+        "duration_minutes": 60,
+        "service_price": 800,
+        **fields,
+    }
@@ -0,0 +1,40 @@
+"""Statistiken för admin-dashboarden"""
+from datetime import datetime
+
+from app.models.booking import Booking, BookingStatus
+from app.models.user import User
+from app.services.admin_stats import compute_statistics
+from app.services.booking_archive import archive_batch
+from tests.conftest import booking_payload
+
+
+def test_soft_deleted_accounts_are_not_counted(db, make_account):
+    before = compute_statistics(db)
+    account = make_account(horses=1)
+    assert compute_statistics(db)["total_horse_owners"] == before["total_horse_owners"] + 1
+
+    db.query(User).filter(User.id == account.user_id).update({User.deleted_at: datetime.utcnow()})
+    db.commit()
+    after = compute_statistics(db)
+    assert (after["total_users"], after["total_horse_owners"], after["new_users_last_30_days"]) == (
+        before["total_users"], before["total_horse_owners"], before["new_users_last_30_days"]
+    )
+
+
+def test_archived_bookings_are_counted(client, db, farrier, owner):
+    booking, _ = [
+        client.post(
+            "/api/bookings/", json=booking_payload(farrier, owner.horse_ids[0], scheduled_date),
+            headers=owner.headers
+        ).json()
+        # Den andra bokningen ligger kvar, så att SQLite inte återanvänder det arkiverade id:t
+        for scheduled_date in ("2031-03-03T10:00:00Z", "2031-03-04T10:00:00Z")
+    ]
+    db.query(Booking).filter(Booking.id == booking["id"]).update({Booking.status: BookingStatus.COMPLETED.value})
+    db.commit()
+    before = compute_statistics(db)
+
+    archive_batch(db, [booking["id"]], cutoff=datetime(2100, 1, 1))
+    after = compute_statistics(db)
+    for key in ("total_bookings", "bookings_by_status", "total_revenue"):
+        assert after[key] == before[key]
@@ -0,0 +1,83 @@
+"""Massåtgärder och borttagning av användare i admin"""
+from datetime import datetime
+
+from app.core.database import engine
+from app.core.migrations import run_migrations
+from app.models.farrier import Farrier
+from app.models.user import User
+from app.services.user_purge import mark_users_deleted
+
+
+def test_bulk_verify_selects_unverified_farrier_profiles(client, db, admin, make_account):
+    farrier = make_account("farrier")
+    # Kontot är verifierat men profilen väntar fortfarande, som i listan över väntande hovslagare
+    db.query(Farrier).filter(Farrier.id == farrier.farrier_id).update({Farrier.is_verified: False})
+    db.query(User).filter(User.id == farrier.user_id).update({User.is_verified: True})
+    db.commit()
+
+    response = client.post("/api/admin/users/bulk/verify", json={
+        "filter": {"role": "farrier", "is_verified": False, "search": farrier.email}
+    }, headers=admin.headers)
+
+    assert response.status_code == 200
+    assert farrier.user_id in response.json()["updated_ids"]
+    db.expire_all()
+    assert db.get(Farrier, farrier.farrier_id).is_verified
+    assert db.get(User, farrier.user_id).is_verified
+
+
+def test_bulk_verify_sets_both_flags(client, db, admin, make_account):
+    farrier = make_account("farrier")
+    db.query(Farrier).filter(Farrier.id == farrier.farrier_id).update({Farrier.is_verified: False})
+    db.query(User).filter(User.id == farrier.user_id).update({User.is_verified: False})
+    db.commit()
+
+    response = client.post(
+        "/api/admin/users/bulk/verify", json={"user_ids": [farrier.user_id]}, headers=admin.headers
+    )
+
+    assert response.json()["updated_ids"] == [farrier.user_id]
+    db.expire_all()
+    assert db.get(Farrier, farrier.farrier_id).is_verified
+    assert db.get(User, farrier.user_id).is_verified
+
+
+def test_deleted_email_can_be_registered_again(client, db, make_account):
+    account = make_account()
+    mark_users_deleted(db, [account.user_id])
+    db.commit()
+
+    response = client.post("/api/auth/register", json={
+        "email": account.email.upper(), "password": "hemligt123", "first_name": "Ny",
+        "last_name": "Användare", "role": "horse_owner"
+    })
+
+    assert response.status_code == 201
+    assert response.json()["id"] != account.user_id
+
+
+def test_pending_verification_skips_deleted_farriers(client, db, admin, make_account):
+    kept, deleted = make_account("farrier"), make_account("farrier")
+    db.query(Farrier).filter(Farrier.id.in_([kept.farrier_id, deleted.farrier_id])).update(
+        {Farrier.is_verified: False}, synchronize_session=False
+    )
+    mark_users_deleted(db, [deleted.user_id])
+    db.commit()
+
+    response = client.get("/api/admin/farriers/pending-verification", headers=admin.headers)
+
+    ids = {row["id"] for row in response.json()}
+    assert kept.farrier_id in ids
+    assert deleted.farrier_id not in ids
+
+
+def test_migrations_release_emails_of_earlier_deletions(db, make_account):
+    account = make_account()
+    # Markerad som borttagen innan adressen byttes ut vid borttagningen
+    db.query(User).filter(User.id == account.user_id).update({User.deleted_at: datetime.utcnow()})
+    db.commit()
+
+    run_migrations(engine)
+
+    db.expire_all()
+    assert db.get(User, account.user_id).email == f"deleted-{account.user_id}@deleted.invalid"
@@ -0,0 +1,60 @@
+"""Synk av bokningar med ändrings-token (/api/bookings/changes)"""
+from tests.conftest import booking_payload
+
+
+def sync_all(client, headers, since=None, limit=None):
+    """Bläddra tills has_more är falskt, returnera (sidor, sista token)"""
+    pages = []
+    while True:
+        params = {key: value for key, value in (("since", since), ("limit", limit)) if value is not None}
+        response = client.get("/api/bookings/changes", params=params, headers=headers)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append(page)
+        since = page["token"]
+        if not page["has_more"]:
+            return pages, since
+
+
+def test_paging_returns_every_booking_once(client, farrier, owner):
+    series = {
+        **booking_payload(farrier, owner.horse_ids[0], "2030-06-03T10:00:00Z"),
+        "recurrence": {"interval_weeks": 1, "occurrences": 5},
+    }
+    created = client.post("/api/bookings/series", json=series, headers=owner.headers).json()["created"]
+
+    pages, _ = sync_all(client, owner.headers, limit=2)
+    seen = [booking["id"] for page in pages for booking in page["changes"]]
+
+    assert len(pages) == 3
+    assert sorted(seen) == sorted(booking["id"] for booking in created)
+
+
+def test_token_returns_only_later_changes(client, farrier, owner):
+    first = booking_payload(farrier, owner.horse_ids[0], "2030-06-10T10:00:00Z")
+    booking = client.post("/api/bookings/", json=first, headers=owner.headers).json()
+    _, token = sync_all(client, farrier.headers)
+
+    pages, _ = sync_all(client, farrier.headers, since=token)
+    assert [page["changes"] for page in pages] == [[]]
+
+    client.put(f"/api/bookings/{booking['id']}/status", json={"status": "confirmed"}, headers=farrier.headers)
+    pages, token = sync_all(client, farrier.headers, since=token)
+    assert [(change["id"], change["status"]) for change in pages[0]["changes"]] == [(booking["id"], "confirmed")]
+
+
+def test_deleted_bookings_are_reported(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[1], "2030-06-11T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+    _, token = sync_all(client, farrier.headers)
+
+    # Att ta bort hästen tar bort dess bokningar
+    assert client.delete(f"/api/horses/{owner.horse_ids[1]}", headers=owner.headers).status_code == 204
+
+    pages, _ = sync_all(client, farrier.headers, since=token)
+    assert booking["id"] in [deleted for page in pages for deleted in page["deleted"]]
+
+
+def test_invalid_token_is_rejected(client, owner):
+    response = client.get("/api/bookings/changes", params={"since": "inte-en-token"}, headers=owner.headers)
+    assert response.status_code == 400
@@ -0,0 +1,66 @@
+"""Samtidiga bokningar genom API:t, se app/core/locks.py"""
+import threading
+from collections import Counter
+
+from app.core.locks import _farrier_locks
+from app.models.booking import Booking
+from tests.conftest import booking_payload
+
+SLOTS = ["2032-02-02T08:00:00Z", "2032-02-02T09:00:00Z", "2032-02-02T10:00:00Z", "2032-02-02T11:00:00Z"]
+
+
+def post_concurrently(client, requests):
+    """Skicka (payload, headers) från var sin tråd samtidigt, returnera statuskoderna i ordning"""
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def send(index, payload, headers):
+        barrier.wait()
+        results[index] = client.post("/api/bookings/", json=payload, headers=headers).status_code
+
+    threads = [
+        threading.Thread(target=send, args=(index, payload, headers))
+        for index, (payload, headers) in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    return results
+
+
+def test_exactly_one_booking_per_slot(client, db, farrier, make_account):
+    owners = [make_account(horses=1) for _ in range(12)]
+    requests = [
+        (booking_payload(farrier, owner.horse_ids[0], SLOTS[index % len(SLOTS)]), owner.headers)
+        for index, owner in enumerate(owners)
+    ]
+
+    results = post_concurrently(client, requests)
+
+    winners = Counter(SLOTS[index % len(SLOTS)] for index, code in enumerate(results) if code == 201)
+    assert winners == Counter(SLOTS)
+    assert sorted(results) == [201] * len(SLOTS) + [409] * (len(owners) - len(SLOTS))
+    assert db.query(Booking).filter(Booking.farrier_id == farrier.farrier_id).count() == len(SLOTS)
+
+
+def test_other_farriers_are_not_blocked(client, make_account):
+    busy, free = make_account("farrier"), make_account("farrier")
+    owner = make_account(horses=2)
+    results = {}
+
+    def book(farrier, horse_id):
+        payload = booking_payload(farrier, horse_id, "2032-03-01T10:00:00Z")
+        results[farrier.farrier_id] = client.post("/api/bookings/", json=payload, headers=owner.headers).status_code
+
+    waiting = threading.Thread(target=book, args=(busy, owner.horse_ids[0]))
+    passing = threading.Thread(target=book, args=(free, owner.horse_ids[1]))
+    with _farrier_locks.hold(busy.farrier_id):
+        waiting.start()
+        passing.start()
+        # Går bara igenom om anropet som väntar på låset inte blockerar event-loopen
+        passing.join(timeout=10)
+        assert results.get(free.farrier_id) == 201
+        assert waiting.is_alive()
+    waiting.join(timeout=10)
+    assert results.get(busy.farrier_id) == 201
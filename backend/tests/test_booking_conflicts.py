@@ -0,0 +1,74 @@
+"""Krockkontroll för bokningar, serier och statusändringar"""
+from tests.conftest import booking_payload
+
+
+def test_overlapping_booking_is_rejected(client, farrier, owner):
+    first = booking_payload(farrier, owner.horse_ids[0], "2030-01-07T10:00:00Z")
+    assert client.post("/api/bookings/", json=first, headers=owner.headers).status_code == 201
+
+    overlapping = booking_payload(farrier, owner.horse_ids[1], "2030-01-07T10:30:00Z")
+    response = client.post("/api/bookings/", json=overlapping, headers=owner.headers)
+    assert response.status_code == 409
+
+    adjacent = booking_payload(farrier, owner.horse_ids[1], "2030-01-07T11:00:00Z")
+    assert client.post("/api/bookings/", json=adjacent, headers=owner.headers).status_code == 201
+
+
+def test_cancelled_booking_frees_the_slot(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-01-08T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+    assert client.put(f"/api/bookings/{booking['id']}/cancel", headers=owner.headers).status_code == 200
+
+    assert client.post("/api/bookings/", json=payload, headers=owner.headers).status_code == 201
+
+
+def test_series_skips_conflicting_occurrences(client, farrier, owner):
+    taken = booking_payload(farrier, owner.horse_ids[0], "2030-03-18T10:00:00Z")
+    assert client.post("/api/bookings/", json=taken, headers=owner.headers).status_code == 201
+
+    series = {
+        **booking_payload(farrier, owner.horse_ids[1], "2030-02-04T10:00:00Z"),
+        "recurrence": {"interval_weeks": 6, "occurrences": 4},
+    }
+    response = client.post("/api/bookings/series", json=series, headers=owner.headers)
+    assert response.status_code == 201
+    body = response.json()
+    assert len(body["created"]) == 3
+    assert [conflict["occurrence"] for conflict in body["conflicts"]] == [1]
+
+    # Samma serie igen krockar med alla tillfällen
+    response = client.post("/api/bookings/series", json=series, headers=owner.headers)
+    assert response.status_code == 409
+
+
+def test_status_update_with_stale_version_conflicts(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-04-01T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+    version = booking["version"]
+
+    confirmed = client.put(
+        f"/api/bookings/{booking['id']}/status",
+        json={"status": "confirmed", "version": version},
+        headers=farrier.headers,
+    )
+    assert confirmed.status_code == 200
+    assert confirmed.json()["version"] == version + 1
+
+    stale = client.put(
+        f"/api/bookings/{booking['id']}/status",
+        json={"status": "completed", "version": version},
+        headers=farrier.headers,
+    )
+    assert stale.status_code == 409
+
+
+def test_invalid_status_transition_is_rejected(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-04-02T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+
+    response = client.put(
+        f"/api/bookings/{booking['id']}/status",
+        json={"status": "completed"},
+        headers=farrier.headers,
+    )
+    assert response.status_code == 400
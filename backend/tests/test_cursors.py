@@ -0,0 +1,89 @@
+"""Sidor med keyset-cursor: omdömen per hovslagare och adminlistorna"""
+from datetime import datetime
+
+from app.models.booking import Booking, BookingStatus
+from app.models.review import Review
+from app.services.booking_archive import archive_batch
+from tests.conftest import booking_payload
+
+
+def collect(client, url, key, headers=None, **params):
+    """Alla rader från en cursor-lista, sida för sida"""
+    rows, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor is not None else {}))
+        response = client.get(url, params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        rows.extend(page[key])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+def create_bookings(client, farrier, owner, count, day=1):
+    ids = []
+    for i in range(count):
+        payload = booking_payload(farrier, owner.horse_ids[i % len(owner.horse_ids)], f"2031-01-{day + i:02d}T10:00:00Z")
+        response = client.post("/api/bookings/", json=payload, headers=owner.headers)
+        assert response.status_code == 201, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+
+def test_farrier_reviews_are_paged_without_gaps(client, db, farrier, owner):
+    booking_ids = create_bookings(client, farrier, owner, 9)
+    db.query(Booking).filter(Booking.id.in_(booking_ids)).update(
+        {Booking.status: BookingStatus.COMPLETED.value}, synchronize_session=False
+    )
+    db.commit()
+    ratings = [5, 4, 3, 5, 1, 2, 5, 4, 4]
+    for booking_id, rating in zip(booking_ids, ratings):
+        review = {"booking_id": booking_id, "rating": rating, "comment": "Bra" if rating > 3 else None}
+        assert client.post("/api/reviews/", json=review, headers=owner.headers).status_code == 201
+    # Samma tidpunkt på flera omdömen, id avgör ordningen
+    db.query(Review).filter(Review.farrier_id == farrier.farrier_id, Review.rating == 5).update(
+        {Review.created_at: datetime(2030, 1, 1)}, synchronize_session=False
+    )
+    db.commit()
+
+    url = f"/api/reviews/farrier/{farrier.farrier_id}"
+    for sort, expected_count in (("newest", 9), ("highest", 9), ("lowest", 9), ("with_text", 6)):
+        reviews = collect(client, url, "reviews", sort=sort, limit=2)
+        assert len(reviews) == expected_count
+        assert len({review["id"] for review in reviews}) == expected_count
+        if sort == "highest":
+            assert [review["rating"] for review in reviews] == sorted(ratings, reverse=True)
+        if sort == "lowest":
+            assert [review["rating"] for review in reviews] == sorted(ratings)
+
+    assert client.get(url, params={"cursor": "skräp"}).status_code == 400
+
+
+def test_admin_users_are_paged_newest_first(client, admin, make_account):
+    created = [make_account().user_id for _ in range(5)]
+
+    users = collect(client, "/api/admin/users", "users", headers=admin.headers, limit=2)
+    ids = [user["id"] for user in users]
+
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == len(set(ids))
+    assert set(created) <= set(ids)
+
+
+def test_admin_bookings_include_archived_rows(client, db, admin, farrier, owner):
+    booking_ids = create_bookings(client, farrier, owner, 6, day=10)
+    archived_ids = booking_ids[1::2]
+    db.query(Booking).filter(Booking.id.in_(archived_ids)).update(
+        {Booking.status: BookingStatus.COMPLETED.value}, synchronize_session=False
+    )
+    db.commit()
+    archive_batch(db, archived_ids, cutoff=datetime(2100, 1, 1))
+    assert db.query(Booking).filter(Booking.id.in_(archived_ids)).count() == 0
+
+    bookings = collect(client, "/api/admin/bookings", "bookings", headers=admin.headers, limit=2)
+    ids = [booking["id"] for booking in bookings]
+
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == len(set(ids))
+    assert set(booking_ids) <= set(ids)
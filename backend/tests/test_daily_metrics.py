@@ -0,0 +1,45 @@
+"""Uppbyggnaden av daily_metrics och adminstatistiken ovanpå dem"""
+from datetime import datetime
+
+from app.core.database import engine
+from app.core.migrations import run_migrations
+from app.models.rollup import DailyMetric, RollupState
+from app.services.admin_stats import compute_statistics, compute_statistics_from_tables
+from app.services.daily_metrics import daily_metrics_backfilled
+from tests.conftest import booking_payload
+
+
+def comparable(stats: dict) -> dict:
+    stats = {key: value for key, value in stats.items() if key != "generated_at"}
+    stats["total_revenue"] = round(stats["total_revenue"], 2)
+    return stats
+
+
+def test_migrations_backfill_daily_metrics(client, db, farrier, owner):
+    client.post(
+        "/api/bookings/", json=booking_payload(farrier, owner.horse_ids[0], "2031-05-05T10:00:00Z"),
+        headers=owner.headers
+    )
+    # En databas från före sammanställningarna: inga rader och ingen markering
+    db.query(RollupState).delete()
+    db.query(DailyMetric).delete()
+    db.commit()
+    now = datetime.utcnow()
+    assert not daily_metrics_backfilled(db)
+    assert comparable(compute_statistics(db, now)) == comparable(compute_statistics_from_tables(db, now))
+
+    run_migrations(engine)
+
+    assert daily_metrics_backfilled(db)
+    assert db.query(DailyMetric).count() > 0
+    assert comparable(compute_statistics(db, now)) == comparable(compute_statistics_from_tables(db, now))
+
+
+def test_migrations_keep_existing_daily_metrics(db):
+    run_migrations(engine)
+    marked = db.get(RollupState, "daily_metrics").completed_at
+
+    run_migrations(engine)
+
+    db.expire_all()
+    assert db.get(RollupState, "daily_metrics").completed_at == marked
@@ -0,0 +1,36 @@
+"""Omförsök med Idempotency-Key"""
+from tests.conftest import booking_payload
+
+
+def test_replay_returns_the_first_response(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-05-06T10:00:00Z")
+    headers = {**owner.headers, "Idempotency-Key": "boka-1"}
+
+    first = client.post("/api/bookings/", json=payload, headers=headers)
+    replay = client.post("/api/bookings/", json=payload, headers=headers)
+
+    assert first.status_code == replay.status_code == 201
+    assert replay.json() == first.json()
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    bookings = client.get("/api/bookings/", headers=owner.headers).json()
+    assert [booking["id"] for booking in bookings] == [first.json()["id"]]
+
+
+def test_same_key_with_other_payload_is_rejected(client, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-05-07T10:00:00Z")
+    headers = {**owner.headers, "Idempotency-Key": "boka-2"}
+    assert client.post("/api/bookings/", json=payload, headers=headers).status_code == 201
+
+    response = client.post("/api/bookings/", json={**payload, "service_price": 1}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_keys_are_scoped_per_user(client, farrier, make_account):
+    first, second = make_account(horses=1), make_account(horses=1)
+    for account, start in ((first, "2030-05-08T10:00:00Z"), (second, "2030-05-08T12:00:00Z")):
+        payload = booking_payload(farrier, account.horse_ids[0], start)
+        response = client.post(
+            "/api/bookings/", json=payload, headers={**account.headers, "Idempotency-Key": "samma"}
+        )
+        assert response.status_code == 201
+        assert "Idempotent-Replayed" not in response.headers
@@ -0,0 +1,50 @@
+"""Inloggningens uppslag via email_normalized"""
+import logging
+
+from sqlalchemy import text
+
+from app.core.database import engine
+from app.core.migrations import run_migrations
+from app.models.user import User
+
+INDEX_NAME = "ix_users_email_normalized"
+
+
+def login_query(db, email: str):
+    """Samma fråga som login i app/api/auth.py"""
+    return db.query(User).filter(User.email_normalized == email, User.deleted_at.is_(None))
+
+
+def query_plan(db, query) -> str:
+    compiled = query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    if engine.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    return "\n".join(row[0] for row in db.execute(text(f"EXPLAIN {compiled}")))
+
+
+def test_login_lookup_uses_the_index(db):
+    assert INDEX_NAME in query_plan(db, login_query(db, "test1@example.se"))
+
+
+def test_case_duplicates_do_not_stop_startup(client, db, caplog):
+    # Rader från före kolumnen: utan email_normalized
+    insert = text(
+        "INSERT INTO users (email, hashed_password, first_name, last_name, role) "
+        "VALUES (:email, '-', 'Dubblett', 'Test', 'horse_owner')"
+    )
+    with engine.begin() as conn:
+        for email in ("Krock@Example.se", "krock@example.se ", "ensam@example.se"):
+            conn.execute(insert, {"email": email})
+    rows = dict(db.query(User.email, User.id).filter(User.first_name == "Dubblett"))
+
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.core.migrations"):
+            run_migrations(engine)
+
+        assert f"id {rows['Krock@Example.se']}" in caplog.text
+        db.expire_all()
+        assert login_query(db, "ensam@example.se").one().id == rows["ensam@example.se"]
+        assert login_query(db, "krock@example.se").first() is None
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM users WHERE first_name = 'Dubblett'"))
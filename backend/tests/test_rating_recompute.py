@@ -0,0 +1,43 @@
+"""Omräkning av betygsaggregat som bakgrundsjobb"""
+import time
+
+from app.models.booking import Booking, BookingStatus
+from app.models.farrier import Farrier
+from tests.conftest import booking_payload
+
+
+def wait_for_job(client, admin, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/admin/reports/{job_id}", headers=admin.headers).json()
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_recompute_runs_in_the_background(client, db, admin, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-10-07T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+    db.query(Booking).filter(Booking.id == booking["id"]).update({Booking.status: BookingStatus.COMPLETED.value})
+    db.commit()
+    client.post("/api/reviews/", json={"booking_id": booking["id"], "rating": 3}, headers=owner.headers)
+    # Aggregat som glidit isär
+    db.query(Farrier).filter(Farrier.id == farrier.farrier_id).update(
+        {Farrier.rating_sum: 40, Farrier.total_reviews: 9, Farrier.average_rating: 4.4}
+    )
+    db.commit()
+
+    response = client.post(
+        "/api/admin/ratings/recompute", params={"farrier_id": farrier.farrier_id}, headers=admin.headers
+    )
+    assert response.status_code == 202
+    job = wait_for_job(client, admin, response.json()["id"])
+
+    assert (job["status"], job["progress"], job["row_count"], job["download_url"]) == ("completed", 100, 1, None)
+    db.expire_all()
+    profile = db.get(Farrier, farrier.farrier_id)
+    assert (profile.rating_sum, profile.total_reviews, profile.average_rating) == (3, 1, 3.0)
+
+
+def test_recompute_requires_admin(client, owner):
+    assert client.post("/api/admin/ratings/recompute", headers=owner.headers).status_code == 403
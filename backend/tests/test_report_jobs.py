@@ -0,0 +1,67 @@
+"""Kön för rapportjobb: livssignal och tak för samtidiga jobb"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.report import ReportJob, ReportStatus
+from app.services.reports import RATING_RECOMPUTE, recover_report_jobs, run_report_job
+
+
+def make_job(db, status: str, heartbeat_at=None, **parameters) -> ReportJob:
+    job = ReportJob(
+        report_type=RATING_RECOMPUTE, output_format="none", parameters=json.dumps(parameters),
+        status=status, started_at=heartbeat_at, heartbeat_at=heartbeat_at,
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+@pytest.fixture
+def jobs(db):
+    """Skapade jobb tas bort efteråt, så att pågående jobb inte tar platser i andra tester"""
+    created = []
+
+    def make(*args, **kwargs) -> ReportJob:
+        job = make_job(db, *args, **kwargs)
+        created.append(job.id)
+        return job
+
+    yield make
+    db.query(ReportJob).filter(ReportJob.id.in_(created)).delete(synchronize_session=False)
+    db.commit()
+
+
+def test_recovery_only_fails_jobs_without_heartbeat(db, jobs):
+    now = datetime.utcnow()
+    alive = jobs(ReportStatus.RUNNING.value, now)
+    dead = jobs(ReportStatus.RUNNING.value, now - timedelta(seconds=settings.REPORT_STALE_SECONDS + 1))
+
+    recover_report_jobs(SessionLocal)
+
+    db.expire_all()
+    assert db.get(ReportJob, alive.id).status == ReportStatus.RUNNING.value
+    assert db.get(ReportJob, dead.id).status == ReportStatus.FAILED.value
+
+
+def test_concurrency_cap_is_shared_through_the_database(db, jobs, farrier):
+    # Jobb som andra processer kör just nu
+    running = [jobs(ReportStatus.RUNNING.value, datetime.utcnow()) for _ in range(settings.REPORT_MAX_CONCURRENT_JOBS)]
+    queued = jobs(ReportStatus.QUEUED.value, farrier_ids=[farrier.farrier_id])
+
+    run_report_job(queued.id, SessionLocal)
+    db.expire_all()
+    assert db.get(ReportJob, queued.id).status == ReportStatus.QUEUED.value
+
+    db.query(ReportJob).filter(ReportJob.id.in_([job.id for job in running])).update(
+        {ReportJob.status: ReportStatus.COMPLETED.value}, synchronize_session=False
+    )
+    db.commit()
+    run_report_job(queued.id, SessionLocal)
+    db.expire_all()
+    job = db.get(ReportJob, queued.id)
+    assert job.status == ReportStatus.COMPLETED.value
+    assert job.heartbeat_at is not None
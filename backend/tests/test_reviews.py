@@ -0,0 +1,74 @@
+"""Omdömen och hovslagarens betygsaggregat"""
+import pytest
+
+from app.models.booking import Booking, BookingStatus
+from app.services.user_purge import mark_users_deleted
+from tests.conftest import booking_payload
+
+
+@pytest.fixture
+def review(client, db, farrier, owner):
+    payload = booking_payload(farrier, owner.horse_ids[0], "2030-09-02T10:00:00Z")
+    booking = client.post("/api/bookings/", json=payload, headers=owner.headers).json()
+    db.query(Booking).filter(Booking.id == booking["id"]).update({Booking.status: BookingStatus.COMPLETED.value})
+    db.commit()
+    response = client.post("/api/reviews/", headers=owner.headers, json={
+        "booking_id": booking["id"], "rating": 4, "quality_rating": 5
+    })
+    assert response.status_code == 201
+    return response.json()
+
+
+def farrier_summary(client, farrier):
+    page = client.get(f"/api/reviews/farrier/{farrier.farrier_id}").json()
+    return page["average_rating"], page["total_reviews"], page["histogram"]
+
+
+def test_null_rating_is_rejected(client, farrier, owner, review):
+    response = client.put(f"/api/reviews/{review['id']}", json={"rating": None}, headers=owner.headers)
+
+    assert response.status_code == 422
+    assert farrier_summary(client, farrier) == (4.0, 1, {"1": 0, "2": 0, "3": 0, "4": 1, "5": 0})
+
+
+def test_update_moves_the_rating_in_the_aggregates(client, farrier, owner, review):
+    response = client.put(
+        f"/api/reviews/{review['id']}", json={"rating": 2, "quality_rating": None}, headers=owner.headers
+    )
+
+    assert response.status_code == 200
+    assert response.json()["quality_rating"] is None
+    assert farrier_summary(client, farrier) == (2.0, 1, {"1": 0, "2": 1, "3": 0, "4": 0, "5": 0})
+
+
+def test_admin_moderation_hides_reviews(client, admin, farrier, owner, review):
+    queue = client.get(
+        "/api/admin/reviews/moderation", params={"farrier_id": farrier.farrier_id}, headers=admin.headers
+    )
+    assert queue.status_code == 200
+    assert [row["id"] for row in queue.json()["reviews"]] == [review["id"]]
+
+    response = client.post("/api/admin/reviews/moderation/visibility", headers=admin.headers, json={
+        "review_ids": [review["id"], 999999], "is_visible": False
+    })
+    assert response.status_code == 200
+    assert response.json()["updated_ids"] == [review["id"]]
+    assert response.json()["not_found_ids"] == [999999]
+    assert farrier_summary(client, farrier) == (0.0, 0, {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0})
+
+
+def test_moderation_requires_admin(client, owner):
+    assert client.get("/api/admin/reviews/moderation", headers=owner.headers).status_code == 403
+    assert client.post("/api/admin/reviews/moderation/visibility", headers=owner.headers, json={
+        "review_ids": [1], "is_visible": False
+    }).status_code == 403
+
+
+def test_reviews_by_deleted_authors_are_hidden_at_once(client, db, farrier, owner, review):
+    # Bara markeringen; rensningen i bakgrunden har inte hunnit köras
+    mark_users_deleted(db, [owner.user_id])
+    db.commit()
+
+    page = client.get(f"/api/reviews/farrier/{farrier.farrier_id}").json()
+    assert page["reviews"] == []
+    assert farrier_summary(client, farrier) == (0.0, 0, {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0})
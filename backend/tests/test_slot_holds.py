@@ -0,0 +1,47 @@
+"""Tillfälliga reservationer och erbjudanden från väntelistan"""
+from app.models.slot_hold import SlotHold
+from app.models.waitlist import WaitlistEntry, WaitlistStatus
+from tests.conftest import booking_payload
+
+
+def hold(client, account, farrier, scheduled_date):
+    return client.post("/api/bookings/holds", headers=account.headers, json={
+        "farrier_id": farrier.farrier_id, "scheduled_date": scheduled_date, "duration_minutes": 60
+    })
+
+
+def test_new_hold_replaces_the_previous_one(client, db, farrier, owner, make_account):
+    first = hold(client, owner, farrier, "2032-04-05T08:00:00Z")
+    second = hold(client, owner, farrier, "2032-04-05T12:00:00Z")
+    assert first.status_code == second.status_code == 201
+
+    holds = db.query(SlotHold.id).filter(SlotHold.holder_id == owner.user_id).all()
+    assert holds == [(second.json()["id"],)]
+
+    # Den släppta tiden är ledig för andra, den nya är upptagen
+    other = make_account(horses=1)
+    assert hold(client, other, farrier, "2032-04-05T08:00:00Z").status_code == 201
+    assert hold(client, other, farrier, "2032-04-05T12:00:00Z").status_code == 409
+
+
+def test_checkout_hold_keeps_the_waitlist_offer(client, db, farrier, owner, make_account):
+    waiting = make_account(horses=1)
+    entry = client.post("/api/waitlist/", headers=waiting.headers, json={
+        "farrier_id": farrier.farrier_id, "earliest_date": "2032-04-01", "latest_date": "2032-04-10"
+    }).json()
+    booking = client.post(
+        "/api/bookings/", headers=owner.headers,
+        json=booking_payload(farrier, owner.horse_ids[0], "2032-04-06T10:00:00Z")
+    ).json()
+    assert client.put(f"/api/bookings/{booking['id']}/cancel", headers=owner.headers).status_code == 200
+
+    assert db.get(WaitlistEntry, entry["id"]).status == WaitlistStatus.NOTIFIED.value
+
+    assert hold(client, waiting, farrier, "2032-04-07T10:00:00Z").status_code == 201
+
+    db.expire_all()
+    held = db.query(SlotHold.scheduled_date).filter(SlotHold.holder_id == waiting.user_id)
+    assert sorted(start.isoformat() for start, in held) == ["2032-04-06T10:00:00", "2032-04-07T10:00:00"]
+    assert db.get(WaitlistEntry, entry["id"]).status == WaitlistStatus.NOTIFIED.value
+    # Den erbjudna tiden är fortfarande upptagen för andra
+    assert hold(client, owner, farrier, "2032-04-06T10:00:00Z").status_code == 409
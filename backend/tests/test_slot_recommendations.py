@@ -0,0 +1,50 @@
+"""Rekommenderade tider: arbetstider i lokal tid, bokningar i UTC"""
+from datetime import time
+
+import pytest
+
+from app.models.farrier import Farrier, FarrierSchedule
+from tests.conftest import booking_payload
+
+KIRUNA = (67.8558, 20.2253)
+
+
+@pytest.fixture
+def morning_farrier(db, farrier):
+    """Arbetar måndagar 08-10 lokal tid, med bas i Kiruna"""
+    profile = db.get(Farrier, farrier.farrier_id)
+    profile.base_latitude, profile.base_longitude = KIRUNA
+    db.add(FarrierSchedule(farrier_id=profile.id, day_of_week=0, start_time=time(8), end_time=time(10)))
+    db.commit()
+    return farrier
+
+
+def recommend(client, farrier, day):
+    response = client.get("/api/availability/recommendations", params={
+        "latitude": KIRUNA[0], "longitude": KIRUNA[1], "date_from": day, "date_to": day,
+        "radius_km": 5, "limit": 10,
+    })
+    assert response.status_code == 200
+    return [
+        (slot["scheduled_date"], slot["time"])
+        for slot in response.json()["recommendations"] if slot["farrier_id"] == farrier.farrier_id
+    ]
+
+
+@pytest.mark.parametrize("day, first_utc", [
+    ("2032-06-07", "2032-06-07T06:00:00+00:00"),  # Sommartid, UTC+2
+    ("2032-01-05", "2032-01-05T07:00:00+00:00"),  # Vintertid, UTC+1
+])
+def test_schedule_times_are_local(client, morning_farrier, day, first_utc):
+    slots = recommend(client, morning_farrier, day)
+
+    assert slots[0] == (first_utc, "08:00")
+    assert [local for _, local in slots] == ["08:00", "08:30", "09:00"]
+
+
+def test_booking_in_utc_blocks_the_local_slot(client, morning_farrier, owner):
+    # 06:00 UTC är 08:00 lokal tid på sommaren
+    payload = booking_payload(morning_farrier, owner.horse_ids[0], "2032-06-07T06:00:00Z")
+    assert client.post("/api/bookings/", json=payload, headers=owner.headers).status_code == 201
+
+    assert [local for _, local in recommend(client, morning_farrier, "2032-06-07")] == ["09:00"]
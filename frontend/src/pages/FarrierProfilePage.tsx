@@ -1,5 +1,6 @@
+import { useState } from 'react';
 import { useParams, Link } from 'react-router-dom';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useInfiniteQuery } from '@tanstack/react-query';
 import { MapContainer, TileLayer, Marker, Circle } from 'react-leaflet';
 import { Icon } from 'leaflet';
 import {
@@ -8,6 +9,7 @@ import {
 } from 'lucide-react';
 import BackButton from '../components/BackButton';
 import { farriersApi, reviewsApi } from '../services/api';
+import type { ReviewSort } from '../types';
 import { useAuthStore } from '../store/authStore';
 import { format } from 'date-fns';
 import { sv } from 'date-fns/locale';
@@ -23,6 +25,13 @@ const markerIcon = new Icon({
 
 const DAYS = ['Måndag', 'Tisdag', 'Onsdag', 'Torsdag', 'Fredag', 'Lördag', 'Söndag'];
 
+const REVIEW_SORTS: { value: ReviewSort; label: string }[] = [
+  { value: 'newest', label: 'Nyast' },
+  { value: 'highest', label: 'Högst betyg' },
+  { value: 'lowest', label: 'Lägst betyg' },
+  { value: 'with_text', label: 'Med text' },
+];
+
 export default function FarrierProfilePage() {
   const { id } = useParams<{ id: string }>();
   const { user, isAuthenticated } = useAuthStore();
@@ -33,11 +42,23 @@ export default function FarrierProfilePage() {
     enabled: !!id,
   });
 
-  const { data: reviews } = useQuery({
-    queryKey: ['farrier-reviews', id],
-    queryFn: () => reviewsApi.listForFarrier(Number(id)),
+  const [reviewSort, setReviewSort] = useState<ReviewSort>('newest');
+
+  const {
+    data: reviewPages,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['farrier-reviews', id, reviewSort],
+    queryFn: ({ pageParam }) =>
+      reviewsApi.listForFarrier(Number(id), { sort: reviewSort, cursor: pageParam }),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
     enabled: !!id,
   });
+  const reviews = reviewPages?.pages.flatMap((page) => page.reviews);
+  const reviewSummary = reviewPages?.pages[0];
 
   if (isLoading) {
     return (
@@ -213,9 +234,41 @@ export default function FarrierProfilePage() {
 
             {/* Reviews */}
             <div className="card p-6">
-              <h2 className="font-display text-xl font-semibold text-earth-900 mb-4">
-                Omdömen ({reviews?.length || 0})
-              </h2>
+              <div className="flex items-center justify-between mb-4">
+                <h2 className="font-display text-xl font-semibold text-earth-900">
+                  Omdömen ({reviewSummary?.total_reviews || 0})
+                </h2>
+                <select
+                  value={reviewSort}
+                  onChange={(e) => setReviewSort(e.target.value as ReviewSort)}
+                  className="input w-auto text-sm"
+                >
+                  {REVIEW_SORTS.map((option) => (
+                    <option key={option.value} value={option.value}>{option.label}</option>
+                  ))}
+                </select>
+              </div>
+
+              {reviewSummary && reviewSummary.total_reviews > 0 && (
+                <div className="mb-6 space-y-1">
+                  {[5, 4, 3, 2, 1].map((star) => {
+                    const count = reviewSummary.histogram[star] || 0;
+                    return (
+                      <div key={star} className="flex items-center gap-2 text-sm">
+                        <span className="w-4 text-earth-600">{star}</span>
+                        <Star className="w-4 h-4 text-amber-400 fill-current" />
+                        <div className="flex-1 h-2 bg-earth-100 rounded-full overflow-hidden">
+                          <div
+                            className="h-2 bg-amber-400"
+                            style={{ width: `${(count / reviewSummary.total_reviews) * 100}%` }}
+                          />
+                        </div>
+                        <span className="w-8 text-right text-earth-500">{count}</span>
+                      </div>
+                    );
+                  })}
+                </div>
+              )}
               
               {reviews?.length ? (
                 <div className="space-y-4">
@@ -271,6 +324,15 @@ export default function FarrierProfilePage() {
                       </div>
                     </div>
                   ))}
+                  {hasNextPage && (
+                    <button
+                      onClick={() => fetchNextPage()}
+                      disabled={isFetchingNextPage}
+                      className="btn-secondary w-full"
+                    >
+                      {isFetchingNextPage ? 'Laddar...' : 'Visa fler omdömen'}
+                    </button>
+                  )}
                 </div>
               ) : (
                 <p className="text-earth-500 text-center py-8">
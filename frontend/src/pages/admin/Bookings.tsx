@@ -1,6 +1,6 @@
-import { useState } from 'react';
-import { useQuery } from '@tanstack/react-query';
-import { Calendar } from 'lucide-react';
+import { useEffect, useState } from 'react';
+import { useInfiniteQuery } from '@tanstack/react-query';
+import { Calendar, Search } from 'lucide-react';
 import BackButton from '../../components/BackButton';
 import { adminApi } from '../../services/api';
 import { format } from 'date-fns';
@@ -16,11 +16,30 @@ const STATUS_MAP: Record<string, { label: string; class: string }> = {
 
 export default function AdminBookings() {
   const [statusFilter, setStatusFilter] = useState<string>('');
+  const [search, setSearch] = useState('');
+  const [debouncedSearch, setDebouncedSearch] = useState('');
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search.trim()), 250);
+    return () => clearTimeout(timer);
+  }, [search]);
 
-  const { data: bookings, isLoading } = useQuery({
-    queryKey: ['admin-bookings', statusFilter],
-    queryFn: () => adminApi.listAllBookings(statusFilter || undefined),
+  const {
+    data: bookingPages,
+    isLoading,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['admin-bookings', statusFilter, debouncedSearch],
+    queryFn: ({ pageParam }) => adminApi.listAllBookings({
+      status_filter: statusFilter || undefined,
+      search: debouncedSearch || undefined,
+      cursor: pageParam,
+    }),
+    initialPageParam: undefined as number | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
   });
+  const bookings = bookingPages?.pages.flatMap((page) => page.bookings);
 
   return (
     <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
@@ -36,18 +55,31 @@ export default function AdminBookings() {
           <p className="text-earth-600 mt-1">Övervaka och hantera bokningar på plattformen</p>
         </div>
         
-        <select
-          className="input w-auto"
-          value={statusFilter}
-          onChange={(e) => setStatusFilter(e.target.value)}
-        >
-          <option value="">Alla status</option>
-          <option value="pending">Väntar</option>
-          <option value="confirmed">Bekräftade</option>
-          <option value="in_progress">Pågående</option>
-          <option value="completed">Slutförda</option>
-          <option value="cancelled">Avbokade</option>
-        </select>
+        <div className="flex flex-col md:flex-row gap-4">
+          <div className="relative">
+            <Search className="absolute left-4 top-1/2 -translate-y-1/2 w-5 h-5 text-earth-400" />
+            <input
+              type="text"
+              placeholder="Hästägare eller hovslagare..."
+              className="input pl-12"
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+            />
+          </div>
+
+          <select
+            className="input w-auto"
+            value={statusFilter}
+            onChange={(e) => setStatusFilter(e.target.value)}
+          >
+            <option value="">Alla status</option>
+            <option value="pending">Väntar</option>
+            <option value="confirmed">Bekräftade</option>
+            <option value="in_progress">Pågående</option>
+            <option value="completed">Slutförda</option>
+            <option value="cancelled">Avbokade</option>
+          </select>
+        </div>
       </div>
 
       {/* Bookings Table */}
@@ -103,6 +135,18 @@ export default function AdminBookings() {
             </table>
           </div>
         )}
+
+        {hasNextPage && (
+          <div className="p-4 border-t border-earth-100">
+            <button
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+              className="btn-secondary w-full"
+            >
+              {isFetchingNextPage ? 'Laddar...' : 'Visa fler bokningar'}
+            </button>
+          </div>
+        )}
         
         {bookings?.length === 0 && (
           <div className="text-center py-20">
@@ -1,5 +1,5 @@
-import { useState } from 'react';
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useEffect, useState } from 'react';
+import { useInfiniteQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { Search, MoreVertical, CheckCircle, XCircle, Trash2, Shield, User } from 'lucide-react';
 import BackButton from '../../components/BackButton';
 import toast from 'react-hot-toast';
@@ -19,16 +19,35 @@ export default function AdminUsers() {
   const [roleFilter, setRoleFilter] = useState<string>('');
   const [activeFilter, setActiveFilter] = useState<string>('');
   const [menuOpen, setMenuOpen] = useState<number | null>(null);
+  const [selected, setSelected] = useState<Set<number>>(new Set());
   const queryClient = useQueryClient();
 
-  const { data: users, isLoading } = useQuery({
-    queryKey: ['admin-users', search, roleFilter, activeFilter],
-    queryFn: () => adminApi.listUsers({
-      search: search || undefined,
+  // Sök först när användaren slutat skriva en stund, inte per tangenttryckning
+  const [debouncedSearch, setDebouncedSearch] = useState('');
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(search.trim()), 250);
+    return () => clearTimeout(timer);
+  }, [search]);
+
+  const {
+    data: userPages,
+    isLoading,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['admin-users', debouncedSearch, roleFilter, activeFilter],
+    queryFn: ({ pageParam }) => adminApi.listUsers({
+      search: debouncedSearch || undefined,
       role: roleFilter || undefined,
       is_active: activeFilter === '' ? undefined : activeFilter === 'true',
+      cursor: pageParam,
     }),
+    initialPageParam: undefined as number | undefined,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
   });
+  const users = userPages?.pages.flatMap((page) => page.users);
+  const firstPage = userPages?.pages[0];
 
   const toggleActiveMutation = useMutation({
     mutationFn: adminApi.toggleUserActive,
@@ -57,6 +76,49 @@ export default function AdminUsers() {
     onError: () => toast.error('Kunde inte ta bort'),
   });
 
+  const bulkMutation = useMutation({
+    mutationFn: async (action: 'activate' | 'deactivate' | 'verify' | 'delete') => {
+      const selection = { user_ids: Array.from(selected) };
+      if (action === 'delete') {
+        const result = await adminApi.bulkDelete(selection);
+        return { done: result.deleted_ids.length, skipped: result.skipped_ids.length };
+      }
+      const result = action === 'verify'
+        ? await adminApi.bulkVerify(selection)
+        : await adminApi.bulkSetActive(selection, action === 'activate');
+      return { done: result.updated_ids.length, skipped: result.skipped_ids.length };
+    },
+    onSuccess: ({ done, skipped }) => {
+      queryClient.invalidateQueries({ queryKey: ['admin-users'] });
+      setSelected(new Set());
+      toast.success(`${done} användare uppdaterade${skipped ? ` (${skipped} överhoppade)` : ''}`);
+    },
+    onError: () => toast.error('Kunde inte utföra åtgärden'),
+  });
+
+  const toggleSelected = (userId: number) => {
+    setSelected((current) => {
+      const next = new Set(current);
+      if (next.has(userId)) {
+        next.delete(userId);
+      } else {
+        next.add(userId);
+      }
+      return next;
+    });
+  };
+
+  const allSelected = !!users?.length && users.every((user) => selected.has(user.id));
+  const toggleAll = () => {
+    setSelected(allSelected ? new Set() : new Set(users?.map((user) => user.id)));
+  };
+
+  const handleBulkDelete = () => {
+    if (confirm(`Är du säker på att du vill ta bort ${selected.size} användare?`)) {
+      bulkMutation.mutate('delete');
+    }
+  };
+
   const handleToggleActive = (user: UserType) => {
     toggleActiveMutation.mutate(user.id);
     setMenuOpen(null);
@@ -124,6 +186,31 @@ export default function AdminUsers() {
         </div>
       </div>
 
+      {/* Bulk Actions */}
+      {selected.size > 0 && (
+        <div className="card p-4 mb-6 flex flex-col md:flex-row md:items-center gap-3">
+          <p className="text-earth-700 flex-1">
+            <strong>{selected.size}</strong> valda
+          </p>
+          <button onClick={() => bulkMutation.mutate('verify')} disabled={bulkMutation.isPending} className="btn-secondary">
+            Verifiera
+          </button>
+          <button onClick={() => bulkMutation.mutate('activate')} disabled={bulkMutation.isPending} className="btn-secondary">
+            Aktivera
+          </button>
+          <button onClick={() => bulkMutation.mutate('deactivate')} disabled={bulkMutation.isPending} className="btn-secondary">
+            Inaktivera
+          </button>
+          <button
+            onClick={handleBulkDelete}
+            disabled={bulkMutation.isPending}
+            className="btn-secondary text-red-600"
+          >
+            Ta bort
+          </button>
+        </div>
+      )}
+
       {/* Users Table */}
       <div className="card overflow-hidden">
         {isLoading ? (
@@ -135,6 +222,9 @@ export default function AdminUsers() {
             <table className="w-full">
               <thead className="bg-earth-50 border-b border-earth-100">
                 <tr>
+                  <th className="p-4 w-10">
+                    <input type="checkbox" checked={allSelected} onChange={toggleAll} />
+                  </th>
                   <th className="text-left p-4 font-medium text-earth-600">Användare</th>
                   <th className="text-left p-4 font-medium text-earth-600">Roll</th>
                   <th className="text-left p-4 font-medium text-earth-600">Status</th>
@@ -145,6 +235,13 @@ export default function AdminUsers() {
               <tbody className="divide-y divide-earth-100">
                 {users?.map((user) => (
                   <tr key={user.id} className="hover:bg-earth-50">
+                    <td className="p-4">
+                      <input
+                        type="checkbox"
+                        checked={selected.has(user.id)}
+                        onChange={() => toggleSelected(user.id)}
+                      />
+                    </td>
                     <td className="p-4">
                       <div className="flex items-center gap-3">
                         <div className="w-10 h-10 bg-earth-100 rounded-full flex items-center justify-center">
@@ -244,7 +341,28 @@ export default function AdminUsers() {
             <p className="text-earth-500">Inga användare hittades</p>
           </div>
         )}
+
+        {hasNextPage && (
+          <div className="p-4 border-t border-earth-100">
+            <button
+              onClick={() => fetchNextPage()}
+              disabled={isFetchingNextPage}
+              className="btn-secondary w-full"
+            >
+              {isFetchingNextPage ? 'Laddar...' : 'Visa fler användare'}
+            </button>
+          </div>
+        )}
       </div>
+
+      {firstPage?.total != null && users && users.length > 0 && (
+        <div className="mt-6 p-4 bg-earth-50 rounded-xl">
+          <p className="text-earth-600">
+            Visar <strong>{users.length}</strong> av {firstPage.total_is_estimate ? 'ungefär ' : ''}
+            <strong>{firstPage.total.toLocaleString('sv-SE')}</strong> användare
+          </p>
+        </div>
+      )}
     </div>
   );
 }
@@ -123,8 +123,8 @@ export default function FarrierBookings() {
   };
 
   const updateStatusMutation = useMutation({
-    mutationFn: ({ id, status, notes }: { id: number; status: string; notes?: string }) =>
-      bookingsApi.updateStatus(id, status, notes),
+    mutationFn: ({ id, status, notes, version }: { id: number; status: string; notes?: string; version?: number }) =>
+      bookingsApi.updateStatus(id, status, notes, version),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ['farrier-bookings'] });
       queryClient.invalidateQueries({ queryKey: ['bookings'] });
@@ -133,7 +133,14 @@ export default function FarrierBookings() {
       setSelectedBooking(null);
       setNote('');
     },
-    onError: () => toast.error('Kunde inte uppdatera'),
+    onError: (error: any) => {
+      if (error.response?.status === 409) {
+        queryClient.invalidateQueries({ queryKey: ['farrier-bookings'] });
+        toast.error('Bokningen har ändrats. Listan har laddats om.');
+      } else {
+        toast.error('Kunde inte uppdatera');
+      }
+    },
   });
 
   const cancelMutation = useMutation({
@@ -147,11 +154,11 @@ export default function FarrierBookings() {
   });
 
   const handleConfirm = (booking: Booking) => {
-    updateStatusMutation.mutate({ id: booking.id, status: 'confirmed' });
+    updateStatusMutation.mutate({ id: booking.id, status: 'confirmed', version: booking.version });
   };
 
   const handleComplete = (booking: Booking) => {
-    updateStatusMutation.mutate({ id: booking.id, status: 'completed', notes: note });
+    updateStatusMutation.mutate({ id: booking.id, status: 'completed', notes: note, version: booking.version });
   };
 
   const handleCancel = (booking: Booking) => {
@@ -30,11 +30,12 @@ export default function FarrierDashboard() {
   });
 
   // Get reviews for this farrier
-  const { data: reviews } = useQuery({
-    queryKey: ['farrier-reviews', myProfileListItem?.id],
-    queryFn: () => reviewsApi.listForFarrier(myProfileListItem!.id),
+  const { data: reviewsPage } = useQuery({
+    queryKey: ['farrier-reviews', myProfileListItem?.id, 'latest'],
+    queryFn: () => reviewsApi.listForFarrier(myProfileListItem!.id, { limit: 3 }),
     enabled: !!myProfileListItem?.id,
   });
+  const reviews = reviewsPage?.reviews;
 
   const bookingsList = bookings || [];
   const pendingBookings = bookingsList.filter(b => b.status === 'pending');
@@ -17,6 +17,7 @@ export default function NewBooking() {
   const [selectedService, setSelectedService] = useState<{ name: string; price: number; duration: number } | null>(null);
   const [selectedDate, setSelectedDate] = useState<Date | null>(null);
   const [selectedTime, setSelectedTime] = useState<string>('');
+  const [holdId, setHoldId] = useState<number | null>(null);
 
   const { register, handleSubmit, watch, formState: { errors } } = useForm<BookingFormData>();
   const selectedHorseId = watch('horse_id');
@@ -34,7 +35,7 @@ export default function NewBooking() {
 
   const dateStr = selectedDate ? format(selectedDate, 'yyyy-MM-dd') : null;
 
-  const { data: dayAvailability } = useQuery({
+  const { data: dayAvailability, refetch: refetchAvailability } = useQuery({
     queryKey: ['availability-farrier-locations', dateStr],
     queryFn: async () => {
       const res = await api.get(`/availability/farrier-locations?date_str=${dateStr}`);
@@ -43,6 +44,7 @@ export default function NewBooking() {
         farriers: Array<{
           farrier_id: number;
           bookings: Array<{ time: string; duration?: number }>;
+          holds?: Array<{ id: number; time: string; duration?: number }>;
         }>;
       };
     },
@@ -50,6 +52,21 @@ export default function NewBooking() {
     staleTime: 0,
   });
 
+  // Reservera vald tid medan resten av formuläret fylls i
+  const holdMutation = useMutation({
+    mutationFn: bookingsApi.hold,
+    onSuccess: (hold) => setHoldId(hold.id),
+    onError: (error: any) => {
+      setSelectedTime('');
+      setHoldId(null);
+      if (error?.response?.status === 409) {
+        refetchAvailability();
+      }
+      const message = error?.response?.data?.detail || 'Kunde inte reservera tiden';
+      toast.error(message, { duration: 5000 });
+    },
+  });
+
   const bookingMutation = useMutation({
     mutationFn: bookingsApi.create,
     onSuccess: () => {
@@ -89,14 +106,16 @@ export default function NewBooking() {
     if (!selectedDate || !selectedService) return new Set<string>();
     const fid = Number(farrierId);
     const farrierDay = dayAvailability?.farriers?.find((f) => f.farrier_id === fid);
-    if (!farrierDay?.bookings?.length) return new Set<string>();
+    // Andras reservationer är upptagna, den egna är det inte
+    const holds = (farrierDay?.holds ?? []).filter((h) => h.id !== holdId);
+    if (!farrierDay?.bookings?.length && !holds.length) return new Set<string>();
 
     const toMinutes = (t: string) => {
       const [h, m] = t.split(':').map(Number);
       return h * 60 + m;
     };
 
-    const bookingIntervals = farrierDay.bookings.map((b) => {
+    const bookingIntervals = [...farrierDay.bookings, ...holds].map((b) => {
       const start = toMinutes(b.time);
       const dur = b.duration ?? 60;
       return { start, end: start + dur };
@@ -110,18 +129,16 @@ export default function NewBooking() {
       if (overlaps) disabled.add(t);
     }
     return disabled;
-  }, [availableTimes, dayAvailability, farrierId, selectedDate, selectedService]);
+  }, [availableTimes, dayAvailability, farrierId, holdId, selectedDate, selectedService]);
 
   const selectedHorse = horses?.find(h => h.id === Number(selectedHorseId));
 
-  const onSubmit = (data: BookingFormData) => {
-    if (!selectedService || !selectedDate || !selectedTime) return;
-
-    // Create date in local timezone - we want to preserve the exact time the user selected
-    const year = selectedDate.getFullYear();
-    const month = String(selectedDate.getMonth() + 1).padStart(2, '0');
-    const day = String(selectedDate.getDate()).padStart(2, '0');
-    const [hours, minutes] = selectedTime.split(':').map(Number);
+  // Skicka tiden med lokal tidszon så att backend vet exakt vilken tid som valts
+  const toDateWithOffset = (date: Date, time: string) => {
+    const year = date.getFullYear();
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    const [hours, minutes] = time.split(':').map(Number);
     const hour = String(hours).padStart(2, '0');
     const minute = String(minutes).padStart(2, '0');
     
@@ -133,9 +150,23 @@ export default function NewBooking() {
     const offsetSign = offsetMinutes <= 0 ? '+' : '-';
     const offsetString = `${offsetSign}${String(offsetHours).padStart(2, '0')}:${String(offsetMins).padStart(2, '0')}`;
     
-    // Send with timezone offset - this tells backend the exact local time
-    // Backend should store this as-is or convert appropriately
-    const dateWithOffset = `${year}-${month}-${day}T${hour}:${minute}:00${offsetString}`;
+    return `${year}-${month}-${day}T${hour}:${minute}:00${offsetString}`;
+  };
+
+  const selectTime = (time: string) => {
+    setSelectedTime(time);
+    if (!selectedDate || !selectedService) return;
+    holdMutation.mutate({
+      farrier_id: Number(farrierId),
+      scheduled_date: toDateWithOffset(selectedDate, time),
+      duration_minutes: selectedService.duration,
+    });
+  };
+
+  const onSubmit = (data: BookingFormData) => {
+    if (!selectedService || !selectedDate || !selectedTime) return;
+
+    const dateWithOffset = toDateWithOffset(selectedDate, selectedTime);
 
     bookingMutation.mutate({
       farrier_id: Number(farrierId),
@@ -375,7 +406,7 @@ export default function NewBooking() {
                       key={time}
                       type="button"
                       disabled={disabledTimes.has(time)}
-                      onClick={() => setSelectedTime(time)}
+                      onClick={() => selectTime(time)}
                       className={`px-4 py-2 rounded-lg border transition-all ${
                         disabledTimes.has(time)
                           ? 'border-earth-200 bg-earth-100 text-earth-400 cursor-not-allowed'
@@ -390,7 +421,7 @@ export default function NewBooking() {
                 </div>
                 {disabledTimes.size > 0 && (
                   <p className="text-sm text-earth-500 mt-2">
-                    Gråmarkerade tider är redan bokade.
+                    Gråmarkerade tider är redan bokade eller reserverade.
                   </p>
                 )}
               </div>
@@ -1,16 +1,28 @@
 import axios from 'axios';
 import type {
   User,
+  UserPage,
+  BulkUserSelection,
+  BulkUserResult,
+  BulkUserDeleteResult,
   Farrier,
   FarrierListItem,
   Horse,
   Booking,
+  AdminBookingPage,
+  SlotHold,
   Review,
+  ReviewPage,
+  ReviewSort,
+  ModerationQueue,
+  ReviewVisibilityResult,
   RegisterFormData,
   HorseFormData,
   BookingFormData,
   FarrierSearchFilters,
   AdminStats,
+  ReportJob,
+  ReportJobCreate,
 } from '../types';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
@@ -208,23 +220,35 @@ export const bookingsApi = {
     return response.data;
   },
 
-  updateStatus: async (id: number, status: string, notes?: string): Promise<Booking> => {
-    const response = await api.put(`/bookings/${id}/status`, { status, notes_from_farrier: notes });
+  updateStatus: async (id: number, status: string, notes?: string, version?: number): Promise<Booking> => {
+    const response = await api.put(`/bookings/${id}/status`, { status, notes_from_farrier: notes, version });
     return response.data;
   },
 
-  cancel: async (id: number, reason?: string): Promise<Booking> => {
+  cancel: async (id: number, reason?: string, version?: number): Promise<Booking> => {
     const response = await api.put(`/bookings/${id}/cancel`, null, {
-      params: { cancellation_reason: reason },
+      params: { cancellation_reason: reason, version },
     });
     return response.data;
   },
+
+  hold: async (data: { farrier_id: number; scheduled_date: string; duration_minutes: number }): Promise<SlotHold> => {
+    const response = await api.post('/bookings/holds', data);
+    return response.data;
+  },
+
+  releaseHold: async (id: number): Promise<void> => {
+    await api.delete(`/bookings/holds/${id}`);
+  },
 };
 
 // === Reviews ===
 export const reviewsApi = {
-  listForFarrier: async (farrierId: number): Promise<Review[]> => {
-    const response = await api.get(`/reviews/farrier/${farrierId}`);
+  listForFarrier: async (
+    farrierId: number,
+    params?: { sort?: ReviewSort; cursor?: string; limit?: number }
+  ): Promise<ReviewPage> => {
+    const response = await api.get(`/reviews/farrier/${farrierId}`, { params });
     return response.data;
   },
 
@@ -255,7 +279,13 @@ export const adminApi = {
     return response.data;
   },
 
-  listUsers: async (params?: { role?: string; is_active?: boolean; search?: string }): Promise<User[]> => {
+  listUsers: async (params?: {
+    role?: string;
+    is_active?: boolean;
+    search?: string;
+    cursor?: number;
+    limit?: number;
+  }): Promise<UserPage> => {
     const response = await api.get('/admin/users', { params });
     return response.data;
   },
@@ -272,8 +302,49 @@ export const adminApi = {
     await api.delete(`/admin/users/${userId}`);
   },
 
-  listAllBookings: async (status?: string): Promise<Booking[]> => {
-    const response = await api.get('/admin/bookings', { params: { status_filter: status } });
+  bulkSetActive: async (selection: BulkUserSelection, isActive: boolean): Promise<BulkUserResult> => {
+    const response = await api.post('/admin/users/bulk/active', { ...selection, is_active: isActive });
+    return response.data;
+  },
+
+  bulkVerify: async (selection: BulkUserSelection): Promise<BulkUserResult> => {
+    const response = await api.post('/admin/users/bulk/verify', selection);
+    return response.data;
+  },
+
+  bulkDelete: async (selection: BulkUserSelection): Promise<BulkUserDeleteResult> => {
+    const response = await api.post('/admin/users/bulk/delete', selection);
+    return response.data;
+  },
+
+  listAllBookings: async (params?: {
+    status_filter?: string;
+    search?: string;
+    cursor?: number;
+    limit?: number;
+  }): Promise<AdminBookingPage> => {
+    const response = await api.get('/admin/bookings', { params });
+    return response.data;
+  },
+
+  // Modereringskö för omdömen och dölj/visa i klump
+  listReviewsForModeration: async (params?: {
+    rating?: number;
+    farrier_id?: number;
+    q?: string;
+    is_visible?: boolean;
+    cursor?: string;
+    limit?: number;
+  }): Promise<ModerationQueue> => {
+    const response = await api.get('/admin/reviews/moderation', { params });
+    return response.data;
+  },
+
+  setReviewVisibility: async (reviewIds: number[], isVisible: boolean): Promise<ReviewVisibilityResult> => {
+    const response = await api.post('/admin/reviews/moderation/visibility', {
+      review_ids: reviewIds,
+      is_visible: isVisible,
+    });
     return response.data;
   },
 
@@ -281,6 +352,30 @@ export const adminApi = {
     const response = await api.get('/admin/farriers/pending-verification');
     return response.data;
   },
+
+  createReport: async (data: ReportJobCreate): Promise<ReportJob> => {
+    const response = await api.post('/admin/reports/', data);
+    return response.data;
+  },
+
+  listReports: async (): Promise<ReportJob[]> => {
+    const response = await api.get('/admin/reports/');
+    return response.data;
+  },
+
+  getReport: async (jobId: number): Promise<ReportJob> => {
+    const response = await api.get(`/admin/reports/${jobId}`);
+    return response.data;
+  },
+
+  downloadReport: async (jobId: number): Promise<Blob> => {
+    const response = await api.get(`/admin/reports/${jobId}/download`, { responseType: 'blob' });
+    return response.data;
+  },
+
+  deleteReport: async (jobId: number): Promise<void> => {
+    await api.delete(`/admin/reports/${jobId}`);
+  },
 };
 
 export default api;
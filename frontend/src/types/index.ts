@@ -17,6 +17,37 @@ export interface User {
   created_at: string;
 }
 
+export interface BulkUserFilter {
+  role?: string;
+  is_active?: boolean;
+  is_verified?: boolean;
+  created_after?: string;
+  created_before?: string;
+  search?: string;
+}
+
+export type BulkUserSelection = { user_ids: number[] } | { filter: BulkUserFilter };
+
+export interface BulkUserResult {
+  updated_ids: number[];
+  unchanged_ids: number[];
+  not_found_ids: number[];
+  skipped_ids: number[];
+}
+
+export interface BulkUserDeleteResult {
+  deleted_ids: number[];
+  not_found_ids: number[];
+  skipped_ids: number[];
+}
+
+export interface UserPage {
+  users: User[];
+  next_cursor?: number;
+  total?: number;
+  total_is_estimate: boolean;
+}
+
 // Farrier types
 export interface FarrierService {
   id: number;
@@ -47,6 +78,13 @@ export interface FarrierArea {
   created_at: string;
 }
 
+export interface FarrierDetailedRatings {
+  quality?: number;
+  punctuality?: number;
+  communication?: number;
+  price?: number;
+}
+
 export interface Farrier {
   id: number;
   user_id: number;
@@ -59,6 +97,7 @@ export interface Farrier {
   base_longitude?: number;
   average_rating: number;
   total_reviews: number;
+  detailed_ratings?: FarrierDetailedRatings;
   is_available: boolean;
   is_verified: boolean;
   created_at: string;
@@ -139,6 +178,7 @@ export interface Booking {
   travel_fee: number;
   total_price: number;
   status: BookingStatus;
+  version: number;
   notes_from_owner?: string;
   notes_from_farrier?: string;
   cancelled_by?: string;
@@ -155,6 +195,20 @@ export interface Booking {
   has_review: boolean;
 }
 
+export interface AdminBookingPage {
+  bookings: Booking[];
+  next_cursor?: number;
+}
+
+// Tillfällig reservation av en tid under bokningen
+export interface SlotHold {
+  id: number;
+  farrier_id: number;
+  scheduled_date: string;
+  duration_minutes: number;
+  expires_at: string;
+}
+
 // Review types
 export interface Review {
   id: number;
@@ -178,6 +232,32 @@ export interface Review {
   author_image?: string;
 }
 
+export type ReviewSort = 'newest' | 'highest' | 'lowest' | 'with_text';
+
+export interface ModerationReview extends Review {
+  farrier_name?: string;
+}
+
+export interface ModerationQueue {
+  reviews: ModerationReview[];
+  next_cursor?: string;
+}
+
+export interface ReviewVisibilityResult {
+  updated_ids: number[];
+  unchanged_ids: number[];
+  not_found_ids: number[];
+  farriers_updated: number;
+}
+
+export interface ReviewPage {
+  reviews: Review[];
+  next_cursor?: string;
+  average_rating: number;
+  total_reviews: number;
+  histogram: Record<number, number>;
+}
+
 // Form types
 export interface RegisterFormData {
   email: string;
@@ -251,3 +331,30 @@ export interface AdminStats {
   total_revenue: number;
 }
 
+// Admin reports
+export type ReportType = 'farrier_revenue' | 'cancellation_rate' | 'utilization';
+export type ReportFormat = 'csv' | 'ndjson';
+
+export interface ReportJobCreate {
+  report_type: ReportType;
+  format?: ReportFormat;
+  month_from: string;
+  month_to: string;
+  farrier_id?: number;
+}
+
+export interface ReportJob {
+  id: number;
+  report_type: ReportType;
+  output_format: ReportFormat;
+  parameters: Record<string, unknown>;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  progress: number;
+  row_count: number;
+  error?: string;
+  created_at: string;
+  started_at?: string;
+  finished_at?: string;
+  download_url?: string;
+}
+